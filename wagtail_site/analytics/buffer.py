@@ -0,0 +1,219 @@
+"""
+Write-behind buffer for page visits.
+
+Visits are collected in memory while serving requests and written to the database in batches
+by a background thread, once the buffer holds ``ANALYTICS_VISIT_BUFFER_SIZE`` visits or
+``ANALYTICS_VISIT_FLUSH_INTERVAL`` seconds have passed. If ``ANALYTICS_VISIT_SPOOL`` names a
+file, each batch is first appended to that local SQLite spool, so that several worker processes
+can share it and visits survive a crashing worker until the spool is drained.
+"""
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger('analytics')
+
+
+class VisitSpool:
+    """
+    Local SQLite file keeping serialized visits until they have been written to the database.
+    """
+    def __init__(self, path):
+        self.path = path
+        conn = self.connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS visit (id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        finally:
+            conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def append(self, visits):
+        rows = [(json.dumps(visit, cls=DjangoJSONEncoder),) for visit in visits]
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT INTO visit (data) VALUES (?)", rows)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def drain(self, write, batch_size=1000):
+        """
+        Pass all spooled visits, in batches, to ``write`` and remove them afterwards. Concurrent
+        drains are serialized by SQLite's write lock.
+        """
+        drained = 0
+        conn = self.connect()
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute("SELECT id, data FROM visit ORDER BY id LIMIT ?", [batch_size]).fetchall()
+                if not rows:
+                    conn.execute("COMMIT")
+                    return drained
+                try:
+                    write([json.loads(data) for _, data in rows])
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("DELETE FROM visit WHERE id <= ?", [rows[-1][0]])
+                conn.execute("COMMIT")
+                drained += len(rows)
+        finally:
+            conn.close()
+
+
+class VisitBuffer:
+    """
+    In-process buffer of page visits, flushed by a background thread. Once ``capacity`` visits
+    are pending, because the database can not keep up, they are moved into the spool or, without
+    a spool, written by the request adding the next visit. Only visits which can not be written
+    either way are dropped, which is logged and counted by ``dropped``.
+    """
+    def __init__(self, size=100, interval=5.0, capacity=10000, spool=None):
+        self.size = size
+        self.interval = interval
+        self.capacity = capacity
+        self.visits = deque()
+        self.dropped = 0
+        self.spool = VisitSpool(spool) if spool else None
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        # write the pending visits on graceful shutdown
+        atexit.register(self.flush)
+
+    def add(self, visit):
+        """
+        Queue a visit, given as a dict of field values of the PageVisit model. An advertiser is
+        passed as ``tracking_no`` and resolved when flushing.
+        """
+        if len(self.visits) >= self.capacity:
+            self.overflow()
+        self.visits.append(visit)
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if len(self.visits) >= self.size:
+            self._wakeup.set()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='analytics-visits', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write page visits")
+            finally:
+                close_old_connections()
+
+    def take(self):
+        visits = []
+        while self.visits:
+            try:
+                visits.append(self.visits.popleft())
+            except IndexError:
+                # taken by another thread in the meantime
+                break
+        return visits
+
+    def overflow(self):
+        """
+        Move the pending visits out of memory, without waiting for the background thread.
+        """
+        visits = self.take()
+        if not visits:
+            return
+        try:
+            if self.spool:
+                self.spool.append(visits)
+            else:
+                write_visits(visits)
+        except Exception:
+            self.dropped += len(visits)
+            logger.exception("Visit buffer is full, dropped %d page visits (%d in total)", len(visits), self.dropped)
+
+    def flush(self):
+        """
+        Write all pending visits, through the spool if configured.
+        """
+        with self._flush_lock:
+            visits = self.take()
+            if self.spool:
+                if visits:
+                    self.spool.append(visits)
+                self.spool.drain(write_visits)
+            elif visits:
+                try:
+                    write_visits(visits)
+                except Exception:
+                    # keep the visits for the next attempt
+                    self.visits.extendleft(reversed(visits))
+                    raise
+
+
+def write_visits(visits):
+    """
+    Insert the given visits using one query to resolve the advertisers and one bulk insert. The
+    locations of all their IP addresses are resolved at once.
+    """
+    from .geolocation import get_location_fields, get_resolver
+    from .models import Advertiser, PageVisit
+
+    tracking_nos = {visit['tracking_no'] for visit in visits if visit.get('tracking_no')}
+    advertisers = {}
+    if tracking_nos:
+        for advertiser in Advertiser.objects.filter(tracking_no__in=tracking_nos).only('pk', 'name', 'tracking_no'):
+            advertisers.setdefault(advertiser.tracking_no, advertiser)
+    locations = get_resolver().resolve_many(visit.get('ip_address') for visit in visits)
+    page_visits = []
+    for visit in visits:
+        visit = dict(visit)
+        visit.update(get_location_fields(locations.get(visit.get('ip_address'))))
+        advertiser = advertisers.get(visit.pop('tracking_no', None))
+        if advertiser:
+            visit.update(advertiser=advertiser, advertiser_name=advertiser.name)
+        if isinstance(visit.get('created_at'), str):
+            visit['created_at'] = parse_datetime(visit['created_at'])
+        page_visits.append(PageVisit(**visit))
+    with transaction.atomic():
+        PageVisit.objects.bulk_create(page_visits)
+    return page_visits
+
+
+_visit_buffer = None
+_visit_buffer_lock = threading.Lock()
+
+
+def get_visit_buffer():
+    """
+    Return the buffer of the current process, configured through the ``ANALYTICS_VISIT_*`` settings.
+    """
+    global _visit_buffer
+    if _visit_buffer is None:
+        with _visit_buffer_lock:
+            if _visit_buffer is None:
+                _visit_buffer = VisitBuffer(
+                    size=getattr(settings, 'ANALYTICS_VISIT_BUFFER_SIZE', 100),
+                    interval=getattr(settings, 'ANALYTICS_VISIT_FLUSH_INTERVAL', 5.0),
+                    capacity=getattr(settings, 'ANALYTICS_VISIT_BUFFER_CAPACITY', 10000),
+                    spool=getattr(settings, 'ANALYTICS_VISIT_SPOOL', None),
+                )
+    return _visit_buffer
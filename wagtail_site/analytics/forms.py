@@ -10,6 +10,11 @@ class PageVisitReportForm(forms.Form):
         super().__init__(*args, **kwargs)
 
 
+class UserSearchReportForm(forms.Form):
+    start_date = forms.DateField(label=_("Start Date"), required=True)
+    end_date = forms.DateField(label=_("End Date"), required=False)
+
+
 class PageVisitAdvanceReportForm(forms.Form):
     start_date = forms.DateField(label=_("Start Date"), required=True)
     end_date = forms.DateField(label=_("End Date"), required=False)
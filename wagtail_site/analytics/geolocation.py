@@ -0,0 +1,185 @@
+"""
+Resolvers looking up the geographic location of IP addresses.
+
+Use the setting ``ANALYTICS_GEOLOCATION_RESOLVER`` to configure the resolver class. If unset,
+a local database given by ``ANALYTICS_GEOIP_DATABASE`` is used, either a MaxMind ``.mmdb`` file
+or a CSV file of address ranges, and ipinfo.io is only queried if no database is configured.
+"""
+import bisect
+import csv
+import ipaddress
+import threading
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .dataclasses import IPInfo
+
+
+class BaseResolver:
+    """
+    Base class of all resolvers. Results are kept in a bounded LRU cache of ``cache_size`` entries.
+    """
+    def __init__(self, cache_size=10000):
+        self.resolve = lru_cache(maxsize=cache_size)(self.lookup)
+
+    def lookup(self, ip_address):
+        """
+        :returns: An :class:`IPInfo` object for the given address or ``None`` if it is unknown.
+        """
+        raise NotImplementedError("{} must implement method `lookup()`.".format(self.__class__.__name__))
+
+    def resolve_many(self, ip_addresses):
+        """
+        :returns: A dict mapping each of the given addresses onto its :class:`IPInfo` or ``None``.
+        """
+        return {ip_address: self.resolve(ip_address) for ip_address in set(ip_addresses) if ip_address}
+
+
+class IPInfoResolver(BaseResolver):
+    """
+    Queries the ipinfo.io web service for each address not found in the cache.
+    """
+    def lookup(self, ip_address):
+        address = '154.160.14.80' if ip_address == '127.0.0.1' else ip_address
+        url = "https://ipinfo.io/%s?token=%s" % (address, settings.IPINFO_TOKEN)
+        try:
+            response = requests.get(url, timeout=5)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        ip_info = response.json()
+        return IPInfo(
+            ip=ip_info.get('ip'),
+            country=ip_info.get('country'),
+            city=ip_info.get('city'),
+            region=ip_info.get('region'),
+            loc=ip_info.get('loc'),
+            org=ip_info.get('org'),
+            timezone=ip_info.get('timezone'),
+            hostname=ip_info.get('hostname')
+        )
+
+
+class RangeFileResolver(BaseResolver):
+    """
+    Loads a CSV file of address ranges into sorted arrays and looks up addresses by bisection.
+    Each row contains the columns ``start``, ``end``, ``country``, ``city``, ``region``,
+    ``latitude`` and ``longitude``, where ``start`` and ``end`` are the first and last address of
+    the range. Rows must not overlap.
+    """
+    def __init__(self, path, cache_size=10000):
+        super().__init__(cache_size)
+        self.path = path
+        # per IP version, the sorted start and end addresses of all ranges and their locations
+        self.starts, self.ends, self.locations = {4: [], 6: []}, {4: [], 6: []}, {4: [], 6: []}
+        ranges = {4: [], 6: []}
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                start, end = ipaddress.ip_address(row['start']), ipaddress.ip_address(row['end'])
+                location = (row.get('country') or None, row.get('city') or None, row.get('region') or None,
+                            '{},{}'.format(row['latitude'], row['longitude']) if row.get('latitude') else None)
+                ranges[start.version].append((int(start), int(end), location))
+        for version, rows in ranges.items():
+            rows.sort(key=lambda row: row[0])
+            for start, end, location in rows:
+                self.starts[version].append(start)
+                self.ends[version].append(end)
+                self.locations[version].append(location)
+
+    def lookup(self, ip_address):
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+        value = int(address)
+        index = bisect.bisect_right(self.starts[address.version], value) - 1
+        if index < 0 or value > self.ends[address.version][index]:
+            return None
+        country, city, region, loc = self.locations[address.version][index]
+        return IPInfo(ip=ip_address, country=country, city=city, region=region, loc=loc,
+                      org=None, timezone=None, hostname=None)
+
+
+class MMDBResolver(BaseResolver):
+    """
+    Looks up addresses in a MaxMind database, such as GeoLite2-City. Requires the package ``maxminddb``.
+    """
+    def __init__(self, path, cache_size=10000):
+        try:
+            import maxminddb
+        except ImportError:
+            raise ImproperlyConfigured("MMDBResolver requires the package 'maxminddb'.")
+        super().__init__(cache_size)
+        self.path = path
+        self.reader = maxminddb.open_database(path)
+
+    def lookup(self, ip_address):
+        try:
+            record = self.reader.get(ip_address)
+        except ValueError:
+            return None
+        if not record:
+            return None
+        location = record.get('location', {})
+        subdivisions = record.get('subdivisions') or [{}]
+        loc = None
+        if 'latitude' in location:
+            loc = '{},{}'.format(location['latitude'], location['longitude'])
+        return IPInfo(
+            ip=ip_address,
+            country=record.get('country', {}).get('iso_code'),
+            city=record.get('city', {}).get('names', {}).get('en'),
+            region=subdivisions[0].get('names', {}).get('en'),
+            loc=loc,
+            org=None,
+            timezone=location.get('time_zone'),
+            hostname=None,
+        )
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """
+    Return the resolver of the current process, configured through the ``ANALYTICS_GEO*`` settings.
+    """
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                database = getattr(settings, 'ANALYTICS_GEOIP_DATABASE', None)
+                cache_size = getattr(settings, 'ANALYTICS_GEOIP_CACHE_SIZE', 10000)
+                resolver_class = getattr(settings, 'ANALYTICS_GEOLOCATION_RESOLVER', None)
+                if resolver_class:
+                    resolver_class = import_string(resolver_class)
+                elif not database:
+                    resolver_class = IPInfoResolver
+                elif database.endswith('.mmdb'):
+                    resolver_class = MMDBResolver
+                else:
+                    resolver_class = RangeFileResolver
+                if issubclass(resolver_class, IPInfoResolver):
+                    _resolver = resolver_class(cache_size=cache_size)
+                else:
+                    _resolver = resolver_class(database, cache_size=cache_size)
+    return _resolver
+
+
+def get_location_fields(ip_info):
+    """
+    :returns: A dict with the location fields of a PageVisit for the given :class:`IPInfo`.
+    """
+    if ip_info is None:
+        return {}
+    fields = {'country': ip_info.country, 'city': ip_info.city}
+    location_lat, _, location_lng = (ip_info.loc or '').partition(',')
+    if location_lat and location_lng:
+        fields.update(location_lat=location_lat, location_lng=location_lng)
+    return fields
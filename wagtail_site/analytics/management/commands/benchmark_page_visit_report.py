@@ -0,0 +1,119 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from wagtail_site.analytics import rollups
+from wagtail_site.analytics.models import PageVisit
+from wagtail_site.analytics.views import GroupedPageVisitReport
+
+
+class Command(BaseCommand):
+    help = ("Compare rendering the grouped page visit report by loading the visits of each group, "
+            "by one GROUP BY query and by reading the rollups, on synthetic page visits. "
+            "All written visits and rollups are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--visits',
+            type=int,
+            default=10000000,
+            help="Number of synthetic page visits.",
+        )
+        parser.add_argument(
+            '--groups',
+            type=int,
+            default=50,
+            help="Number of distinct paths the visits are spread over.",
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help="Number of past days the visits are spread over.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help="Number of visits inserted by each query.",
+        )
+        parser.add_argument(
+            '--per-page',
+            type=int,
+            default=25,
+            help="Number of visits rendered by the table of each group.",
+        )
+        parser.add_argument(
+            '--skip-lists',
+            action='store_true',
+            help="Do not load the visits of each group, which needs memory for all visits.",
+        )
+
+    def create_visits(self, count, groups, days, batch_size):
+        today = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+        first_day = today - datetime.timedelta(days=days)
+        batches = (count + batch_size - 1) // batch_size
+        for batch in range(batches):
+            visits = PageVisit.objects.bulk_create([
+                PageVisit(
+                    path='/benchmark/{}/'.format(number % groups),
+                    method='GET',
+                    ip_address='10.{}.{}.{}'.format(number >> 16 & 255, number >> 8 & 255, number & 255),
+                    country='GH',
+                ) for number in range(batch * batch_size, min(count, (batch + 1) * batch_size))
+            ])
+            # spread the batches evenly over the past days, so that the rollups cover them
+            created_at = first_day + (today - first_day) * batch / batches
+            pks = [visit.pk for visit in visits]
+            PageVisit.objects.filter(pk__gte=min(pks), pk__lte=max(pks)).update(created_at=created_at)
+
+    def get_view(self, days, use_rollups):
+        start_date = timezone.localdate() - datetime.timedelta(days=days)
+        view = GroupedPageVisitReport()
+        view.setup(RequestFactory().get('/', {'start_date': start_date.isoformat()}))
+        view.group_filter = None
+        view.use_rollups = use_rollups
+        return view
+
+    def measure(self, label, render):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            rows = render()
+            elapsed = time.perf_counter() - start
+        self.stdout.write("{}: {:.1f} ms, {} queries, {} visits rendered".format(
+            label, elapsed * 1000, len(context.captured_queries), rows))
+
+    def render_lists(self, view):
+        # the visits of each group loaded into a list, as done before the report read its summary
+        queryset = view.get_filtered_queryset()
+        field = view.get_group_field()
+        names = queryset.order_by().values_list(field, flat=True).distinct()
+        return sum(len(list(queryset.filter(**{field: name}).order_by('-id'))) for name in names)
+
+    def render_pages(self, view, per_page):
+        # the summary and the first page of the table of each group
+        view.get_group_summary()
+        return sum(len(list(visits[:per_page])) for visits in view.group_queryset())
+
+    def handle(self, *args, **options):
+        days = options['days']
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.create_visits(options['visits'], options['groups'], days, options['batch_size'])
+            self.stdout.write("creating {} visits took {:.1f} s".format(
+                options['visits'], time.perf_counter() - start))
+
+            if not options['skip_lists']:
+                self.measure("visit lists", lambda: self.render_lists(self.get_view(days, False)))
+            self.measure("group by", lambda: self.render_pages(self.get_view(days, False), options['per_page']))
+
+            start = time.perf_counter()
+            rollups.update_rollups()
+            self.stdout.write("building the rollups took {:.1f} s".format(time.perf_counter() - start))
+            self.measure("rollups", lambda: self.render_pages(self.get_view(days, True), options['per_page']))
+            transaction.set_rollback(True)
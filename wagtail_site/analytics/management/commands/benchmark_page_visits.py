@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from wagtail_site.analytics.buffer import VisitBuffer, write_visits
+
+
+class Command(BaseCommand):
+    help = ("Compare the latency added to each request by writing its page visit synchronously "
+            "with adding it to the visit buffer. All written visits are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--visits',
+            type=int,
+            default=1000,
+            help="Number of page visits to log with each method.",
+        )
+        parser.add_argument(
+            '--spool',
+            default=None,
+            help="Optional spool file used by the visit buffer.",
+        )
+
+    def get_visit(self, number):
+        # without IP address, so that no geolocation lookups are measured
+        return {
+            'path': '/benchmark/{}/'.format(number % 50),
+            'method': 'GET',
+            'ip_address': None,
+            'user_agent': 'benchmark',
+            'referer': None,
+            'session_id': None,
+            'created_at': timezone.now(),
+        }
+
+    def measure(self, log_visit, count):
+        latencies = []
+        for number in range(count):
+            visit = self.get_visit(number)
+            start = time.perf_counter()
+            log_visit(visit)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def report(self, label, latencies, elapsed):
+        latencies = sorted(latencies)
+        self.stdout.write("{}: mean {:.3f} ms, p99 {:.3f} ms per request, {:.0f} visits/s".format(
+            label,
+            statistics.mean(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            len(latencies) / elapsed,
+        ))
+
+    def handle(self, *args, **options):
+        count = options['visits']
+        with transaction.atomic():
+            start = time.perf_counter()
+            latencies = self.measure(lambda visit: write_visits([visit]), count)
+            self.report("synchronous", latencies, time.perf_counter() - start)
+
+            # never flushed by its background thread, the buffer is flushed once by this thread instead
+            visit_buffer = VisitBuffer(size=count + 1, interval=3600, capacity=count + 1, spool=options['spool'])
+            start = time.perf_counter()
+            latencies = self.measure(visit_buffer.add, count)
+            added = time.perf_counter()
+            visit_buffer.flush()
+            end = time.perf_counter()
+            self.report("buffered", latencies, end - start)
+            self.stdout.write("buffered: flushing {} visits took {:.1f} ms".format(count, (end - added) * 1000))
+            transaction.set_rollback(True)
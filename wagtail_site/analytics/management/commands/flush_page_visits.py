@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from wagtail_site.analytics.buffer import get_visit_buffer
+
+
+class Command(BaseCommand):
+    help = "Write the page visits kept in the visit buffer and its spool file to the database."
+
+    def handle(self, *args, **options):
+        visit_buffer = get_visit_buffer()
+        visit_buffer.flush()
+        if visit_buffer.spool:
+            self.stdout.write("Page visits written, spool '{}' drained.".format(visit_buffer.spool.path))
+        else:
+            self.stdout.write("Page visits written.")
@@ -0,0 +1,42 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from wagtail_site.analytics.partitions import ensure_partitions, prune_partitions
+
+
+class Command(BaseCommand):
+    help = "Create the upcoming partitions of page visits and drop those older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'ANALYTICS_VISIT_RETENTION_DAYS', None),
+            help="Prune visits older than this number of days. Nothing is pruned if not given.",
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=getattr(settings, 'ANALYTICS_VISIT_ARCHIVE_DIR', None),
+            help="Directory to write pruned visits into, as gzip compressed JSON Lines.",
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=None,
+            help="Number of monthly partitions to create ahead of the current month.",
+        )
+
+    def handle(self, *args, **options):
+        for name in ensure_partitions(ahead=options['ahead']):
+            self.stdout.write("Created partition {}".format(name))
+        if options['retention_days'] is None:
+            return
+        cutoff = timezone.now() - datetime.timedelta(days=options['retention_days'])
+        for name, archived in prune_partitions(cutoff, archive_dir=options['archive_dir']):
+            if archived is None:
+                self.stdout.write("Pruned {}".format(name))
+            else:
+                self.stdout.write("Pruned {}, archived {} visits".format(name, archived))
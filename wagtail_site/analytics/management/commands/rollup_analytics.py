@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from wagtail_site.analytics.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = "Aggregate the closed periods of page visits and user searches into the rollup tables."
+
+    def handle(self, *args, **options):
+        for name, periods in update_rollups().items():
+            self.stdout.write("{}: {} periods aggregated".format(name, periods))
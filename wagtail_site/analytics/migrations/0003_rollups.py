@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_alter_pagevisit_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageVisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Granularity')),
+                ('period_start', models.DateTimeField(verbose_name='Period start')),
+                ('path', models.CharField(max_length=500, verbose_name='URL')),
+                ('country', models.CharField(blank=True, max_length=3, null=True, verbose_name='Country')),
+                ('advertiser_name', models.CharField(blank=True, null=True, verbose_name='Advertiser name')),
+                ('visits', models.PositiveIntegerField(default=0, verbose_name='Visits')),
+                ('visitors', models.PositiveIntegerField(default=0, verbose_name='Unique visitors')),
+                ('visitor_sketch', models.BinaryField(help_text="HyperLogLog sketch of the visitors' IP addresses", verbose_name='Visitor sketch')),
+            ],
+            options={
+                'verbose_name': 'Page visit rollup',
+                'verbose_name_plural': 'Page visit rollups',
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='analytics_visit_rollup_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserSearchRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Granularity')),
+                ('period_start', models.DateTimeField(verbose_name='Period start')),
+                ('query', models.CharField(max_length=255, verbose_name='Search term')),
+                ('searches', models.PositiveIntegerField(default=0, verbose_name='Searches')),
+                ('users', models.PositiveIntegerField(default=0, verbose_name='Users')),
+            ],
+            options={
+                'verbose_name': 'User search rollup',
+                'verbose_name_plural': 'User search rollups',
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='analytics_search_rollup_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Name')),
+                ('high_water_mark', models.DateTimeField(verbose_name='High-water mark')),
+            ],
+            options={
+                'verbose_name': 'Rollup state',
+                'verbose_name_plural': 'Rollup states',
+            },
+        ),
+    ]
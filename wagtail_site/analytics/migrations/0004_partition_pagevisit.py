@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:05
+
+from django.db import migrations
+
+
+def partition_pagevisit(apps, schema_editor):
+    """
+    Convert the table of PageVisit into a table partitioned by month on PostgreSQL. The existing
+    table becomes the partition of all rows before the next month.
+    """
+    from wagtail_site.analytics import partitions
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or partitions.is_partitioned(connection):
+        return
+    table, legacy, default = partitions.TABLE, partitions.LEGACY_PARTITION, partitions.DEFAULT_PARTITION
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT now()')
+        upper = partitions.get_next_month(partitions.get_month_start(cursor.fetchone()[0]))
+        cursor.execute('ALTER TABLE "{}" RENAME TO "{}"'.format(table, legacy))
+        cursor.execute('ALTER TABLE "{}" ALTER COLUMN id DROP IDENTITY IF EXISTS'.format(legacy))
+        cursor.execute(
+            'CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (created_at)'.format(table, legacy))
+        # the primary key of a partitioned table must contain the partition key
+        cursor.execute('ALTER TABLE "{}" ADD PRIMARY KEY (id, created_at)'.format(table))
+        cursor.execute('CREATE SEQUENCE "{0}_id_seq" OWNED BY "{0}".id'.format(table))
+        cursor.execute('SELECT setval(\'"{}_id_seq"\', COALESCE(MAX(id), 0) + 1, false) FROM "{}"'.format(table, legacy))
+        cursor.execute('ALTER TABLE "{0}" ALTER COLUMN id SET DEFAULT nextval(\'"{0}_id_seq"\')'.format(table))
+        cursor.execute(
+            'ALTER TABLE "{0}" ADD CONSTRAINT "{0}_advertiser_id_fk" FOREIGN KEY (advertiser_id) '
+            'REFERENCES "analytics_advertiser" (id) DEFERRABLE INITIALLY DEFERRED'.format(table))
+        for column in ['created_at', 'path', 'method', 'advertiser_id']:
+            cursor.execute('CREATE INDEX "{0}_{1}_part_idx" ON "{0}" ({1})'.format(table, column))
+        # a partition can not keep a primary key of its own, attaching it adds the one of its parent
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [legacy])
+        for name, in cursor.fetchall():
+            cursor.execute('ALTER TABLE "{}" DROP CONSTRAINT "{}"'.format(legacy, name))
+        cursor.execute(
+            'ALTER TABLE "{}" ATTACH PARTITION "{}" FOR VALUES FROM (MINVALUE) TO (%s)'.format(table, legacy),
+            [upper])
+        cursor.execute('CREATE TABLE "{}" PARTITION OF "{}" DEFAULT'.format(default, table))
+    partitions.ensure_partitions(now=upper, using=connection)
+
+
+class Migration(migrations.Migration):
+    atomic = True
+
+    dependencies = [
+        ('analytics', '0003_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_pagevisit),
+    ]
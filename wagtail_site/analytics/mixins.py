@@ -1,11 +1,12 @@
+from django.utils import timezone
+
 from apps.common import is_ajax
-from .models import PageVisit, Advertiser
-from .tasks import update_page_ipinfo
+from .buffer import get_visit_buffer
 
 
 class PageVisitLogMixin:
     def dispatch(self, request, *args, **kwargs):
-        # Log the page visit
+        # Log the page visit, it is written to the database by the visit buffer
         if not is_ajax(request) and not request.user_agent.is_bot:
             page_data = {
                 "path": request.path,
@@ -14,20 +15,13 @@ class PageVisitLogMixin:
                 "user_agent": request.META.get('HTTP_USER_AGENT'),
                 "referer": request.META.get('HTTP_REFERER'),
                 "session_id": request.session.session_key,
+                "created_at": timezone.now(),
             }
-            # get advertising ID from request
+            # get advertising ID from request, the advertiser is looked up when flushing
             advert_id = request.GET.get('wds')
-            if advert_id and (is_advertiser := Advertiser.objects.filter(tracking_no=advert_id)).exists():
-                advertiser = is_advertiser.first()
-
-                page_data["advertiser"] = advertiser
-                page_data["advertiser_name"] = advertiser.name
+            if advert_id:
+                page_data["tracking_no"] = advert_id
 
-            page = PageVisit.objects.create(
-                **page_data
-            )
-            
-            # Update the ipinfo
-            update_page_ipinfo(page)
+            get_visit_buffer().add(page_data)
 
-        return super().dispatch(request, *args, **kwargs)
\ No newline at end of file
+        return super().dispatch(request, *args, **kwargs)
@@ -83,4 +83,64 @@ class Advertiser(BaseModel):
 
     @cached_property
     def visits(self):
-        return self.page_visits.count()
\ No newline at end of file
+        return self.page_visits.count()
+
+class PageVisitRollup(models.Model):
+    """
+    Page visits pre-aggregated per hour or day, page, country and advertiser
+    """
+    GRANULARITY_CHOICES = [('hour', _("Hour")), ('day', _("Day"))]
+
+    granularity = models.CharField(_("Granularity"), max_length=4, choices=GRANULARITY_CHOICES)
+    period_start = models.DateTimeField(_("Period start"))
+    path = models.CharField(_("URL"), max_length=500)
+    country = models.CharField(_("Country"), max_length=3, blank=True, null=True)
+    advertiser_name = models.CharField(_("Advertiser name"), blank=True, null=True)
+    visits = models.PositiveIntegerField(_("Visits"), default=0)
+    visitors = models.PositiveIntegerField(_("Unique visitors"), default=0)
+    visitor_sketch = models.BinaryField(_("Visitor sketch"), help_text=_("HyperLogLog sketch of the visitors' IP addresses"))
+
+    class Meta:
+        app_label = 'analytics'
+        verbose_name = _("Page visit rollup")
+        verbose_name_plural = _("Page visit rollups")
+        indexes = [models.Index(fields=['granularity', 'period_start'], name='analytics_visit_rollup_idx')]
+
+    def __str__(self):
+        return self.path
+
+
+class UserSearchRollup(models.Model):
+    """
+    User searches pre-aggregated per hour or day and search term
+    """
+    granularity = models.CharField(_("Granularity"), max_length=4, choices=PageVisitRollup.GRANULARITY_CHOICES)
+    period_start = models.DateTimeField(_("Period start"))
+    query = models.CharField(_("Search term"), max_length=255)
+    searches = models.PositiveIntegerField(_("Searches"), default=0)
+    users = models.PositiveIntegerField(_("Users"), default=0)
+
+    class Meta:
+        app_label = 'analytics'
+        verbose_name = _("User search rollup")
+        verbose_name_plural = _("User search rollups")
+        indexes = [models.Index(fields=['granularity', 'period_start'], name='analytics_search_rollup_idx')]
+
+    def __str__(self):
+        return self.query
+
+
+class RollupState(models.Model):
+    """
+    High-water mark of each rollup, all periods starting before it have been aggregated
+    """
+    name = models.CharField(_("Name"), max_length=50, primary_key=True)
+    high_water_mark = models.DateTimeField(_("High-water mark"))
+
+    class Meta:
+        app_label = 'analytics'
+        verbose_name = _("Rollup state")
+        verbose_name_plural = _("Rollup states")
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,205 @@
+"""
+Time based partitioning and retention of page visits.
+
+On PostgreSQL, the table of :class:`PageVisit` is partitioned by month on ``created_at`` (see
+migration ``0004_partition_pagevisit``). Rows which existed before are kept in the partition
+``analytics_pagevisit_legacy`` and rows not covered by any monthly partition end up in
+``analytics_pagevisit_default``. Monthly partitions are created ahead of time by
+:func:`ensure_partitions`, and partitions older than the retention period are archived and
+dropped as a whole by :func:`prune_partitions`.
+
+Other database backends keep a single table, from which expired visits are archived and
+deleted month by month.
+"""
+import datetime
+import gzip
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+TABLE = 'analytics_pagevisit'
+LEGACY_PARTITION = TABLE + '_legacy'
+DEFAULT_PARTITION = TABLE + '_default'
+
+
+def get_month_start(moment):
+    """
+    :returns: The start of the month in UTC containing ``moment``, partitions are aligned to UTC months.
+    """
+    moment = moment.astimezone(datetime.timezone.utc)
+    return datetime.datetime(moment.year, moment.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
+def get_partition_name(month_start):
+    return '{}_p{:%Y_%m}'.format(TABLE, month_start)
+
+
+def is_partitioned(using=None):
+    conn = using or connection
+    if conn.vendor != 'postgresql':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def parse_bound(value):
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def get_partitions(using=None):
+    """
+    :returns: A list of ``(name, lower, upper)`` for each partition, where ``lower`` and ``upper``
+        are ``None`` for unbounded ranges and both are ``None`` for the default partition.
+    """
+    conn = using or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass", [TABLE])
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", bound)
+        if match:
+            partitions.append((name, parse_bound(match.group(1)), parse_bound(match.group(2))))
+        else:
+            partitions.append((name, None, None))
+    return sorted(partitions, key=lambda p: p[2] or datetime.datetime.max.replace(tzinfo=datetime.timezone.utc))
+
+
+def create_partition(month_start, using=None):
+    """
+    Create the partition of the given month. Rows of that month kept by the default partition
+    are moved into the new partition before attaching it.
+    """
+    conn = using or connection
+    name, month_end = get_partition_name(month_start), get_next_month(month_start)
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute('CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name, TABLE))
+        cursor.execute(
+            'WITH moved AS (DELETE FROM "{}" WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            'INSERT INTO "{}" SELECT * FROM moved'.format(DEFAULT_PARTITION, name), [month_start, month_end])
+        cursor.execute('ALTER TABLE "{}" ATTACH PARTITION "{}" FOR VALUES FROM (%s) TO (%s)'.format(TABLE, name),
+                       [month_start, month_end])
+    return name
+
+
+def ensure_partitions(ahead=None, now=None, using=None):
+    """
+    Create the partitions of the current month and the ``ahead`` following months, if missing.
+
+    :returns: The names of the created partitions.
+    """
+    if not is_partitioned(using):
+        return []
+    if ahead is None:
+        ahead = getattr(settings, 'ANALYTICS_PARTITIONS_AHEAD', 3)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    partitions = get_partitions(using)
+    # months before the upper bound of any existing range partition are covered already
+    covered = max((upper for _, lower, upper in partitions if upper), default=None)
+    created = []
+    month_start = get_month_start(now)
+    for _ in range(ahead + 1):
+        if covered is None or month_start >= covered:
+            created.append(create_partition(month_start, using))
+        month_start = get_next_month(month_start)
+    return created
+
+
+def archive_rows(queryset, path):
+    """
+    Write the rows of the given queryset as gzip compressed JSON Lines.
+
+    :returns: The number of archived rows.
+    """
+    count = 0
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as archive:
+        for row in queryset.order_by().values().iterator(chunk_size=5000):
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+            count += 1
+    return count
+
+
+def prune_partitions(cutoff, archive_dir=None, using=None):
+    """
+    Drop all partitions whose rows are older than ``cutoff``, after archiving them into
+    ``archive_dir``, if given. Expired rows which are kept by the default partition, or by a
+    partition reaching beyond ``cutoff``, are then pruned by :func:`prune_rows`, which also is
+    used on unpartitioned tables.
+
+    :returns: A list of ``(name, archived_rows)`` for each pruned partition or month.
+    """
+    from .models import PageVisit
+
+    if not is_partitioned(using):
+        return prune_rows(cutoff, archive_dir)
+
+    conn = using or connection
+    pruned = []
+    for name, lower, upper in get_partitions(using):
+        if upper is None or upper > cutoff:
+            continue
+        archived = None
+        if archive_dir:
+            queryset = PageVisit.objects.filter(created_at__lt=upper)
+            if lower is not None:
+                queryset = queryset.filter(created_at__gte=lower)
+            archived = archive_rows(queryset, os.path.join(archive_dir, name + '.jsonl.gz'))
+        with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+            cursor.execute('ALTER TABLE "{}" DETACH PARTITION "{}"'.format(TABLE, name))
+            cursor.execute('DROP TABLE "{}"'.format(name))
+        pruned.append((name, archived))
+    pruned.extend(prune_rows(cutoff, archive_dir))
+    return pruned
+
+
+def prune_rows(cutoff, archive_dir=None, batch_size=5000):
+    """
+    Archive and delete the visits older than ``cutoff`` month by month, for databases without
+    partitions and for expired rows not kept by a partition of their month. Rows are deleted in
+    batches of primary keys to keep transactions short.
+    """
+    from .models import PageVisit
+
+    pruned = []
+    first = PageVisit.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return pruned
+    # like partitions, only months which expired as a whole are pruned
+    month_start = get_month_start(first)
+    while get_next_month(month_start) <= cutoff:
+        month_end = get_next_month(month_start)
+        queryset = PageVisit.objects.filter(created_at__gte=month_start, created_at__lt=month_end)
+        if not queryset.exists():
+            # skip months without rows, such as those of dropped partitions, keeping their archives
+            month_start = month_end
+            continue
+        name = get_partition_name(month_start)
+        archived = None
+        if archive_dir:
+            archived = archive_rows(queryset, os.path.join(archive_dir, name + '.jsonl.gz'))
+        while True:
+            batch = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            PageVisit.objects.filter(pk__in=batch).delete()
+        pruned.append((name, archived))
+        month_start = get_next_month(month_start)
+    return pruned
@@ -0,0 +1,243 @@
+"""
+Incremental maintenance of the rollup tables, which keep page visits and user searches
+pre-aggregated per hour and per day.
+
+Each rollup keeps a high-water mark in :class:`RollupState`. All periods starting before that
+mark have been aggregated, and only periods which have been closed for at least
+``ANALYTICS_ROLLUP_DELAY`` seconds are aggregated, so that visits still held by the visit buffers
+are not missed. Reports combine the rollups of closed periods with the raw rows of the current,
+partial period.
+"""
+import datetime
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PageVisit, PageVisitRollup, RollupState, UserSearch, UserSearchRollup
+from .sketches import HyperLogLog
+
+GRANULARITIES = ['day', 'hour']
+
+# fields of PageVisit kept in its rollup
+PAGE_VISIT_DIMENSIONS = ['path', 'country', 'advertiser_name']
+
+SKETCH_PRECISION = 12
+
+
+def get_period_start(moment, granularity):
+    """
+    :returns: The start of the hour or day, in the current time zone, containing ``moment``.
+    """
+    local = timezone.localtime(moment)
+    if granularity == 'day':
+        return timezone.make_aware(datetime.datetime.combine(local.date(), datetime.time.min))
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def get_period_end(start, granularity):
+    if granularity == 'day':
+        next_day = timezone.localtime(start).date() + datetime.timedelta(days=1)
+        return timezone.make_aware(datetime.datetime.combine(next_day, datetime.time.min))
+    # add the hour in UTC, since local hours are ambiguous when daylight saving time ends
+    return timezone.localtime(start.astimezone(datetime.timezone.utc) + datetime.timedelta(hours=1))
+
+
+def load_sketch(data):
+    return HyperLogLog.from_bytes(zlib.decompress(bytes(data)), SKETCH_PRECISION)
+
+
+def dump_sketch(sketch):
+    # registers of small sketches are mostly zero and compress well
+    return zlib.compress(sketch.to_bytes())
+
+
+class PageVisitRollupBuilder:
+    name = 'page-visits'
+    model = PageVisit
+    date_field = 'created_at'
+    rollup_model = PageVisitRollup
+
+    def build(self, granularity, start, end):
+        groups = defaultdict(lambda: [0, set()])
+        rows = self.model.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+        for *key, ip_address in rows.values_list(*PAGE_VISIT_DIMENSIONS, 'ip_address').iterator(chunk_size=5000):
+            group = groups[tuple(key)]
+            group[0] += 1
+            if ip_address:
+                group[1].add(ip_address)
+        rollups = []
+        for key, (visits, ip_addresses) in groups.items():
+            sketch = HyperLogLog(SKETCH_PRECISION)
+            sketch.update(ip_addresses)
+            rollups.append(self.rollup_model(
+                granularity=granularity,
+                period_start=start,
+                visits=visits,
+                visitors=len(ip_addresses),
+                visitor_sketch=dump_sketch(sketch),
+                **dict(zip(PAGE_VISIT_DIMENSIONS, key)),
+            ))
+        return rollups
+
+
+class UserSearchRollupBuilder:
+    name = 'user-searches'
+    model = UserSearch
+    date_field = 'date_created'
+    rollup_model = UserSearchRollup
+
+    def build(self, granularity, start, end):
+        groups = defaultdict(lambda: [0, set()])
+        rows = self.model.objects.filter(date_created__gte=start, date_created__lt=end).order_by()
+        for query, user_id in rows.values_list('query', 'user_id').iterator(chunk_size=5000):
+            groups[query][0] += 1
+            groups[query][1].add(user_id)
+        return [
+            self.rollup_model(granularity=granularity, period_start=start, query=query,
+                              searches=searches, users=len(users))
+            for query, (searches, users) in groups.items()
+        ]
+
+
+builders = [PageVisitRollupBuilder(), UserSearchRollupBuilder()]
+
+
+def get_high_water_mark(name, granularity):
+    state = RollupState.objects.filter(name='{}-{}'.format(name, granularity)).first()
+    return state.high_water_mark if state else None
+
+
+def update_rollup(builder, granularity, now=None):
+    """
+    Aggregate all closed periods of the given granularity, which have not been aggregated yet.
+
+    :returns: The number of periods aggregated.
+    """
+    now = now or timezone.now()
+    delay = datetime.timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_DELAY', 300))
+    until = get_period_start(now - delay, granularity)
+    name = '{}-{}'.format(builder.name, granularity)
+    dates = builder.model.objects.order_by(builder.date_field).values_list(builder.date_field, flat=True)
+    mark = get_high_water_mark(builder.name, granularity)
+    if mark is None:
+        first = dates.first()
+        if first is None:
+            return 0
+        mark = get_period_start(first, granularity)
+
+    periods = 0
+    while mark < until:
+        end = get_period_end(mark, granularity)
+        with transaction.atomic():
+            # aggregating a period again replaces its rollups
+            builder.rollup_model.objects.filter(granularity=granularity, period_start=mark).delete()
+            rollups = builder.build(granularity, mark, end)
+            builder.rollup_model.objects.bulk_create(rollups)
+            if not rollups:
+                # skip the following periods without any rows
+                following = dates.filter(**{builder.date_field + '__gte': end}).first()
+                end = min(get_period_start(following, granularity), until) if following else until
+                end = max(end, get_period_end(mark, granularity))
+            RollupState.objects.update_or_create(name=name, defaults={'high_water_mark': end})
+        periods += 1
+        mark = end
+    return periods
+
+
+def update_rollups(now=None):
+    """
+    Bring all rollup tables up to date.
+
+    :returns: A dict mapping each rollup name onto the number of periods aggregated.
+    """
+    return {
+        '{}-{}'.format(builder.name, granularity): update_rollup(builder, granularity, now)
+        for builder in builders for granularity in GRANULARITIES
+    }
+
+
+def get_covered_ranges(name, start=None, end=None):
+    """
+    Split the range from ``start`` to ``end`` into the parts covered by the daily and hourly
+    rollups. Each part is given as ``(granularity, lower, upper)``, where ``lower`` may be
+    ``None`` for an open start.
+
+    :returns: A list of those parts and the point in time from which raw rows must be read.
+    """
+    ranges = []
+    cursor = start
+    for granularity in GRANULARITIES:
+        mark = get_high_water_mark(name, granularity)
+        if mark is None or (cursor is not None and get_period_start(cursor, granularity) != cursor):
+            continue
+        upper = mark if end is None else min(mark, get_period_start(end, granularity))
+        if cursor is not None and upper <= cursor:
+            continue
+        ranges.append((granularity, cursor, upper))
+        cursor = upper
+    return ranges, cursor
+
+
+def summarize_page_visits(field, start=None, end=None, **filters):
+    """
+    Count the visits and estimate the unique visitors, grouped by one of the dimensions in
+    ``PAGE_VISIT_DIMENSIONS``, reading the rollups for closed periods and raw rows otherwise.
+
+    :param start: Optional point in time from which on visits are counted.
+
+    :param end: Optional point in time before which visits are counted.
+
+    :param filters: Lookups on the dimensions of the rollup, applied to rollups and raw rows.
+
+    :returns: A dict mapping each value of ``field`` onto a dict with its ``visits`` and ``visitors``.
+    """
+    results = defaultdict(lambda: [0, HyperLogLog(SKETCH_PRECISION)])
+    ranges, cursor = get_covered_ranges(PageVisitRollupBuilder.name, start, end)
+    for granularity, lower, upper in ranges:
+        rollups = PageVisitRollup.objects.filter(granularity=granularity, period_start__lt=upper, **filters)
+        if lower is not None:
+            rollups = rollups.filter(period_start__gte=lower)
+        for value, visits, sketch in rollups.values_list(field, 'visits', 'visitor_sketch').iterator():
+            results[value][0] += visits
+            results[value][1].merge(load_sketch(sketch))
+
+    visits = PageVisit.objects.filter(**filters).order_by()
+    if cursor is not None:
+        visits = visits.filter(created_at__gte=cursor)
+    if end is not None:
+        visits = visits.filter(created_at__lt=end)
+    for value, ip_address in visits.values_list(field, 'ip_address').iterator(chunk_size=5000):
+        results[value][0] += 1
+        if ip_address:
+            results[value][1].add(ip_address)
+
+    return {
+        value: {field: value, 'visits': visits, 'visitors': sketch.count()}
+        for value, (visits, sketch) in results.items()
+    }
+
+
+def summarize_searches(start=None, end=None):
+    """
+    Count the searches per search term, reading the rollups for closed periods and raw rows otherwise.
+    """
+    results = defaultdict(int)
+    ranges, cursor = get_covered_ranges(UserSearchRollupBuilder.name, start, end)
+    for granularity, lower, upper in ranges:
+        rollups = UserSearchRollup.objects.filter(granularity=granularity, period_start__lt=upper)
+        if lower is not None:
+            rollups = rollups.filter(period_start__gte=lower)
+        for query, searches in rollups.values_list('query', 'searches').iterator():
+            results[query] += searches
+
+    searches = UserSearch.objects.order_by()
+    if cursor is not None:
+        searches = searches.filter(date_created__gte=cursor)
+    if end is not None:
+        searches = searches.filter(date_created__lt=end)
+    for query in searches.values_list('query', flat=True).iterator(chunk_size=5000):
+        results[query] += 1
+    return dict(results)
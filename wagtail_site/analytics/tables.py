@@ -1,4 +1,5 @@
 import django_tables2 as tables
+from django.utils.translation import gettext_lazy as _
 
 from .models import PageVisit
 
@@ -11,3 +12,11 @@ class PageVisitReportTable(tables.Table):
         model = PageVisit
         fields = ['path','contry','city','ip_address']
         attrs = {"class": "table table-shadow table-striped w-100","id":"page_visti_table",'tf':{'class':'text-end'}}
+
+
+class UserSearchReportTable(tables.Table):
+    query = tables.Column(verbose_name=_("Search term"))
+    searches = tables.Column(verbose_name=_("Searches"), attrs={'td': {'class': 'text-end'}})
+
+    class Meta:
+        attrs = {"class": "table table-shadow table-striped w-100", "id": "user_search_table"}
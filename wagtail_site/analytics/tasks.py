@@ -1,7 +1,7 @@
 import traceback
 from uwsgi_tasks import task, TaskExecutor
 
-from .dataclasses import IPInfo
+from .geolocation import get_location_fields
 from .utils import get_ip_address_info
 
 
@@ -14,24 +14,7 @@ def update_page_ipinfo(page):
         if not ip_info:
             return
 
-        ip_info_data = IPInfo(
-            ip=ip_info.get('ip'),
-            country=ip_info.get('country'),
-            city=ip_info.get('city'),
-            region=ip_info.get('region'),
-            loc=ip_info.get('loc'),
-            org=ip_info.get('org'),
-            timezone=ip_info.get('timezone'),
-            hostname=ip_info.get('hostname')
-        )
-        location_lat, location_lng = tuple(ip_info_data.loc.split(","))
-
-        page.update(
-            country=ip_info_data.country,
-            city=ip_info_data.city,
-            location_lat=location_lat,
-            location_lng=location_lng,
-        )
+        page.update(**get_location_fields(ip_info))
 
     except Exception as ex:
         st_trace = traceback.format_exc()
@@ -0,0 +1,55 @@
+import atexit
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from wagtail_site.analytics.buffer import VisitBuffer
+
+
+class VisitBufferTest(SimpleTestCase):
+    def get_visit(self, path='/'):
+        return {'path': path, 'method': 'GET', 'ip_address': None, 'created_at': timezone.now()}
+
+    def get_buffer(self, **kwargs):
+        # the background thread never flushes during a test
+        visit_buffer = VisitBuffer(size=100, interval=3600, capacity=3, **kwargs)
+        self.addCleanup(atexit.unregister, visit_buffer.flush)
+        self.addCleanup(visit_buffer.visits.clear)
+        return visit_buffer
+
+    def test_full_buffer_spills_into_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'visits.db')
+            visit_buffer = self.get_buffer(spool=path)
+            for number in range(4):
+                visit_buffer.add(self.get_visit('/{}/'.format(number)))
+            conn = sqlite3.connect(path)
+            try:
+                spooled = conn.execute("SELECT COUNT(*) FROM visit").fetchone()[0]
+            finally:
+                conn.close()
+        self.assertEqual(spooled, 3)
+        self.assertEqual([visit['path'] for visit in visit_buffer.visits], ['/3/'])
+        self.assertEqual(visit_buffer.dropped, 0)
+
+    @mock.patch('wagtail_site.analytics.buffer.write_visits')
+    def test_full_buffer_writes_visits(self, write_visits):
+        visit_buffer = self.get_buffer()
+        for number in range(4):
+            visit_buffer.add(self.get_visit('/{}/'.format(number)))
+        write_visits.assert_called_once()
+        self.assertEqual([visit['path'] for visit in write_visits.call_args[0][0]], ['/0/', '/1/', '/2/'])
+        self.assertEqual(len(visit_buffer.visits), 1)
+
+    @mock.patch('wagtail_site.analytics.buffer.write_visits', side_effect=RuntimeError("database unavailable"))
+    def test_counts_dropped_visits(self, write_visits):
+        visit_buffer = self.get_buffer()
+        with self.assertLogs('analytics', 'ERROR'):
+            for number in range(4):
+                visit_buffer.add(self.get_visit('/{}/'.format(number)))
+        self.assertEqual(visit_buffer.dropped, 3)
+        self.assertEqual(len(visit_buffer.visits), 1)
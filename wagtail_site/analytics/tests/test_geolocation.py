@@ -0,0 +1,77 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from wagtail_site.analytics.buffer import write_visits
+from wagtail_site.analytics.geolocation import RangeFileResolver, get_location_fields
+from wagtail_site.analytics.models import PageVisit
+
+RANGES = """start,end,country,city,region,latitude,longitude
+154.160.0.0,154.160.255.255,GH,Accra,Greater Accra,5.6037,-0.1870
+10.0.0.0,10.255.255.255,,,,,
+2001:db8::,2001:db8::ffff,DE,Berlin,,52.52,13.40
+41.66.0.0,41.66.127.255,GH,Kumasi,Ashanti,6.6885,-1.6244
+"""
+
+
+def get_resolver():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'ranges.csv')
+        with open(path, 'w', encoding='utf-8') as csvfile:
+            csvfile.write(RANGES)
+        return RangeFileResolver(path, cache_size=16)
+
+
+class RangeFileResolverTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.resolver = get_resolver()
+
+    def test_resolves_addresses_inside_ranges(self):
+        ip_info = self.resolver.resolve('154.160.14.80')
+        self.assertEqual((ip_info.country, ip_info.city, ip_info.region), ('GH', 'Accra', 'Greater Accra'))
+        self.assertEqual(ip_info.loc, '5.6037,-0.1870')
+        # rows are not required to be sorted
+        self.assertEqual(self.resolver.resolve('41.66.127.255').city, 'Kumasi')
+        self.assertEqual(self.resolver.resolve('41.66.0.0').city, 'Kumasi')
+
+    def test_resolves_ipv6_addresses(self):
+        ip_info = self.resolver.resolve('2001:db8::1')
+        self.assertEqual((ip_info.country, ip_info.city, ip_info.region), ('DE', 'Berlin', None))
+
+    def test_unknown_addresses(self):
+        self.assertIsNone(self.resolver.resolve('41.66.128.0'))
+        self.assertIsNone(self.resolver.resolve('1.1.1.1'))
+        self.assertIsNone(self.resolver.resolve('2001:db9::1'))
+        self.assertIsNone(self.resolver.resolve('not an address'))
+
+    def test_ranges_without_location(self):
+        ip_info = self.resolver.resolve('10.1.2.3')
+        self.assertEqual((ip_info.country, ip_info.loc), (None, None))
+        self.assertEqual(get_location_fields(ip_info), {'country': None, 'city': None})
+
+    def test_resolve_many(self):
+        locations = self.resolver.resolve_many(['154.160.1.1', '1.1.1.1', None, '154.160.1.1'])
+        self.assertEqual(set(locations), {'154.160.1.1', '1.1.1.1'})
+        self.assertIsNone(locations['1.1.1.1'])
+        self.assertEqual(get_location_fields(locations['154.160.1.1']), {
+            'country': 'GH', 'city': 'Accra', 'location_lat': '5.6037', 'location_lng': '-0.1870'})
+
+
+class WriteVisitsTest(TestCase):
+    def test_visits_are_located_when_written(self):
+        visits = [
+            {'path': '/', 'method': 'GET', 'ip_address': '154.160.14.80', 'created_at': timezone.now()},
+            {'path': '/shop/', 'method': 'GET', 'ip_address': '1.1.1.1', 'created_at': timezone.now()},
+        ]
+        with mock.patch('wagtail_site.analytics.geolocation._resolver', get_resolver()):
+            write_visits(visits)
+        located, unknown = PageVisit.objects.order_by('pk')
+        self.assertEqual((located.country, located.city), ('GH', 'Accra'))
+        self.assertEqual((located.location_lat, located.location_lng), (Decimal('5.6037'), Decimal('-0.187')))
+        self.assertEqual((unknown.country, unknown.city, unknown.location_lat), (None, None, None))
@@ -0,0 +1,103 @@
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from wagtail_site.analytics import partitions
+from wagtail_site.analytics.models import PageVisit
+
+
+def create_visit(created_at, path='/'):
+    visit = PageVisit.objects.create(path=path, method='GET')
+    PageVisit.objects.filter(pk=visit.pk).update(created_at=created_at)
+    return visit
+
+
+def add_months(month_start, months):
+    for _ in range(months):
+        month_start = partitions.get_next_month(month_start)
+    for _ in range(-months):
+        month_start = partitions.get_month_start(month_start - datetime.timedelta(days=1))
+    return month_start
+
+
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line) for line in archive]
+
+
+class PruneRowsTest(TestCase):
+    def test_prunes_expired_months(self):
+        this_month = partitions.get_month_start(timezone.now())
+        # no visits are kept for the month in between
+        oldest, older = add_months(this_month, -3), add_months(this_month, -1)
+        create_visit(oldest + datetime.timedelta(days=1), '/oldest/')
+        create_visit(older + datetime.timedelta(days=2), '/older/')
+        kept = create_visit(this_month + datetime.timedelta(hours=1), '/kept/')
+
+        with tempfile.TemporaryDirectory() as directory:
+            pruned = partitions.prune_rows(this_month, archive_dir=directory)
+            # months without visits are skipped
+            self.assertEqual(pruned, [(partitions.get_partition_name(oldest), 1),
+                                      (partitions.get_partition_name(older), 1)])
+            self.assertEqual(sorted(os.listdir(directory)), sorted(name + '.jsonl.gz' for name, _ in pruned))
+            rows = read_archive(os.path.join(directory, pruned[0][0] + '.jsonl.gz'))
+            self.assertEqual([row['path'] for row in rows], ['/oldest/'])
+        self.assertEqual(list(PageVisit.objects.values_list('pk', flat=True)), [kept.pk])
+
+
+@skipUnless(connection.vendor == 'postgresql', "requires PostgreSQL")
+class PartitionTest(TestCase):
+    def setUp(self):
+        # the legacy partition covers the current month, monthly partitions the following ones
+        self.next_month = add_months(partitions.get_month_start(timezone.now()), 1)
+        # beyond the partitions created ahead by the migration, hence kept by the default partition
+        self.future_month = add_months(self.next_month, 7)
+
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM "{}"'.format(table))
+            return cursor.fetchone()[0]
+
+    def test_table_is_partitioned(self):
+        self.assertTrue(partitions.is_partitioned())
+        names = [name for name, _, _ in partitions.get_partitions()]
+        self.assertIn(partitions.LEGACY_PARTITION, names)
+        self.assertIn(partitions.DEFAULT_PARTITION, names)
+        self.assertIn(partitions.get_partition_name(self.next_month), names)
+
+    def test_ensure_partitions_moves_rows_from_default(self):
+        visit = create_visit(self.future_month + datetime.timedelta(days=3))
+        self.assertEqual(self.count_rows(partitions.DEFAULT_PARTITION), 1)
+        created = partitions.ensure_partitions(ahead=0, now=self.future_month)
+        name = partitions.get_partition_name(self.future_month)
+        self.assertEqual(created, [name])
+        self.assertEqual(self.count_rows(partitions.DEFAULT_PARTITION), 0)
+        self.assertEqual(self.count_rows(name), 1)
+        self.assertTrue(PageVisit.objects.filter(pk=visit.pk).exists())
+
+    def test_prunes_partitions_and_rows_of_default_partition(self):
+        create_visit(self.next_month + datetime.timedelta(days=1), '/partitioned/')
+        create_visit(self.future_month + datetime.timedelta(days=1), '/default/')
+        cutoff = add_months(self.future_month, 1)
+        kept = create_visit(cutoff + datetime.timedelta(days=1), '/kept/')
+        # run the deferred foreign key checks of this test's transaction, before dropping tables
+        connection.check_constraints()
+
+        with tempfile.TemporaryDirectory() as directory:
+            pruned = dict(partitions.prune_partitions(cutoff, archive_dir=directory))
+            self.assertEqual(pruned[partitions.get_partition_name(self.next_month)], 1)
+            self.assertEqual(pruned[partitions.get_partition_name(self.future_month)], 1)
+            self.assertIn(partitions.LEGACY_PARTITION, pruned)
+            path = os.path.join(directory, partitions.get_partition_name(self.future_month) + '.jsonl.gz')
+            self.assertEqual([row['path'] for row in read_archive(path)], ['/default/'])
+        self.assertEqual(list(PageVisit.objects.values_list('pk', flat=True)), [kept.pk])
+        names = [name for name, _, _ in partitions.get_partitions()]
+        self.assertNotIn(partitions.LEGACY_PARTITION, names)
+        self.assertIn(partitions.DEFAULT_PARTITION, names)
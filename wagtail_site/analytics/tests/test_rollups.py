@@ -0,0 +1,83 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from wagtail_site.analytics import rollups
+from wagtail_site.analytics.models import PageVisit, PageVisitRollup, UserSearch, UserSearchRollup
+
+
+def at(hour, minute=0, day=9):
+    return timezone.make_aware(datetime.datetime(2026, 3, day, hour, minute))
+
+
+def create_visit(created_at, path='/', ip_address=None):
+    visit = PageVisit.objects.create(path=path, method='GET', ip_address=ip_address)
+    PageVisit.objects.filter(pk=visit.pk).update(created_at=created_at)
+    return visit
+
+
+@override_settings(ANALYTICS_ROLLUP_DELAY=300)
+class UpdateRollupTest(TestCase):
+    builder = rollups.PageVisitRollupBuilder()
+
+    def get_periods(self, granularity='hour'):
+        rows = PageVisitRollup.objects.filter(granularity=granularity).order_by('period_start', 'path')
+        return list(rows.values_list('period_start', 'path', 'visits', 'visitors'))
+
+    def test_nothing_to_aggregate(self):
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(12)), 0)
+        self.assertIsNone(rollups.get_high_water_mark(self.builder.name, 'hour'))
+
+    def test_skips_empty_periods(self):
+        create_visit(at(5, 10), '/a/', '10.0.0.1')
+        create_visit(at(5, 50), '/a/', '10.0.0.1')
+        create_visit(at(11, 20), '/b/', '10.0.0.2')
+        # the hours from 06:00 to 10:00 without visits are aggregated as one period
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(12, 30)), 3)
+        self.assertEqual(self.get_periods(), [(at(5), '/a/', 2, 1), (at(11), '/b/', 1, 1)])
+        self.assertEqual(rollups.get_high_water_mark(self.builder.name, 'hour'), at(12))
+
+    def test_resumes_from_high_water_mark(self):
+        create_visit(at(11, 20), '/a/')
+        rollups.update_rollup(self.builder, 'hour', now=at(12, 30))
+        # aggregated periods are not read again
+        PageVisit.objects.all().delete()
+        create_visit(at(12, 10), '/b/')
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(13, 30)), 1)
+        self.assertEqual(self.get_periods(), [(at(11), '/a/', 1, 0), (at(12), '/b/', 1, 0)])
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(13, 30)), 0)
+
+    def test_waits_for_delay_after_end_of_period(self):
+        create_visit(at(11, 59), '/a/')
+        # visits of the last hour may still be held by the visit buffers
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(12, 4)), 0)
+        self.assertEqual(self.get_periods(), [])
+        self.assertEqual(rollups.update_rollup(self.builder, 'hour', now=at(12, 5)), 1)
+        self.assertEqual(self.get_periods(), [(at(11), '/a/', 1, 0)])
+
+    def test_aggregates_days(self):
+        create_visit(at(9, day=7), '/a/', '10.0.0.1')
+        create_visit(at(18, day=7), '/a/', '10.0.0.2')
+        create_visit(at(9, day=9), '/a/', '10.0.0.1')
+        self.assertEqual(rollups.update_rollup(self.builder, 'day', now=at(12, day=10)), 3)
+        self.assertEqual(self.get_periods('day'), [(at(0, day=7), '/a/', 2, 2), (at(0, day=9), '/a/', 1, 1)])
+        self.assertEqual(rollups.get_high_water_mark(self.builder.name, 'day'), at(0, day=10))
+
+
+class SummarizeTest(TestCase):
+    def test_combines_rollups_with_raw_rows(self):
+        user = get_user_model().objects.create(username='searcher')
+        now = timezone.now()
+        for query in ['mug', 'mug', 'tea']:
+            search = UserSearch.objects.create(user=user, query=query)
+            UserSearch.objects.filter(pk=search.pk).update(date_created=now - datetime.timedelta(days=2))
+        rollups.update_rollups(now)
+        self.assertTrue(UserSearchRollup.objects.exists())
+
+        # aggregated searches are read from the rollups, the recent ones from the raw rows
+        UserSearch.objects.all().delete()
+        UserSearch.objects.create(user=user, query='mug')
+        self.assertEqual(rollups.summarize_searches(), {'mug': 3, 'tea': 1})
+        self.assertEqual(rollups.summarize_searches(start=rollups.get_period_start(now, 'day')), {'mug': 1})
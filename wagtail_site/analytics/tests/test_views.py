@@ -0,0 +1,134 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from wagtail_site.analytics import rollups
+from wagtail_site.analytics.models import PageVisit, UserSearch
+from wagtail_site.analytics.views import GroupedPageVisitReport, UserSearchReport
+
+VISITS = [
+    ('/', 'GH', 'Accra', 'Google', '154.160.14.80'),
+    ('/', 'GH', 'Accra', 'Google', '154.160.14.80'),
+    ('/', 'GH', 'Kumasi', None, '41.66.0.1'),
+    ('/shop/', 'GH', 'Kumasi', 'Google', '41.66.0.1'),
+    ('/shop/', 'DE', 'Berlin', None, '2001:db8::1'),
+    ('/shop/', 'DE', 'Berlin', None, None),
+]
+
+
+class GroupedPageVisitReportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        for path, country, city, advertiser_name, ip_address in VISITS:
+            PageVisit.objects.create(path=path, method='GET', country=country, city=city,
+                                     advertiser_name=advertiser_name, ip_address=ip_address)
+        # keep all visits inside the reported day, whenever the test runs
+        noon = timezone.make_aware(datetime.datetime.combine(cls.today, datetime.time(12)))
+        PageVisit.objects.update(created_at=noon)
+
+    def get_view(self, group_by=None, use_rollups=True, **params):
+        params.setdefault('start_date', self.today.isoformat())
+        view = GroupedPageVisitReport()
+        view.setup(RequestFactory().get('/', params), group_by=group_by)
+        view.group_filter = group_by
+        view.use_rollups = use_rollups
+        return view
+
+    def get_expected_summary(self, field):
+        summary = {}
+        for visit in PageVisit.objects.all():
+            value = getattr(visit, field)
+            row = summary.setdefault(value, {'visits': 0, 'visitors': set()})
+            row['visits'] += 1
+            if visit.ip_address:
+                row['visitors'].add(visit.ip_address)
+        return {value: (row['visits'], len(row['visitors'])) for value, row in summary.items()}
+
+    def get_counts(self, summary):
+        return {value: (row['visits'], row['visitors']) for value, row in summary.items()}
+
+    def test_groups_visits_by_field(self):
+        view = self.get_view('country', use_rollups=False)
+        # only the summary is read, the visits of each group are fetched by its paginated table
+        with self.assertNumQueries(1):
+            groups = view.group_queryset()
+        # most visited groups first
+        self.assertEqual(view.group_by, [('GH', 'GH'), ('DE', 'DE')])
+        for (country, _), visits in zip(view.group_by, groups):
+            expected = PageVisit.objects.filter(country=country).order_by('-id')
+            self.assertEqual(list(visits), list(expected))
+
+    def test_groups_by_path_by_default(self):
+        view = self.get_view('unknown')
+        self.assertEqual(view.get_group_field(), 'path')
+        groups = dict(zip((name for name, _ in view.get_report_groups()), view.group_queryset()))
+        self.assertEqual({path: visits.count() for path, visits in groups.items()}, {'/': 3, '/shop/': 3})
+
+    def test_export_reads_all_groups_at_once(self):
+        view = self.get_view('city', _export='csv')
+        visits = view.get_queryset()
+        expected = list(PageVisit.objects.order_by('city', '-id'))
+        with self.assertNumQueries(1):
+            self.assertEqual(list(visits), expected)
+
+    def test_context_contains_summary_of_groups(self):
+        view = self.get_view('country')
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        self.assertEqual([(row['name'], row['visits'], row['visitors']) for row in context['group_summary']],
+                         [('GH', 4, 2), ('DE', 2, 1)])
+        self.assertEqual(context['group_field_label'], PageVisit._meta.get_field('country').verbose_name)
+
+    def test_summary_matches_visits(self):
+        for group_by, field in [(None, 'path'), ('country', 'country'), ('city', 'city'),
+                                ('advert', 'advertiser_name')]:
+            expected = self.get_expected_summary(field)
+            for use_rollups in [True, False]:
+                with self.subTest(group_by=group_by, use_rollups=use_rollups):
+                    summary = self.get_view(group_by, use_rollups).get_group_summary()
+                    self.assertEqual(self.get_counts(summary), expected)
+
+    def test_summary_reads_closed_days_from_rollups(self):
+        expected = self.get_expected_summary('country')
+        tomorrow = timezone.make_aware(datetime.datetime.combine(
+            self.today + datetime.timedelta(days=1), datetime.time(12)))
+        rollups.update_rollups(now=tomorrow)
+        # the summary of the closed day no longer depends on the raw visits
+        PageVisit.objects.all().delete()
+        summary = self.get_view('country').get_group_summary()
+        self.assertEqual(self.get_counts(summary), expected)
+        # unless it is filtered by a field, which is not kept in the rollups
+        summary = self.get_view('country', city='Accra').get_group_summary()
+        self.assertEqual(summary, {})
+
+
+class UserSearchReportTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='searcher')
+        self.yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        noon = timezone.make_aware(datetime.datetime.combine(self.yesterday, datetime.time(12)))
+        for query in ['tea', 'mug', 'mug']:
+            search = UserSearch.objects.create(user=self.user, query=query)
+            UserSearch.objects.filter(pk=search.pk).update(date_created=noon)
+
+    def get_rows(self, **params):
+        view = UserSearchReport()
+        view.setup(RequestFactory().get('/', params))
+        return [(row['query'], row['searches']) for row in view.get_queryset()]
+
+    def test_counts_searches_per_term(self):
+        self.assertEqual(self.get_rows(start_date=self.yesterday.isoformat()), [('mug', 2), ('tea', 1)])
+        self.assertEqual(self.get_rows(start_date=self.yesterday.isoformat(),
+                                       end_date=self.yesterday.isoformat()), [('mug', 2), ('tea', 1)])
+        # searching today by default
+        self.assertEqual(self.get_rows(), [])
+
+    def test_reads_closed_days_from_rollups(self):
+        rollups.update_rollups()
+        # the searches of the closed day no longer depend on the raw searches
+        UserSearch.objects.all().delete()
+        UserSearch.objects.create(user=self.user, query='tea')
+        self.assertEqual(self.get_rows(start_date=self.yesterday.isoformat()), [('mug', 2), ('tea', 2)])
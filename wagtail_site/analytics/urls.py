@@ -41,5 +41,9 @@ urlpatterns += [
                      permissions_required(['analytics.view_pagevisit'], DASHBOARD_LOGIN_URL)(analytics_views.GroupedPageVisitReport.as_view()),
                      name="page-visit-report"),
 
+        path('analytics/search/',
+                     permissions_required(['analytics.view_usersearch'], DASHBOARD_LOGIN_URL)(analytics_views.UserSearchReport.as_view()),
+                     name="search-report"),
+
     ]))  #
 ]
\ No newline at end of file
@@ -2,15 +2,11 @@ from greyspace import settings
 import requests
 
 
-# get country with ip address from ipinfo.io
+# get country with ip address from the configured geolocation resolver
 def get_ip_address_info(ip_address):
-    address = '154.160.14.80' if ip_address == '127.0.0.1' else ip_address
-    url = "https://ipinfo.io/%s?token=%s" % (address, settings.IPINFO_TOKEN)
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return None
+    from .geolocation import get_resolver
+
+    return get_resolver().resolve(ip_address)
 
 
 def verify_google_recaptcha(request):
@@ -1,14 +1,23 @@
-from itertools import chain
+import datetime
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Q
 
-from apps.analytics.models import PageVisit
+from apps.analytics.models import PageVisit, UserSearch
 from apps.common.views import GeneralReportListView
 from . import forms
+from . import rollups
 from . import tables
 
 
+def get_day_start(date):
+    """
+    Return the start of the given day in the current time zone. Filtering on ranges of
+    `created_at`, rather than on its date, lets the database use its index and skip partitions.
+    """
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
 class PageVisitReportListView(GeneralReportListView):
     template_name = 'analytics/grouped-analytics-report.html'
     model = PageVisit
@@ -46,7 +55,8 @@ class PageVisitReportListView(GeneralReportListView):
             q_objects = Q()
             if data.get('start_date') and data.get('end_date'):
                 q_objects &= Q(**{
-                    f'created_at__date__gte': data['start_date'], f'created_at__date__lte': data['end_date']
+                    'created_at__gte': get_day_start(data['start_date']),
+                    'created_at__lt': get_day_start(data['end_date'] + datetime.timedelta(days=1)),
                 })
 
                 self.descriptions.append(
@@ -58,20 +68,20 @@ class PageVisitReportListView(GeneralReportListView):
 
             elif data.get('start_date'):
                 q_objects &= Q(**{
-                    f'created_at__date__gte': data['start_date']
+                    'created_at__gte': get_day_start(data['start_date'])
                 })
                 self.descriptions.append(
                     _('Viewed on "{start_date}"').format(
-                        start_date=['start_date'].strftime("%b %d %Y")
+                        start_date=data['start_date'].strftime("%b %d %Y")
                     )
                 )
             elif data.get('end_date') and len(data.get('end_date')) > 0:
                 q_objects &= Q(**{
-                    f'created_at__date__lte': data['end_date']
+                    'created_at__lt': get_day_start(data['end_date'] + datetime.timedelta(days=1))
                 })
                 self.descriptions.append(
                     _('Date up to "{end_date}"').format(
-                        end_date=['end_date'].strftime("%b %d %Y")
+                        end_date=data['end_date'].strftime("%b %d %Y")
                     )
                 )
 
@@ -96,13 +106,14 @@ class PageVisitReportListView(GeneralReportListView):
             qs = qs.filter(q_objects)
 
         else:
-            today = timezone.now().strftime('%Y-%m-%d')
+            today = timezone.localdate()
 
             self.descriptions.append(
                 _('Visited Today')
             )
             qs = qs.filter(Q(**{
-                f'created_at__date': today
+                'created_at__gte': get_day_start(today),
+                'created_at__lt': get_day_start(today + datetime.timedelta(days=1)),
             }))
 
         return qs
@@ -122,6 +133,14 @@ class PageVisitReportListView(GeneralReportListView):
 
 
 class GroupedPageVisitReport(PageVisitReportListView):
+    # the field of PageVisit to group by for each value of the URL parameter `group_by`
+    group_fields = {
+        'city': 'city',
+        'country': 'country',
+        'advert': 'advertiser_name',
+    }
+    default_group_field = 'path'
+    use_rollups = True
 
     def get(self, request, *args, **kwargs):
         self.group_filter = kwargs.get("group_by")
@@ -136,49 +155,150 @@ class GroupedPageVisitReport(PageVisitReportListView):
     def get_model_group_by(self):
         return self.group_filter
 
+    def get_group_field(self):
+        return self.group_fields.get(self.group_filter, self.default_group_field)
+
     def get_report_groups(self):
-        if self.group_filter == 'city':
-            report_groups = list(
-                set(self.model.objects.values_list("city", "city")))
-        elif self.group_filter == 'country':
-            report_groups = list(
-                set(self.model.objects.values_list("country","country")))
-        elif self.group_filter == 'advert':
-            report_groups = list(
-                set(self.model.objects.values_list("advertiser_name","advertiser_name")))
+        """
+        The groups are the values of the group field having visits, most visited first, as
+        counted by the summary of the groups.
+        """
+        summary = self.get_group_summary()
+        names = sorted(summary, key=lambda name: (-summary[name]['visits'], name is None, name or ''))
+        self.group_by = [(name, name) for name in names]
+        return self.group_by
+
+    def get_group_summary(self):
+        """
+        Count the visits and unique visitors of each group. If the group and the filters are
+        covered by the rollup tables, they are read for closed periods and the unique visitors
+        are estimated. Otherwise one GROUP BY query on the page visits is used.
+        """
+        if hasattr(self, 'group_summary'):
+            return self.group_summary
+
+        field = self.get_group_field()
+        queryset = self.get_filtered_queryset()
+        if self.filter_form.is_valid():
+            data = self.filter_form.cleaned_data
         else:
-            report_groups = list(
-                set(self.model.objects.values_list("path", "path")))
-        self.group_by = report_groups
-        return report_groups
+            data = {'start_date': timezone.localdate()}
+        if self.use_rollups and field in rollups.PAGE_VISIT_DIMENSIONS and not data.get('city'):
+            start = end = None
+            if data.get('start_date'):
+                start = get_day_start(data['start_date'])
+            if data.get('end_date'):
+                end = get_day_start(data['end_date'] + datetime.timedelta(days=1))
+            filters = {'country__icontains': data['country']} if data.get('country') else {}
+            self.group_summary = rollups.summarize_page_visits(field, start, end, **filters)
+            return self.group_summary
+
+        queryset = queryset.order_by().values(field)
+        queryset = queryset.annotate(
+            visits=Count('pk'),
+            visitors=Count('ip_address', distinct=True),
+        )
+        self.group_summary = {row[field]: row for row in queryset}
+        return self.group_summary
+
+    def get_filtered_queryset(self):
+        if not hasattr(self, 'filtered_queryset'):
+            self.filtered_queryset = self.filter_queryset(self.model.objects.all())
+        return self.filtered_queryset
 
     def get_queryset(self):
         if self.request.GET.get('_export'):
+            # all visits of all groups, read by one query
             self.group_queryset()
-            result_list = list(chain(*self.group_data))
-            # print(result_list)
-            # self.queryset = result_list
-            return result_list
+            return self.get_filtered_queryset().order_by(self.get_group_field(), '-id')
         else:
             queryset = self.group_queryset()
             return queryset if len(queryset) > 0 else self.model.objects.none()
 
     def group_queryset(self):
+        """
+        :returns: A lazy queryset of the visits of each group, which is only evaluated for the
+            page rendered by the group's table.
+        """
         if hasattr(self, 'group_data'):
             return self.group_data
 
-        groups = self.get_report_groups()
-        self.group_data = []
-        for name, id in groups:
-            if self.group_filter == 'city':
-                class_qs = self.model.objects.filter(city=name)
-            elif self.group_filter == 'country':
-                class_qs = self.model.objects.filter(country=name)
+        field = self.get_group_field()
+        queryset = self.get_filtered_queryset()
+        self.group_data = [
+            queryset.filter(**{field: name}).order_by('-id') for name, id in self.get_report_groups()
+        ]
+        return self.group_data
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        summary = self.get_group_summary()
+        # the rows of the summary, in the order of the groups
+        context['group_summary'] = [dict(summary[name], name=name) for name, id in self.get_report_groups()]
+        context['group_field_label'] = self.model._meta.get_field(self.get_group_field()).verbose_name
+        for table_dict in context.get('tables', []):
+            table_dict['summary'] = summary.get(table_dict.get('heading'))
+        return context
+
+
+class UserSearchReport(GeneralReportListView):
+    """
+    The searches of each search term, read from the search rollups for closed periods.
+    """
+    template_name = 'analytics/search-report.html'
+    model = UserSearch
+    table_class = tables.UserSearchReportTable
+    form_class = forms.UserSearchReportForm
+
+    def get_table_class(self):
+        return self.table_class
+
+    def get_model(self):
+        return self.model
+
+    def get_form_class(self):
+        return self.form_class
+
+    def get_date_range(self):
+        """
+        :returns: The start and end of the reported period, as filtered by the form, where the
+            end is ``None`` for an open end.
+        """
+        self.descriptions = []
+        self.filter_form = self.form_class(self.request.GET)
+        if self.filter_form.is_valid():
+            data = self.filter_form.cleaned_data
+            start, end = get_day_start(data['start_date']), None
+            if data.get('end_date'):
+                end = get_day_start(data['end_date'] + datetime.timedelta(days=1))
+                self.descriptions.append(
+                    _('Searched between "{start_date}" and {end_date}').format(
+                        start_date=data['start_date'].strftime("%b %d %Y"),
+                        end_date=data['end_date'].strftime("%b %d %Y")
+                    )
+                )
             else:
-                class_qs = self.model.objects.filter(path=name)
+                self.descriptions.append(
+                    _('Searched since "{start_date}"').format(
+                        start_date=data['start_date'].strftime("%b %d %Y")
+                    )
+                )
+            return start, end
 
-            filtered_qs = self.filter_queryset(class_qs)
+        today = timezone.localdate()
+        self.descriptions.append(_('Searched Today'))
+        return get_day_start(today), get_day_start(today + datetime.timedelta(days=1))
 
-            self.group_data.append(filtered_qs.order_by('-id'))
+    def get_queryset(self):
+        summary = rollups.summarize_searches(*self.get_date_range())
+        # most searched terms first
+        return sorted(
+            ({'query': query, 'searches': searches} for query, searches in summary.items()),
+            key=lambda row: (-row['searches'], row['query']),
+        )
 
-        return self.group_data
+    def get_model_group_by(self):
+        return None
+
+    def get_page_title(self):
+        return _('Search Term Report')
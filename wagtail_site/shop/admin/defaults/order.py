@@ -1,7 +1,8 @@
-from wagtail_site.shop.admin.order import BaseOrderAdmin, OrderPaymentInline
+from wagtail_site.shop.admin.order import (
+    BaseOrderAdmin, BulkTransitionAdminMixin, ExportOrdersAdminMixin, OrderPaymentInline)
 
 
-class OrderAdmin(BaseOrderAdmin):
+class OrderAdmin(BulkTransitionAdminMixin, ExportOrdersAdminMixin, BaseOrderAdmin):
     """
     Admin class to be used for Order model :class:`shop.models.defaults.order`
     """
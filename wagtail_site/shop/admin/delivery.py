@@ -1,7 +1,8 @@
 from functools import lru_cache
 
 from django.contrib import admin
-from django.db.models import Sum
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.forms import models, ValidationError
 from django.http import HttpResponse
 from django.template.loader import select_template
@@ -43,8 +44,11 @@ class OrderItemForm(models.ModelForm):
         """
         Returns the quantity already delivered for this order item.
         """
-        aggr = instance.deliver_item.aggregate(delivered=Sum('quantity'))
-        return aggr['delivered'] or 0
+        try:
+            return instance.delivered_quantity
+        except AttributeError:
+            aggr = instance.deliver_item.aggregate(delivered=Sum('quantity'))
+            return aggr['delivered'] or 0
 
     def clean(self):
         cleaned_data = super().clean()
@@ -61,6 +65,10 @@ class OrderItemForm(models.ModelForm):
 
 
 class OrderItemInlineDelivery(OrderItemInline):
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.annotate(delivered_quantity=Coalesce(Sum('deliver_item__quantity'), 0))
+
     def get_fields(self, request, obj=None):
         fields = list(super().get_fields(request, obj))
         if obj:
@@ -139,6 +147,11 @@ class DeliveryInline(admin.TabularInline):
     def has_delete_permission(self, request, obj=None):
         return False
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.annotate(delivered_quantity=Coalesce(Sum('items__quantity'), 0),
+                                 delivered_count=Count('items'))
+
     def get_max_num(self, request, obj=None, **kwargs):
         qs = self.model.objects.filter(order=obj)
         return qs.count()
@@ -168,10 +181,11 @@ class DeliveryInline(admin.TabularInline):
         return formset
 
     def delivered_items(self, obj):
-        aggr = obj.items.aggregate(quantity=Sum('quantity'))
-        aggr['quantity'] = aggr['quantity'] or 0
-        aggr.update(items=obj.items.count())
-        return '{quantity}/{items}'.format(**aggr)
+        try:
+            return '{}/{}'.format(obj.delivered_quantity, obj.delivered_count)
+        except AttributeError:
+            aggr = obj.items.aggregate(quantity=Coalesce(Sum('quantity'), 0), items=Count('pk'))
+            return '{quantity}/{items}'.format(**aggr)
     delivered_items.short_description = _("Quantity/Items")
 
     def print_out(self, obj):
@@ -1,5 +1,3 @@
-from collections import OrderedDict
-
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.forms import fields, models, widgets
@@ -38,14 +36,7 @@ class NotificationForm(models.ModelForm):
         self.fields['notify_recipient'].choices = self.get_recipient_choices()
 
     def get_transition_choices(self):
-        choices = OrderedDict()
-        for transition in OrderModel.get_all_transitions():
-            if isinstance(transition.target, str):
-                choices[transition.target] = OrderModel.get_transition_name(transition.target)
-            elif isinstance(transition.target, RETURN_VALUE):
-                for target in transition.target.allowed_states:
-                    choices[target] = OrderModel.get_transition_name(target)
-        return choices.items()
+        return OrderModel.get_transition_graph().targets.items()
 
     def get_recipient_choices(self):
         """
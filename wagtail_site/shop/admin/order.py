@@ -1,24 +1,75 @@
-from django.conf.urls import url
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.core.exceptions import FieldDoesNotExist
 from django.db.models.fields import Field
 from django.forms import widgets
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.loader import select_template
-from django.urls import reverse, NoReverseMatch
+from django.urls import re_path, reverse, NoReverseMatch
 from django.utils.html import format_html
 from django.utils.translation import pgettext_lazy
 
-# from fsm_admin.mixins import FSMTransitionMixin
-
 from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.models.base.customer import CustomerModel
 from wagtail_site.shop.models.base.order import OrderItemModel, OrderPayment
 from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
+from wagtail_site.shop.operations.export import export_order_lines
 from wagtail_site.shop.serializers.base.order import OrderDetailSerializer
 from wagtail_site.shop.transition import transition_change_notification
 
 
+class FSMTransitionMixin:
+    """
+    Offer the transitions of the FSM fields listed in ``fsm_field`` as submit buttons on the
+    change form, and apply the transition requested by the pressed button when saving. This
+    follows the conventions of django-fsm-admin, whose releases do not support current Django
+    versions: buttons are named ``_fsmtransition-<field>-<transition>``.
+    """
+    fsm_field = ['state']
+    fsm_input_prefix = '_fsmtransition'
+
+    def _fsm_get_transitions(self, obj, request, perms=None):
+        """
+        :returns: A dict mapping each FSM field onto the transitions the user may apply.
+        """
+        if obj is None:
+            return {}
+        return {
+            field: list(getattr(obj, 'get_available_user_{}_transitions'.format(field))(request.user))
+            for field in self.fsm_field
+        }
+
+    def _get_requested_transition(self, request):
+        """
+        :returns: A tuple ``(field, transition_name)`` of the pressed transition button, or ``None``.
+        """
+        prefix = self.fsm_input_prefix + '-'
+        for key in request.POST:
+            if key.startswith(prefix):
+                field, _, name = key[len(prefix):].partition('-')
+                return field, name
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        obj = self.get_object(request, object_id)
+        extra_context = dict(extra_context or {})
+        extra_context.update(
+            fsm_input_prefix=self.fsm_input_prefix,
+            fsm_object_transitions=self._fsm_get_transitions(obj, request),
+        )
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def save_model(self, request, obj, form, change):
+        requested = self._get_requested_transition(request)
+        if requested:
+            field, name = requested
+            transitions = self._fsm_get_transitions(obj, request).get(field, [])
+            if name in [t.name for t in transitions]:
+                getattr(obj, name)()
+            else:
+                msg = pgettext_lazy('admin', "The transition '{name}' is not allowed.")
+                self.message_user(request, msg.format(name=name), messages.ERROR)
+        super().save_model(request, obj, form, change)
+
+
 class OrderPaymentInline(admin.TabularInline):
     model = OrderPayment
     extra = 0
@@ -97,10 +148,7 @@ class StatusListFilter(admin.SimpleListFilter):
     parameter_name = 'status'
 
     def lookups(self, request, model_admin):
-        lookups = dict(model_admin.model._transition_targets)
-        lookups.pop('new')
-        lookups.pop('created')
-        return lookups.items()
+        return model_admin.model.get_transition_graph().filter_choices
 
     def queryset(self, request, queryset):
         if self.value():
@@ -182,6 +230,15 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
             pass
         return search_fields
 
+    def _fsm_get_transitions(self, obj, request, perms=None):
+        """
+        Offer those transitions as buttons, which are available for the order's current state.
+        They are looked up in the compiled transition graph, rather than by checking each
+        transition of the model.
+        """
+        transitions = obj.get_available_transitions(admin=True) if obj else []
+        return {'status': [t for t in transitions if t.has_perm(obj, request.user)]}
+
     def get_form(self, request, obj=None, **kwargs):
         ModelForm = super().get_form(request, obj, **kwargs)
         if obj:
@@ -199,6 +256,65 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
         return response
 
 
+class ExportOrdersAdminMixin:
+    """
+    A customized OrderAdmin class shall inherit from this mixin class, to add actions streaming
+    the lines of the selected orders as CSV or JSON Lines.
+    """
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for name in ['export_as_csv', 'export_as_jsonl']:
+            actions[name] = self.get_action(name)
+        return actions
+
+    def _stream_export(self, queryset, format, content_type):
+        lines = export_order_lines(format=format, orders=queryset)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="orders.{}"'.format(format)
+        return response
+
+    def export_as_csv(self, request, queryset):
+        return self._stream_export(queryset, 'csv', 'text/csv')
+    export_as_csv.short_description = pgettext_lazy('admin', "Export order lines as CSV")
+
+    def export_as_jsonl(self, request, queryset):
+        return self._stream_export(queryset, 'jsonl', 'application/jsonl')
+    export_as_jsonl.short_description = pgettext_lazy('admin', "Export order lines as JSON Lines")
+
+
+class BulkTransitionAdminMixin:
+    """
+    A customized OrderAdmin class shall inherit from this mixin class, to add actions applying
+    those admin transitions, which are declared as bulk capable, to all selected orders at once.
+    """
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        for transition in self.model.get_transition_graph().transitions:
+            if transition.custom.get('admin') and transition.custom.get('bulk'):
+                action = self.get_transition_action(transition)
+                actions.setdefault(action[1], action)
+        return actions
+
+    def get_transition_action(self, transition):
+        def apply_transition(modeladmin, request, queryset):
+            modeladmin.apply_bulk_transition(request, queryset, transition.name)
+
+        description = transition.custom.get('button_name', transition.name)
+        return apply_transition, 'transition_{}'.format(transition.name), description
+
+    def apply_bulk_transition(self, request, queryset, name):
+        moved = queryset.bulk_transition(name, by=request.user)
+        count = sum(len(order_pks) for order_pks in moved.values())
+        skipped = queryset.count() - count
+        msg = pgettext_lazy('admin', "{count} orders changed to '{status}'.")
+        for status, order_pks in moved.items():
+            status_name = self.model.get_transition_name(status)
+            self.message_user(request, msg.format(count=len(order_pks), status=status_name), messages.SUCCESS)
+        if skipped:
+            msg = pgettext_lazy('admin', "{count} orders were skipped, since their state does not allow this transition.")
+            self.message_user(request, msg.format(count=skipped), messages.WARNING)
+
+
 class PrintInvoiceAdminMixin:
     """
     A customized OrderAdmin class shall inherit from this mixin class, to add
@@ -216,7 +332,7 @@ class PrintInvoiceAdminMixin:
 
     def get_urls(self):
         my_urls = [
-            url(r'^(?P<pk>\d+)/print_invoice/$', self.admin_site.admin_view(self.render_invoice),
+            re_path(r'^(?P<pk>\d+)/print_invoice/$', self.admin_site.admin_view(self.render_invoice),
                 name='print_invoice'),
         ]
         my_urls.extend(super().get_urls())
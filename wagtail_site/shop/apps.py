@@ -19,6 +19,7 @@ class ShopConfig(AppConfig):
 
         # perform some sanity checks
         ForeignKeyBuilder.check_for_pending_mappings()
+        self.compile_transition_graph()
         # currency_code = app_settings.DEFAULT_CURRENCY
         # money = MoneyMaker(currency_code)
         # widget = MoneyFieldWidget(attrs={'currency_code': money.currency})
@@ -36,3 +37,15 @@ class ShopConfig(AppConfig):
         
         # Import signals for Wagtail integration
         import wagtail_site.shop.signals
+
+    def compile_transition_graph(self):
+        """
+        Build the graph of order state transitions once, rather than on first use.
+        """
+        from django.core.exceptions import ImproperlyConfigured
+        from .models.base.order import OrderModel
+
+        try:
+            OrderModel.get_transition_graph()
+        except ImproperlyConfigured:
+            pass  # no Order model has been materialized
@@ -1,5 +1,29 @@
+from time import monotonic
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+
 
 class DefaultSettings:
+    """
+    Application settings of the shop, resolved from the project's ``settings.py``.
+
+    Settings accessed without their ``SHOP_`` prefix, for instance ``app_settings.CART_MODIFIERS``,
+    are resolved once and then kept in a snapshot until Django emits ``setting_changed``. The
+    number of lookups answered from that snapshot is counted in ``lookups_saved``.
+    """
+    def __init__(self):
+        self._resolved = {}
+        self.lookups_saved = 0
+
+    def reset(self):
+        """
+        Discard the snapshot of resolved settings.
+        """
+        self._resolved.clear()
+
     def _setting(self, name, default=None):
         from django.conf import settings
         return getattr(settings, name, default)
@@ -74,13 +98,13 @@ class DefaultSettings:
         Depending on the materialized customer model, use this directive to configure the
         customer serializer.
 
-        Defaults to :class:`shop.serializers.defaults.customer.CustomerSerializer`.
+        Defaults to :class:`shop.serializers.customer.CustomerSerializer`.
         """
         from django.core.exceptions import ImproperlyConfigured
         from django.utils.module_loading import import_string
         from wagtail_site.shop.serializers.base.bases import BaseCustomerSerializer
 
-        s = self._setting('SHOP_CUSTOMER_SERIALIZER', 'shop.serializers.defaults.customer.CustomerSerializer')
+        s = self._setting('SHOP_CUSTOMER_SERIALIZER', 'wagtail_site.shop.serializers.customer.CustomerSerializer')
         CustomerSerializer = import_string(s)
         if not issubclass(CustomerSerializer, BaseCustomerSerializer):
             raise ImproperlyConfigured(
@@ -94,14 +118,14 @@ class DefaultSettings:
         This serialized data then is used for Catalog List Views, Cart List Views and Order List
         Views.
 
-        Defaults to :class:`shop.serializers.defaults.product_summary.ProductSummarySerializer`.
+        Defaults to :class:`shop.serializers.product_summary.ProductSummarySerializer`.
         """
         from django.core.exceptions import ImproperlyConfigured
         from django.utils.module_loading import import_string
         from wagtail_site.shop.serializers.base.bases import ProductSerializer
 
         s = self._setting('SHOP_PRODUCT_SUMMARY_SERIALIZER',
-                          'shop.serializers.defaults.product_summary.ProductSummarySerializer')
+                          'wagtail_site.shop.serializers.product_summary.ProductSummarySerializer')
         ProductSummarySerializer = import_string(s)
         if not issubclass(ProductSummarySerializer, ProductSerializer):
             msg = "class {} specified in SHOP_PRODUCT_SUMMARY_SERIALIZER must inherit from 'ProductSerializer'."
@@ -114,12 +138,12 @@ class DefaultSettings:
         This serializer is only used by the plugin editors, when selecting a product using a
         dropdown menu with auto-completion.
 
-        Defaults to :class:`shop.serializers.defaults.ProductSelectSerializer`.
+        Defaults to :class:`shop.serializers.product_select.ProductSelectSerializer`.
         """
         from django.utils.module_loading import import_string
 
         s = self._setting('SHOP_PRODUCT_SELECT_SERIALIZER',
-                          'shop.serializers.defaults.product_select.ProductSelectSerializer')
+                          'wagtail_site.shop.serializers.product_select.ProductSelectSerializer')
         ProductSelectSerializer = import_string(s)
         return ProductSelectSerializer
 
@@ -177,14 +201,14 @@ class DefaultSettings:
         Depending on the materialized OrderItem model, use this directive to configure the
         serializer.
 
-        Defaults to :class:`shop.serializers.defaults.OrderItemSerializer`.
+        Defaults to :class:`shop.serializers.order_item.OrderItemSerializer`.
         """
         from django.core.exceptions import ImproperlyConfigured
         from django.utils.module_loading import import_string
         from wagtail_site.shop.serializers.base.bases import BaseOrderItemSerializer
 
         s = self._setting('SHOP_ORDER_ITEM_SERIALIZER',
-                          'shop.serializers.defaults.order_item.OrderItemSerializer')
+                          'wagtail_site.shop.serializers.order_item.OrderItemSerializer')
         OrderItemSerializer = import_string(s)
         if not issubclass(OrderItemSerializer, BaseOrderItemSerializer):
             raise ImproperlyConfigured(
@@ -230,6 +254,50 @@ class DefaultSettings:
         order_workflows = self._setting('SHOP_ORDER_WORKFLOWS', [])
         return [import_string(mc) for mc in order_workflows]
 
+    @property
+    def SHOP_NUMBER_ALLOCATOR(self):
+        """
+        The allocator handing out the numbers of orders and customers. Use one of:
+
+        * ``'wagtail_site.shop.numbering.CounterNumberAllocator'``: Keeps a counter row per series,
+          gap-free numbers.
+        * ``'wagtail_site.shop.numbering.BlockNumberAllocator'``: Reserves blocks of numbers per
+          worker process, reducing contention on the counter row.
+        * ``'wagtail_site.shop.numbering.SequenceNumberAllocator'``: Uses database sequences,
+          requires PostgreSQL.
+
+        Defaults to the counter allocator.
+        """
+        from django.core.exceptions import ImproperlyConfigured
+        from django.utils.module_loading import import_string
+        from wagtail_site.shop.numbering import BaseNumberAllocator
+
+        s = self._setting('SHOP_NUMBER_ALLOCATOR', 'wagtail_site.shop.numbering.CounterNumberAllocator')
+        NumberAllocator = import_string(s)
+        if not issubclass(NumberAllocator, BaseNumberAllocator):
+            raise ImproperlyConfigured(
+                "Number allocator class must inherit from 'BaseNumberAllocator'.")
+        return NumberAllocator()
+
+    @property
+    def SHOP_NOTIFICATION_WORKER(self):
+        """
+        The worker sending the notifications after an order performed a transition change. Use one of:
+
+        * ``'wagtail_site.shop.transition.ThreadNotificationWorker'``: Sends them from a background
+          thread of the current process.
+        * ``'wagtail_site.shop.transition.SynchronousNotificationWorker'``: Sends them immediately.
+
+        A custom worker must implement a method ``enqueue(order_pk, status)``, for instance handing
+        them over to a task queue, which then calls :func:`shop.transition.send_transition_notifications`.
+
+        Defaults to the thread worker.
+        """
+        from django.utils.module_loading import import_string
+
+        s = self._setting('SHOP_NOTIFICATION_WORKER', 'wagtail_site.shop.transition.ThreadNotificationWorker')
+        return import_string(s)()
+
     @property
     def SHOP_ADD2CART_NG_MODEL_OPTIONS(self):
         """
@@ -282,12 +350,25 @@ class DefaultSettings:
         In the product's list views, HTML snippets are created for the summary representation of
         each product.
 
-        By default these snippet are cached for one day.
+        By default these snippet are cached for one day. The same applies to the rendered
+        representations of orders, used by the order views, emails and print outs.
         """
         result = self._setting('SHOP_CACHE_DURATIONS') or {}
         result.setdefault('product_html_snippet', 86400)
+        result.setdefault('order_representation', 86400)
         return result
 
+    @property
+    def SHOP_SETTINGS_CACHE_TIMEOUT(self):
+        """
+        The number of seconds the DB-backed ``ShopSettings`` are kept in memory by
+        :func:`get_shop_settings` before being reloaded. Saving them reloads them immediately.
+        The same applies to the routing table of notifications.
+
+        The default is 300 seconds.
+        """
+        return self._setting('SHOP_SETTINGS_CACHE_TIMEOUT', 300)
+
     @property
     def SHOP_DIALOG_FORMS(self):
         """
@@ -322,10 +403,51 @@ class DefaultSettings:
     def __getattr__(self, key):
         if not key.startswith('SHOP_'):
             key = 'SHOP_' + key
-        return self.__getattribute__(key)
+        try:
+            value = self._resolved[key]
+        except KeyError:
+            value = self._resolved[key] = self.__getattribute__(key)
+        else:
+            self.lookups_saved += 1
+        return value
 
 app_settings = DefaultSettings()
 
-def get_shop_settings(request):
+# The ShopSettings object loaded outside of requests and when it has to be reloaded
+_shop_settings = {'instance': None, 'expires': 0}
+
+
+def get_shop_settings(request=None):
+    """
+    Return the DB-backed ``ShopSettings``. It is cached on the given request and, for at most
+    ``SHOP_SETTINGS_CACHE_TIMEOUT`` seconds, throughout the process. Saving the settings object
+    invalidates this cache.
+    """
     from wagtail_site.shop.models.settings import ShopSettings
-    return ShopSettings.load()
\ No newline at end of file
+
+    if request is not None:
+        attr_name = ShopSettings.get_cache_attr_name()
+        if hasattr(request, attr_name):
+            return getattr(request, attr_name)
+    now = monotonic()
+    instance = _shop_settings['instance']
+    if instance is None or _shop_settings['expires'] < now:
+        instance = ShopSettings.load()
+        _shop_settings.update(instance=instance, expires=now + app_settings.SETTINGS_CACHE_TIMEOUT)
+    else:
+        app_settings.lookups_saved += 1
+    if request is not None:
+        setattr(request, attr_name, instance)
+    return instance
+
+
+@receiver(setting_changed)
+def reset_app_settings(setting, **kwargs):
+    if setting.startswith('SHOP_') or setting == 'ADMINS':
+        app_settings.reset()
+        _shop_settings['instance'] = None
+
+
+@receiver(post_save, sender='shop.ShopSettings')
+def reset_shop_settings(**kwargs):
+    _shop_settings['instance'] = None
\ No newline at end of file
@@ -0,0 +1,106 @@
+import time
+from decimal import Decimal
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from wagtail_site.shop.admin.defaults.order import OrderAdmin
+from wagtail_site.shop.admin.order import FSMTransitionMixin, StatusListFilter
+from wagtail_site.shop.models.base.customer import CustomerModel
+from wagtail_site.shop.models.base.order import OrderModel
+
+
+class Command(BaseCommand):
+    help = ("Compare rendering the order states and transition buttons of the order admin through the "
+            "compiled transition graph, with copying the transition targets and walking all transitions "
+            "of the order model on each request. All written orders are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=100,
+            help="Number of orders rendered by each change list, spread over all states.",
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=100,
+            help="Number of times the change list and the change view of each order are rendered.",
+        )
+
+    def get_model_admin(self):
+        try:
+            return admin.site._registry[OrderModel]
+        except KeyError:
+            return OrderAdmin(OrderModel, admin.site)
+
+    def create_orders(self, count, user):
+        customer = CustomerModel.objects.create(user=user)
+        states = list(OrderModel.get_transition_graph().targets)
+        orders = OrderModel.objects.bulk_create([
+            OrderModel(customer=customer, currency='EUR', _subtotal=Decimal(0), _total=Decimal(0),
+                       status=states[number % len(states)], stored_request={}, extra={})
+            for number in range(count)
+        ])
+        queryset = OrderModel.objects.filter(pk__in=[order.pk for order in orders]).order_by('pk')
+        # annotated like the orders of a bulk transition, so that checking conditions runs no queries
+        return list(OrderModel.annotate_for_transitions(queryset))
+
+    def measure(self, label, render, repeat, requests):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                rendered = render()
+            elapsed = time.perf_counter() - start
+        requests *= repeat
+        self.stdout.write("{}: {:.3f} ms per request, {} queries, {} items rendered".format(
+            label, elapsed * 1000 / requests, len(context.captured_queries) // requests, rendered))
+
+    def render_change_list(self, model_admin, request, orders, status_filter=None):
+        if status_filter is None:
+            # the filter choices copied from the transition targets, as done before the graph was compiled
+            lookups = dict(model_admin.model._transition_targets)
+            lookups.pop('new', None)
+            lookups.pop('created', None)
+            choices = list(lookups.items())
+        else:
+            choices = list(status_filter.lookups(request, model_admin))
+        return len(choices) + len([order.status_name() for order in orders])
+
+    def render_change_views(self, model_admin, request, orders, walk):
+        count = 0
+        for order in orders:
+            if walk:
+                # all transitions of the model checked against the order's state, as done by django-fsm
+                transitions = FSMTransitionMixin._fsm_get_transitions(model_admin, order, request)
+                buttons = [t for t in transitions['status'] if t.custom.get('admin')]
+            else:
+                buttons = model_admin._fsm_get_transitions(order, request)['status']
+            count += len(buttons)
+        return count
+
+    def handle(self, *args, **options):
+        model_admin = self.get_model_admin()
+        repeat = options['repeat']
+        with transaction.atomic():
+            user = get_user_model().objects.create(username='benchmark-order-admin', is_staff=True,
+                                                   is_superuser=True)
+            orders = self.create_orders(options['orders'], user)
+            request = RequestFactory().get('/')
+            request.user = user
+            status_filter = StatusListFilter(request, {}, OrderModel, model_admin)
+
+            self.measure("change list, copied targets",
+                         lambda: self.render_change_list(model_admin, request, orders), repeat, 1)
+            self.measure("change list, transition graph",
+                         lambda: self.render_change_list(model_admin, request, orders, status_filter), repeat, 1)
+            self.measure("change views, walking all transitions",
+                         lambda: self.render_change_views(model_admin, request, orders, True), repeat, len(orders))
+            self.measure("change views, transition graph",
+                         lambda: self.render_change_views(model_admin, request, orders, False), repeat, len(orders))
+            transaction.set_rollback(True)
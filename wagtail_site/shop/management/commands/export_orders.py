@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from wagtail_site.shop.operations.export import EXPORT_FORMATS, export_order_lines
+
+
+def parse_point_in_time(value):
+    point_in_time = parse_datetime(value)
+    if point_in_time is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError("Invalid date or datetime '{}'".format(value))
+        point_in_time = timezone.datetime.combine(date, timezone.datetime.min.time())
+    if timezone.is_naive(point_in_time):
+        point_in_time = timezone.make_aware(point_in_time)
+    return point_in_time
+
+
+class Command(BaseCommand):
+    help = "Export the lines of all orders as CSV or JSON Lines, streaming them with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='csv',
+            help="Output format, defaults to CSV.",
+        )
+        parser.add_argument(
+            '--start',
+            help="Only export orders created at or after this date or datetime.",
+        )
+        parser.add_argument(
+            '--end',
+            help="Only export orders created before this date or datetime.",
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            help="Only export orders in this state. May be given more than once.",
+        )
+        parser.add_argument(
+            '--output',
+            help="Write to this file instead of stdout.",
+        )
+
+    def handle(self, *args, **options):
+        filters = {'format': options['format'], 'status': options['status']}
+        if options['start']:
+            filters['start'] = parse_point_in_time(options['start'])
+        if options['end']:
+            filters['end'] = parse_point_in_time(options['end'])
+        lines = export_order_lines(**filters)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
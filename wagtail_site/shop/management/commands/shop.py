@@ -29,7 +29,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             'subcommand',
-            help="./manage.py shop [customers|check-pages|review-settings]",
+            help="./manage.py shop [customers|reservations|check-pages|review-settings]",
         )
         parser.add_argument(
             '--delete-expired',
@@ -61,6 +61,9 @@ Usage:
     Show how many customers are registered, guests, anonymous or expired.            
     Use option --delete-expired to delete all customers with an expired session.            
 
+./manage.py shop reservations
+    Recompute the quantities of products reserved in carts and fix drifted counters.
+
 ./manage.py shop check-pages
     Iterate over all pages in the CMS and check, if they are properly configured.
     Use option --add-missing to add all missing mandatory pages for this shop.
@@ -72,6 +75,8 @@ Usage:
         elif subcommand == 'customers':
             self.delete_expired = options['delete_expired']
             self.customers()
+        elif subcommand == 'reservations':
+            self.reservations()
         elif subcommand == 'check-pages':
             self.stdout.write("The following CMS pages must be adjusted:")
             self.add_recommended = options['add_recommended']
@@ -87,7 +92,7 @@ Usage:
             for k, msg in enumerate(self.review_settings(), 1):
                 self.stdout.write(" {}. {}".format(k, msg))
         else:
-            msg = "Unknown sub-command for shop. Use one of: customer check-pages review-settings"
+            msg = "Unknown sub-command for shop. Use one of: customer reservations check-pages review-settings"
             self.stderr.write(msg.format(subcommand))
 
     def customers(self):
@@ -116,6 +121,14 @@ Usage:
         msg = "Customers in this shop: total={total}, anonymous={anonymous}, expired={expired}, active={active}, guests={guests}, registered={registered}, staff={staff}."
         self.stdout.write(msg.format(**data))
 
+    def reservations(self):
+        """
+        Entry point for subcommand ``./manage.py shop reservations``.
+        """
+        from wagtail_site.shop.models.base.cart import ProductReservationModel
+
+        fixed = ProductReservationModel.objects.reconcile()
+        self.stdout.write("Reconciled product reservations: {} counters fixed.".format(fixed))
 
     def assign_all_products_to_page(self, page):
         from wagtail_site.shop.models.base.product import ProductModel
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def forwards(apps, schema_editor):
+    CartItem = apps.get_model('shop', 'CartItem')
+    ProductReservation = apps.get_model('shop', 'ProductReservation')
+    totals = CartItem.objects.order_by().values('product').annotate(sum=Sum('quantity')).values_list('product', 'sum')
+    ProductReservation.objects.bulk_create([
+        ProductReservation(product_id=product_id, quantity=quantity) for product_id, quantity in totals if quantity
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_alter_product_checkout_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Reserved quantity')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='shop.product')),
+            ],
+            options={
+                'verbose_name': 'Product reservation',
+                'verbose_name_plural': 'Product reservations',
+            },
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
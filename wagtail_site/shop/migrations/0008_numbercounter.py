@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_productreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberCounter',
+            fields=[
+                ('series', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Series')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Last number')),
+            ],
+            options={
+                'verbose_name': 'Number counter',
+                'verbose_name_plural': 'Number counters',
+            },
+        ),
+    ]
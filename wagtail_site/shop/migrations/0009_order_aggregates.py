@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def forwards(apps, schema_editor):
+    Order = apps.get_model('shop', 'Order')
+    OrderItem = apps.get_model('shop', 'OrderItem')
+    OrderPayment = apps.get_model('shop', 'OrderPayment')
+    amount_field = models.DecimalField(max_digits=30, decimal_places=2)
+    payments = OrderPayment.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    payments = payments.annotate(total=Sum('amount', output_field=amount_field)).values('total')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    items = items.annotate(total=Sum('quantity')).values('total')
+    Order.objects.update(
+        _amount_paid=Coalesce(Subquery(payments), Value(Decimal(0)), output_field=amount_field),
+        unfulfilled_quantity=Coalesce(Subquery(items), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_numbercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='_amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Sum of all payments received for this order.', max_digits=30, verbose_name='Amount paid'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='unfulfilled_quantity',
+            field=models.IntegerField(default=0, editable=False, help_text='Quantity of ordered items not delivered yet.', verbose_name='Unfulfilled quantity'),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -6,5 +6,6 @@ from wagtail_site.shop.models.order import Order
 from wagtail_site.shop.models.order_item import OrderItem
 from wagtail_site.shop.models.customer import Customer
 from wagtail_site.shop.models.cart import Cart
-from wagtail_site.shop.models.cart_item import CartItem
+from wagtail_site.shop.models.cart_item import CartItem, ProductReservation
+from wagtail_site.shop.models.counter import NumberCounter
 from wagtail_site.shop.models.settings import ShopSettings
\ No newline at end of file
@@ -2,13 +2,16 @@ import warnings
 from collections import OrderedDict
 
 from django.core import checks
-from django.db import models
+from django.db import models, transaction
+from django.db.models.aggregates import Sum
+from django.db.models.signals import class_prepared, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from wagtail_site.shop import deferred
 from wagtail_site.shop.models.base.fields import JSONField
 from wagtail_site.shop.models.base.customer import CustomerModel
-from wagtail_site.shop.models.base.product import BaseProduct
+from wagtail_site.shop.models.base.product import BaseProduct, ProductModel
 from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
 from wagtail_site.shop.money import Money
 
@@ -41,12 +44,30 @@ class CartItemManager(models.Manager):
         cart_item.save()
         return cart_item, created
 
+    def get_prefetch_plan(self, request):
+        """
+        Combine the lookups declared by all registered cart modifiers into a list of lookups to be
+        passed to ``prefetch_related()``. Products are fetched through their polymorphic manager,
+        so that cart items refer to the concrete product model, resolved in bulk.
+        """
+        lookups = []
+        for modifier in cart_modifiers_pool.get_all_modifiers():
+            for lookup in modifier.get_prefetch_lookups(request):
+                if lookup not in lookups:
+                    lookups.append(lookup)
+        if any(lookup == 'product' or lookup.startswith('product__') for lookup in lookups):
+            # must precede all nested product lookups
+            lookups = [lookup for lookup in lookups if lookup != 'product']
+            lookups.insert(0, models.Prefetch('product', queryset=ProductModel.objects.all()))
+        return lookups
+
     def filter_cart_items(self, cart, request):
         """
         Use this method to fetch items for shopping from the cart. It rearranges the result set
         according to the defined modifiers.
         """
-        cart_items = self.filter(cart=cart, quantity__gt=0).order_by('updated_at')
+        cart_items = cart.items.filter(quantity__gt=0).order_by('updated_at')
+        cart_items = cart_items.prefetch_related(*self.get_prefetch_plan(request))
         for modifier in cart_modifiers_pool.get_all_modifiers():
             cart_items = modifier.arrange_cart_items(cart_items, request)
         return cart_items
@@ -56,7 +77,7 @@ class CartItemManager(models.Manager):
         Use this method to fetch items from the watch list. It rearranges the result set
         according to the defined modifiers.
         """
-        watch_items = self.filter(cart=cart, quantity=0)
+        watch_items = cart.items.filter(quantity=0).prefetch_related(*self.get_prefetch_plan(request))
         for modifier in cart_modifiers_pool.get_all_modifiers():
             watch_items = modifier.arrange_watch_items(watch_items, request)
         return watch_items
@@ -124,19 +145,36 @@ class BaseCartItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         self.extra_rows = OrderedDict()
         self._dirty = True
 
+    # quantity of this item accounted for in the product's reservation counter
+    _reserved_quantity = 0
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'quantity' in instance.__dict__:
+            instance._reserved_quantity = instance.quantity
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            ProductReservationModel.objects.reserve(self.product_id, self.quantity - self._reserved_quantity)
+        self._reserved_quantity = self.quantity
         self.cart.save(update_fields=['updated_at'])
         self._dirty = True
 
-    def update(self, request):
+    def update(self, request, refresh=True):
         """
         Loop over all registered cart modifier, change the price per cart item and optionally add
         some extra rows.
+
+        :param refresh: If ``False``, the cart item is considered as being up to date with the
+            database, and is not reloaded before being processed.
         """
         if not self._dirty:
             return
-        self.refresh_from_db()
+        if refresh:
+            self.refresh_from_db()
         self.extra_rows = OrderedDict()  # reset the dictionary
         for modifier in cart_modifiers_pool.get_all_modifiers():
             modifier.process_cart_item(self, request)
@@ -145,6 +183,98 @@ class BaseCartItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
 CartItemModel = deferred.MaterializedModel(BaseCartItem)
 
 
+def release_reserved_quantity(sender, instance, **kwargs):
+    """
+    Decrease the reservation counter by the quantity of a deleted cart item. Since this receiver
+    also is invoked on cascading deletions, it runs inside the transaction deleting the item.
+    """
+    ProductReservationModel.objects.reserve(instance.product_id, -instance._reserved_quantity)
+
+
+@receiver(class_prepared)
+def connect_cart_item_signals(sender, **kwargs):
+    # connect to the materialized cart item model only, so that other models keep fast deletes
+    if issubclass(sender, BaseCartItem) and not sender._meta.abstract:
+        post_delete.connect(release_reserved_quantity, sender=sender)
+
+
+class ProductReservationManager(models.Manager):
+    """
+    Customized model manager for our ProductReservation model.
+    """
+
+    def reserve(self, product_id, quantity):
+        """
+        Add the given quantity, which may be negative, to the reservation counter of a product.
+        """
+        if not quantity:
+            return
+        counter = self.filter(product_id=product_id)
+        if counter.update(quantity=models.F('quantity') + quantity):
+            return
+        _, created = self.get_or_create(product_id=product_id, defaults={'quantity': quantity})
+        if not created:
+            # another transaction created the counter in the meantime
+            counter.update(quantity=models.F('quantity') + quantity)
+
+    def get_reserved_quantities(self, product_ids):
+        """
+        Return a dictionary mapping the given product ids onto their reserved quantities.
+        """
+        reserved = dict.fromkeys(product_ids, 0)
+        reserved.update(self.filter(product_id__in=product_ids).values_list('product_id', 'quantity'))
+        return reserved
+
+    def reconcile(self):
+        """
+        Recompute all reservation counters from the cart items and fix those which drifted, for
+        instance by items changed through ``QuerySet.update()``, which bypasses the counters.
+
+        :return: The number of counters which have been fixed.
+        """
+        fixed = 0
+        with transaction.atomic():
+            cart_items = CartItemModel.objects.order_by().values('product')
+            totals = dict(cart_items.annotate(sum=Sum('quantity')).values_list('product', 'sum'))
+            for reservation in self.select_for_update():
+                quantity = totals.pop(reservation.product_id, 0) or 0
+                if reservation.quantity != quantity:
+                    reservation.quantity = quantity
+                    reservation.save(update_fields=['quantity'])
+                    fixed += 1
+            missing = [self.model(product_id=pk, quantity=quantity) for pk, quantity in totals.items() if quantity]
+            self.bulk_create(missing)
+        return fixed + len(missing)
+
+
+class BaseProductReservation(models.Model, metaclass=deferred.ForeignKeyBuilder):
+    """
+    Keeps the quantity of a product held in all carts, so that products using the
+    :class:`shop.models.product.ReserveProductMixin` can determine their availability without
+    summing up the cart items. This counter is maintained whenever a cart item is saved or deleted.
+    """
+    product = deferred.OneToOneField(
+        BaseProduct,
+        on_delete=models.CASCADE,
+        related_name='reservation',
+    )
+
+    quantity = models.IntegerField(
+        _("Reserved quantity"),
+        default=0,
+    )
+
+    objects = ProductReservationManager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return "{}: {}".format(self.product_id, self.quantity)
+
+ProductReservationModel = deferred.MaterializedModel(BaseProductReservation)
+
+
 class CartManager(models.Manager):
     """
     The Model Manager for any Cart inheriting from BaseCart.
@@ -234,18 +364,29 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
         else:
             items = CartItemModel.objects.filter_cart_items(self, request)
 
+        # Unless all modifiers process their cart items incrementally, every item is processed
+        # again. Otherwise only the changed items are, reusing the line totals of all others.
+        modifiers = cart_modifiers_pool.get_all_modifiers()
+        if not all(modifier.incremental for modifier in modifiers):
+            for item in items:
+                item._dirty = True
+        changed_items = [item for item in items if item._dirty]
+
         # This calls all the pre_process_cart methods and the pre_process_cart_item for each item,
         # before processing the cart. This allows to prepare and collect data on the cart.
-        for modifier in cart_modifiers_pool.get_all_modifiers():
+        for modifier in modifiers:
             modifier.pre_process_cart(self, request, raise_exception)
-            for item in items:
+            modifier.prepare_cart_items(self, changed_items, request)
+            for item in changed_items:
                 modifier.pre_process_cart_item(self, item, request, raise_exception)
 
         self.extra_rows = OrderedDict()  # reset the dictionary
         self.subtotal = 0  # reset the subtotal
         for item in items:
-            # item.update iterates over all cart modifiers and invokes method `process_cart_item`
-            item.update(request)
+            # item.update iterates over all cart modifiers and invokes method `process_cart_item`,
+            # unless that item is unchanged. Items are either freshly loaded or owned by this cart,
+            # hence they need not be reloaded from the database.
+            item.update(request, refresh=False)
             self.subtotal += item.line_total
 
         # Iterate over the registered modifiers, to process the cart's summary
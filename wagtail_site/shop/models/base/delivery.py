@@ -1,9 +1,12 @@
 from django.core import checks
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import class_prepared, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 from wagtail_site.shop import deferred
-from wagtail_site.shop.models.base.order import BaseOrder, BaseOrderItem, OrderItemModel
+from wagtail_site.shop.models.base.order import (
+    BaseOrder, BaseOrderItem, OrderItemModel, OrderModel, update_order_totals)
 from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
 
 
@@ -44,9 +47,16 @@ class BaseDelivery(models.Model, metaclass=deferred.ForeignKeyBuilder):
         help_text=_("The shipping backend used to deliver items of this order"),
     )
 
+    part_number = models.PositiveSmallIntegerField(
+        _("Part number"),
+        null=True,
+        editable=False,
+        help_text=_("Sequential number of this delivery among all deliveries of its order"),
+    )
+
     class Meta:
         abstract = True
-        unique_together = ['shipping_method', 'shipping_id']
+        unique_together = [['shipping_method', 'shipping_id'], ['order', 'part_number']]
         get_latest_by = 'shipped_at'
 
     def __str__(self):
@@ -68,15 +78,45 @@ class BaseDelivery(models.Model, metaclass=deferred.ForeignKeyBuilder):
             shipping_modifier = cart_modifiers_pool.get_active_shipping_modifier(self.shipping_method)
             shipping_modifier.ship_the_goods(self)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            if self.part_number is None:
+                self.assign_part_numbers([self])
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def assign_part_numbers(cls, deliveries, lock=True):
+        """
+        Assign the next part number of their order to each of the given, not yet saved deliveries,
+        using one query regardless of the number of orders. The orders are locked until the
+        surrounding transaction ends, hence this shall be called inside the transaction saving
+        those deliveries, so that concurrent deliveries of the same order are numbered in turn.
+
+        :param lock: Set to ``False`` if the caller already holds the locks of those orders.
+        """
+        order_ids = {delivery.order_id for delivery in deliveries}
+        if lock:
+            locked = OrderModel.objects.select_for_update().filter(pk__in=order_ids).order_by('pk')
+            list(locked.values_list('pk', flat=True))
+        last_parts = DeliveryModel.objects.filter(order__in=order_ids).order_by().values('order')
+        last_parts = dict(last_parts.annotate(last=models.Max('part_number')).values_list('order', 'last'))
+        for delivery in deliveries:
+            if delivery.part_number is None:
+                delivery.part_number = last_parts[delivery.order_id] = (last_parts.get(delivery.order_id) or 0) + 1
+
     def get_number(self):
         """
         Hook to get the delivery number.
         A class inheriting from Order may transform this into a string which is better readable.
         """
         if self.order.allow_partial_delivery:
-            for part, delivery in enumerate(self.order.delivery_set.all(), 1):
-                if delivery.pk == self.pk:
-                    return "{} / {}".format(self.order.get_number(), part)
+            part_number = self.part_number
+            if part_number is None:
+                # delivery created before part numbers have been stored
+                for part_number, delivery in enumerate(self.order.delivery_set.all(), 1):
+                    if delivery.pk == self.pk:
+                        break
+            return "{} / {}".format(self.order.get_number(), part_number)
         return self.order.get_number()
 
 DeliveryModel = deferred.MaterializedModel(BaseDelivery)
@@ -127,4 +167,28 @@ class BaseDeliveryItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
             errors.append(checks.Error(msg.format(cls.__name__, OrderItemModel.__name__)))
         return errors
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_order_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.update_order_totals()
+        return result
+
+    def update_order_totals(self):
+        """
+        Recompute the unfulfilled quantity stored on the order this item belongs to.
+        """
+        OrderModel.objects.filter(items__pk=self.item_id).update_delivery_totals()
+
 DeliveryItemModel = deferred.MaterializedModel(BaseDeliveryItem)
+
+
+@receiver(class_prepared)
+def connect_delivery_item_signals(sender, **kwargs):
+    # also invoked when deleting a delivery or an ordered item cascades to its delivery items
+    if issubclass(sender, BaseDeliveryItem) and not sender._meta.abstract:
+        post_delete.connect(update_order_totals, sender=sender)
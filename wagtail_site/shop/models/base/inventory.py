@@ -1,6 +1,7 @@
 from django.core import checks
-from django.db import models
-from django.db.models.aggregates import Sum
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.aggregates import Max, Min, Sum
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from wagtail_site.shop.conf import app_settings
@@ -18,6 +19,8 @@ class AvailableProductMixin:
 
     The product class must implement a field named ``quantity`` accepting numerical values.
     """
+    availability_lookups = ('inventory_set',)
+
     def get_availability(self, request, **kwargs):
         """
         Returns the current available quantity for this product.
@@ -34,35 +37,148 @@ class AvailableProductMixin:
             inventory = inventory_set.order_by('earliest').first()
             earliest = inventory.earliest
             latest = inventory_set.order_by('latest').last().latest
-            if latest < now + app_settings.SHOP_LIMITED_OFFER_PERIOD:
+            if latest < now + app_settings.LIMITED_OFFER_PERIOD:
                 kwargs['limited_offer'] = True
             return Availability(quantity=quantity, earliest=earliest, latest=latest, **kwargs)
 
         now = timezone.now()
+        if 'inventory_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return self._get_prefetched_availability(now)
         inventory_set = self.inventory_set.filter(earliest__lt=now, latest__gt=now, quantity__gt=0)
         if inventory_set.exists():
             return create_availability()
         # check, if we can sell short
-        later = now + app_settings.SHOP_SELL_SHORT_PERIOD
+        later = now + app_settings.SELL_SHORT_PERIOD
         inventory_set = self.inventory_set.filter(earliest__lt=later, latest__gt=now, quantity__gt=0)
         if inventory_set.exists():
             return create_availability(sell_short=True)
         return Availability(quantity=0)
 
+    def _get_prefetched_availability(self, now):
+        """
+        Same as `get_availability`, but computed from the prefetched inventories without querying.
+        """
+        def create_availability(inventories, **kwargs):
+            quantity = sum(inventory.quantity for inventory in inventories)
+            earliest = min(inventory.earliest for inventory in inventories)
+            latest = max(inventory.latest for inventory in inventories)
+            if latest < now + app_settings.LIMITED_OFFER_PERIOD:
+                kwargs['limited_offer'] = True
+            return Availability(quantity=quantity, earliest=earliest, latest=latest, **kwargs)
+
+        in_stock = [inventory for inventory in self.inventory_set.all() if inventory.quantity > 0]
+        inventories = [inv for inv in in_stock if inv.earliest < now and inv.latest > now]
+        if inventories:
+            return create_availability(inventories)
+        # check, if we can sell short
+        later = now + app_settings.SELL_SHORT_PERIOD
+        inventories = [inv for inv in in_stock if inv.earliest < later and inv.latest > now]
+        if inventories:
+            return create_availability(inventories, sell_short=True)
+        return Availability(quantity=0)
+
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Same as `get_availability`, but for many products at once, using one grouped query.
+        Inventories available at the moment are aggregated separately from those, which only
+        allow to sell short. Products with prefetched inventories, such as those of a loaded
+        cart, are checked without querying.
+        """
+        now = timezone.now()
+        if all('inventory_set' in getattr(product, '_prefetched_objects_cache', {}) for product in products):
+            return {product.pk: product._get_prefetched_availability(now) for product in products}
+        descriptor = cls.inventory_set
+        inventory_model, product_field = descriptor.rel.related_model, descriptor.field.name
+        later = now + app_settings.SELL_SHORT_PERIOD
+        in_stock = Q(earliest__lt=now)
+        rows = inventory_model.objects.filter(**{
+            product_field + '__in': [product.pk for product in products],
+            'earliest__lt': later,
+            'latest__gt': now,
+            'quantity__gt': 0,
+        }).order_by().values(product_field).annotate(
+            quantity_in_stock=Sum('quantity', filter=in_stock),
+            earliest_in_stock=Min('earliest', filter=in_stock),
+            latest_in_stock=Max('latest', filter=in_stock),
+            quantity_sell_short=Sum('quantity'),
+            earliest_sell_short=Min('earliest'),
+            latest_sell_short=Max('latest'),
+        )
+        rows = {row[product_field]: row for row in rows}
+        availabilities = {}
+        for product in products:
+            row = rows.get(product.pk)
+            if row is None:
+                availabilities[product.pk] = Availability(quantity=0)
+                continue
+            if row['quantity_in_stock'] is not None:
+                kwargs = {'quantity': row['quantity_in_stock'], 'earliest': row['earliest_in_stock'],
+                          'latest': row['latest_in_stock']}
+            else:
+                kwargs = {'quantity': row['quantity_sell_short'], 'earliest': row['earliest_sell_short'],
+                          'latest': row['latest_sell_short'], 'sell_short': True}
+            if kwargs['latest'] < now + app_settings.LIMITED_OFFER_PERIOD:
+                kwargs['limited_offer'] = True
+            availabilities[product.pk] = Availability(**kwargs)
+        return availabilities
+
     def deduct_from_stock(self, quantity, **kwargs):
         """
         Deduce requested quantity from all available inventories.
         """
-        later = timezone.now() + app_settings.SHOP_SELL_SHORT_PERIOD
-        for inventory in self.inventory_set.filter(earliest__lt=later, quantity__gt=0).order_by('earliest', 'latest'):
-            reduce_by = min(inventory.quantity, quantity)
-            inventory.quantity -= reduce_by
-            inventory.save(update_fields=['quantity'])
-            quantity -= reduce_by
-            if quantity == 0:
-                break
-        else:
-            raise ProductNotAvailable(self)
+        self.bulk_deduct_from_stock([(self, quantity, kwargs)])
+
+    @classmethod
+    def bulk_deduct_from_stock(cls, deductions):
+        """
+        Deduce the requested quantities of many products from their available inventories, using
+        one query reading the inventories and one conditional ``UPDATE`` reducing them, so that
+        concurrent checkouts never oversell an inventory. If an inventory was reduced by someone
+        else in the meantime, the update is rolled back and the inventories are read again.
+        """
+        products, quantities = {}, {}
+        for product, quantity, kwargs in deductions:
+            products.setdefault(product.pk, product)
+            quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+        descriptor = cls.inventory_set
+        inventory_model, product_field = descriptor.rel.related_model, descriptor.field.name
+        quantity_field = inventory_model._meta.get_field('quantity')
+        later = timezone.now() + app_settings.SELL_SHORT_PERIOD
+        while True:
+            inventories = inventory_model.objects.filter(**{
+                product_field + '__in': quantities.keys(),
+                'earliest__lt': later,
+                'quantity__gt': 0,
+            }).order_by('earliest', 'latest', 'pk')
+            available = {}
+            for pk, product_id, quantity in inventories.values_list('pk', product_field, 'quantity'):
+                available.setdefault(product_id, []).append((pk, quantity))
+
+            # reduce the earliest inventories of each product first
+            reductions = {}
+            for product in products.values():
+                quantity = quantities[product.pk]
+                for pk, available_quantity in available.get(product.pk, []):
+                    if quantity == 0:
+                        break
+                    reductions[pk] = min(available_quantity, quantity)
+                    quantity -= reductions[pk]
+                if quantity > 0:
+                    raise ProductNotAvailable(product)
+            if not reductions:
+                return
+
+            reduced = Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in reductions.items()],
+                           output_field=quantity_field)
+            queryset = inventory_model.objects.filter(pk__in=reductions.keys(), quantity__gte=reduced)
+            with transaction.atomic():
+                updated = queryset.update(quantity=F('quantity') - reduced)
+                if updated < len(reductions):
+                    # never keep a partial deduction
+                    transaction.set_rollback(True)
+            if updated == len(reductions):
+                return
 
     def managed_availability(self):
         return True
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from decimal import Decimal
 import logging
 from urllib.parse import urljoin
@@ -6,18 +7,21 @@ from django.core import checks
 from django.core.exceptions import ImproperlyConfigured
 from django.db import models, transaction
 from django.db.models.aggregates import Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import class_prepared, post_delete
+from django.dispatch import receiver
 from django.urls import NoReverseMatch, reverse
-from django.utils.functional import cached_property
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _, pgettext_lazy, get_language_from_request
 
-from django_fsm import FSMField, transition
+from django_fsm import ANY_OTHER_STATE, ANY_STATE, FSMField, RETURN_VALUE, transition
 from ipware.ip import get_client_ip
 from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.models.base.cart import CartItemModel
 from wagtail_site.shop.models.base.fields import JSONField
 from wagtail_site.shop.money.fields import MoneyField, MoneyMaker
 from wagtail_site.shop import deferred
-from wagtail_site.shop.models.base.product import BaseProduct
+from wagtail_site.shop.models.base.product import BaseProduct, ProductModel
 
 
 class OrderQuerySet(models.QuerySet):
@@ -40,10 +44,80 @@ class OrderQuerySet(models.QuerySet):
                 lookup_kwargs.update({key: lookup})
         return super()._filter_or_exclude(negate, *args, **lookup_kwargs)
 
+    def with_payment_totals(self):
+        """
+        Annotate each order with the sum of its payments as ``annotated_amount_paid``, which then
+        is used by ``order.amount_paid`` instead of the stored column.
+        """
+        return self.annotate(annotated_amount_paid=self.model.get_amount_paid_expression())
+
+    def with_delivery_totals(self):
+        """
+        Annotate each order with the quantity of ordered items not delivered yet as
+        ``annotated_unfulfilled_quantity``, which then is used instead of the stored column.
+        """
+        return self.annotate(annotated_unfulfilled_quantity=self.model.get_unfulfilled_quantity_expression())
+
+    def update_payment_totals(self):
+        """
+        Recompute the stored amount paid for all orders of this queryset, using one statement.
+        """
+        return self.update(_amount_paid=self.model.get_amount_paid_expression())
+
+    def update_delivery_totals(self):
+        """
+        Recompute the stored unfulfilled quantity for all orders of this queryset, using one statement.
+        """
+        return self.update(unfulfilled_quantity=self.model.get_unfulfilled_quantity_expression())
 
-class OrderManager(models.Manager):
-    _queryset_class = OrderQuerySet
+    def bulk_transition(self, name, by=None):
+        """
+        Apply the transition method ``name`` to all orders of this queryset, whose current state
+        permits it and whose conditions are met. Conditions are evaluated on orders annotated by
+        ``Order.annotate_for_transitions()``, and the new state is written using one ``UPDATE``
+        per target state. Only transitions declared with ``custom=dict(bulk=True)`` can be applied
+        this way, since their methods are not invoked. Notifications are sent after the
+        transaction has been committed.
 
+        :returns: A dict mapping each reached state onto the list of primary keys of the orders
+            moved into that state.
+        """
+        from wagtail_site.shop.transition import bulk_transition_notification
+
+        graph = self.model.get_transition_graph()
+        try:
+            meta = getattr(self.model, name)._django_fsm
+        except AttributeError:
+            raise ValueError("Order model has no transition named '{}'".format(name))
+        if not all(t.custom.get('bulk') for t in meta.transitions.values()):
+            raise ValueError("Transition '{}' can not be applied in bulk".format(name))
+
+        status_field = self.model._meta.get_field('status')
+        moved, sources = defaultdict(list), defaultdict(set)
+        with transaction.atomic():
+            orders = self.model.annotate_for_transitions(self.select_for_update())
+            for order in orders:
+                if not (meta.has_transition(order.status) and meta.conditions_met(order, order.status)):
+                    continue
+                target = graph.get_bulk_target(order, meta.get_transition(order.status))
+                if target is None:
+                    continue
+                moved[target].append(order)
+                sources[target].add(order.status)
+            for target, batch in moved.items():
+                self.model.objects.filter(pk__in=[o.pk for o in batch], status__in=sources[target]).update(
+                    status=target, updated_at=timezone.now())
+                for order in batch:
+                    # the status field is protected, hence set the state the way django-fsm does
+                    status_field.set_state(order, target)
+                self.model.post_bulk_transition(target, batch, by=by)
+        result = {target: [o.pk for o in batch] for target, batch in moved.items()}
+        for target, order_pks in result.items():
+            bulk_transition_notification(order_pks, target)
+        return result
+
+
+class OrderManager(models.Manager.from_queryset(OrderQuerySet)):
     def create_from_cart(self, cart, request):
         """
         This creates a new empty Order object with a valid order number (many payment service
@@ -134,6 +208,96 @@ class WorkflowMixinMetaclass(deferred.ForeignKeyBuilder):
         return result
 
 
+class TransitionGraph:
+    """
+    Compiled representation of all state transitions of an Order model, built once from the
+    transitions declared by its workflow mixins. It offers constant time lookups for the
+    transitions leaving a given state.
+    """
+    def __init__(self, model):
+        field = model._meta.get_field('status')
+        self.metas = [method._django_fsm for method in field.transitions.get(model, {}).values()]
+        self.transitions = [transition for meta in self.metas for transition in meta.transitions.values()]
+        self.target_names = dict(model._transition_targets)
+        self.targets = {}  # all reachable states, in order of declaration
+        for transition in self.transitions:
+            if isinstance(transition.target, RETURN_VALUE):
+                for target in transition.target.allowed_states:
+                    self.targets[target] = self.get_transition_name(target)
+            elif isinstance(transition.target, str):
+                self.targets[transition.target] = self.get_transition_name(transition.target)
+        self.auto_transitions = dict(model._auto_transitions)
+        # choices to filter orders by status, omitting those not yet populated
+        self.filter_choices = [(state, name) for state, name in self.target_names.items()
+                               if state not in ('new', 'created')]
+        states = set(self.targets).union(self.target_names)
+        states.update(t.source for t in self.transitions if t.source not in (ANY_STATE, ANY_OTHER_STATE))
+        self._by_source = {}
+        self._admin_by_source = {}
+        for state in states:
+            self._compile(state)
+
+    def _compile(self, state):
+        transitions = [meta.get_transition(state) for meta in self.metas if meta.has_transition(state)]
+        self._by_source[state] = transitions
+        self._admin_by_source[state] = [t for t in transitions if t.custom.get('admin')]
+        return transitions
+
+    def get_transition_name(self, target):
+        return self.target_names.get(target, target)
+
+    def get_transitions(self, source):
+        """
+        :returns: The list of transitions leaving the given state, regardless of their conditions.
+        """
+        try:
+            return self._by_source[source]
+        except KeyError:
+            return self._compile(source)
+
+    def get_admin_transitions(self, source):
+        """
+        :returns: The list of transitions leaving the given state, which are offered as admin buttons.
+        """
+        if source not in self._admin_by_source:
+            self._compile(source)
+        return self._admin_by_source[source]
+
+    def get_available_transitions(self, order, admin=False):
+        """
+        :returns: A generator over the transitions leaving the order's current state, whose
+            conditions are met.
+        """
+        transitions = self.get_admin_transitions(order.status) if admin else self.get_transitions(order.status)
+        for transition in transitions:
+            if all(condition(order) for condition in transition.conditions):
+                yield transition
+
+    def get_auto_transition(self, source):
+        return self.auto_transitions.get(source)
+
+    def get_bulk_target(self, order, transition):
+        """
+        Follow the given transition and the automatic transitions triggered thereafter, while
+        saving the order.
+
+        :returns: The state the order finally reaches, or ``None`` if its target is computed by
+            the transition method or an automatic transition can not be applied in bulk.
+        """
+        target = transition.target
+        while isinstance(target, str):
+            auto_transition = self.get_auto_transition(target)
+            if auto_transition is None:
+                return target
+            meta = auto_transition._django_fsm
+            if not meta.has_transition(target) or not meta.conditions_met(order, target):
+                return target
+            transition = meta.get_transition(target)
+            if not transition.custom.get('bulk'):
+                return None
+            target = transition.target
+
+
 class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
     """
     An Order is the "in process" counterpart of the shopping cart, which freezes the state of the
@@ -151,6 +315,7 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         'decimal_places': 2,
     }
     decimal_exp = Decimal('.' + '0' * decimalfield_kwargs['decimal_places'])
+    aggregate_fields = ['_amount_paid', 'unfulfilled_quantity']
 
     customer = deferred.ForeignKey(
         'BaseCustomer',
@@ -181,6 +346,21 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         **decimalfield_kwargs
     )
 
+    _amount_paid = models.DecimalField(
+        _("Amount paid"),
+        default=0,
+        editable=False,
+        help_text=_("Sum of all payments received for this order."),
+        **decimalfield_kwargs
+    )
+
+    unfulfilled_quantity = models.IntegerField(
+        _("Unfulfilled quantity"),
+        default=0,
+        editable=False,
+        help_text=_("Quantity of ordered items not delivered yet."),
+    )
+
     created_at = models.DateTimeField(
         _("Created at"),
         auto_now_add=True,
@@ -284,18 +464,32 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
 
         Override this method, in case a customized cart has some fields which have to be transferred
         to the cart.
+
+        The cart items already computed by ``cart.update(request)`` are reused. All order items
+        are created using one bulk insert and all transferred cart items are deleted at once,
+        hence ``OrderItem.save()`` is not invoked; customize ``populate_from_cart_item`` instead.
         """
         assert hasattr(cart, 'subtotal') and hasattr(cart, 'total'), \
             "Did you forget to invoke 'cart.update(request)' before populating from cart?"
-        for cart_item in cart.items.all():
-            cart_item.update(request)
+        cart.update(request)  # only recomputed, if the cart changed since
+        order_items, cart_item_ids, deductions = [], [], []
+        for cart_item in cart._cached_cart_items:
+            cart_item.update(request, refresh=False)
             order_item = OrderItemModel(order=self)
             try:
                 order_item.populate_from_cart_item(cart_item, request)
-                order_item.save()
-                cart_item.delete()
             except CartItemModel.DoesNotExist:
-                pass
+                continue
+            order_item.round_amounts()
+            order_items.append(order_item)
+            cart_item_ids.append(cart_item.pk)
+            deductions.append(order_item.get_stock_deduction(cart_item))
+        # deduct the stock of all ordered products at once
+        ProductModel.objects.deduct_from_stock(deductions)
+        OrderItemModel.objects.bulk_create(order_items)
+        CartItemModel.objects.filter(pk__in=cart_item_ids).delete()
+        self.__class__.objects.filter(pk=self.pk).update_delivery_totals()
+        self.refresh_delivery_totals()
         self._subtotal = Decimal(cart.subtotal)
         self._total = Decimal(cart.total)
         self.extra = dict(cart.extra)
@@ -327,26 +521,73 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         """
         from wagtail_site.shop.transition import transition_change_notification
 
-        auto_transition = self._auto_transitions.get(self.status)
+        auto_transition = self.get_transition_graph().get_auto_transition(self.status)
         if callable(auto_transition):
             auto_transition(self)
 
         # round the total to the given decimal_places
         self._subtotal = BaseOrder.round_amount(self._subtotal)
         self._total = BaseOrder.round_amount(self._total)
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # the stored aggregates are maintained by their related objects, never overwrite them
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.aggregate_fields]
         super().save(**kwargs)
         if with_notification:
             transition_change_notification(self)
 
-    @cached_property
+    @property
     def amount_paid(self):
         """
-        The amount paid is the sum of related orderpayments
+        The amount paid is the sum of related orderpayments. It is kept in a stored column, which is
+        updated whenever a payment is saved or deleted.
+        """
+        amount = getattr(self, 'annotated_amount_paid', self._amount_paid)
+        if not amount:
+            return MoneyMaker(self.currency)()
+        return MoneyMaker(self.currency)(amount)
+
+    def refresh_payment_totals(self):
+        """
+        Reload the amount paid, after payments have been added to this order.
         """
-        amount = self.orderpayment_set.aggregate(amount=Sum('amount'))['amount']
-        if amount is None:
-            amount = MoneyMaker(self.currency)()
-        return amount
+        self.__dict__.pop('annotated_amount_paid', None)
+        self.refresh_from_db(fields=['_amount_paid'])
+
+    def refresh_delivery_totals(self):
+        """
+        Reload the unfulfilled quantity, after items of this order have been delivered.
+        """
+        self.__dict__.pop('annotated_unfulfilled_quantity', None)
+        self.refresh_from_db(fields=['unfulfilled_quantity'])
+
+    @classmethod
+    def get_amount_paid_expression(cls):
+        """
+        Return an expression computing the sum of payments for each order in a queryset.
+        """
+        output_field = models.DecimalField(**cls.decimalfield_kwargs)
+        payments = OrderPayment.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        payments = payments.annotate(total=Sum('amount', output_field=output_field)).values('total')
+        return Coalesce(models.Subquery(payments), models.Value(Decimal(0)), output_field=output_field)
+
+    @classmethod
+    def get_unfulfilled_quantity_expression(cls):
+        """
+        Return an expression computing the ordered quantity not delivered yet for each order in a
+        queryset. Canceled items are skipped, and deliveries are only taken into account, if a
+        delivery item model has been materialized.
+        """
+        items = OrderItemModel.objects.filter(order=models.OuterRef('pk'))
+        if any(field.name == 'canceled' for field in OrderItemModel._meta.get_fields()):
+            items = items.filter(canceled=False)
+        items = items.order_by().values('order')
+        ordered = items.annotate(total=Sum('quantity')).values('total')
+        unfulfilled = Coalesce(models.Subquery(ordered), models.Value(0))
+        if any(rel.name == 'deliver_item' for rel in OrderItemModel._meta.related_objects):
+            delivered = items.annotate(total=Sum('deliver_item__quantity')).values('total')
+            unfulfilled = unfulfilled - Coalesce(models.Subquery(delivered), models.Value(0))
+        return models.ExpressionWrapper(unfulfilled, output_field=models.IntegerField())
 
     @property
     def outstanding_amount(self):
@@ -384,12 +625,44 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         Hook to withdraw shipping order.
         """
 
+    @classmethod
+    def annotate_for_transitions(cls, queryset):
+        """
+        Hook to annotate a queryset of orders with everything their transition conditions need,
+        so that they can be checked on many orders without running extra queries on each of them.
+        """
+        return queryset.with_payment_totals()
+
+    @classmethod
+    def post_bulk_transition(cls, target, orders, by=None):
+        """
+        Hook invoked after the given orders have been moved into state ``target`` by
+        ``OrderQuerySet.bulk_transition()``. Workflow mixins may override this, for instance to
+        create deliveries for those orders.
+        """
+
+    @classmethod
+    def get_transition_graph(cls):
+        """
+        :returns: The compiled :class:`TransitionGraph` of the Order model, built on first use.
+        """
+        graph = cls.__dict__.get('_transition_graph')
+        if graph is None:
+            graph = cls._transition_graph = TransitionGraph(cls)
+        return graph
+
     @classmethod
     def get_all_transitions(cls):
         """
-        :returns: A generator over all transition objects for this Order model.
+        :returns: A list of all transition objects for this Order model.
         """
-        return cls.status.field.get_all_transitions(OrderModel)
+        return cls.get_transition_graph().transitions
+
+    def get_available_transitions(self, admin=False):
+        """
+        :returns: A generator over the transitions available from the current state of this order.
+        """
+        return self.get_transition_graph().get_available_transitions(self, admin=admin)
 
     @classmethod
     def get_transition_name(cls, target):
@@ -448,6 +721,23 @@ class OrderPayment(models.Model, metaclass=deferred.ForeignKeyBuilder):
     def __str__(self):
         return _("Payment ID: {}").format(self.id)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_order_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.update_order_totals()
+        return result
+
+    def update_order_totals(self):
+        """
+        Recompute the amount paid stored on the order this payment belongs to.
+        """
+        OrderModel.objects.filter(pk=self.order_id).update_payment_totals()
+
 
 class BaseOrderItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
     """
@@ -544,12 +834,10 @@ class BaseOrderItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         From a given cart item, populate the current order item.
         If the operation was successful, the given item shall be removed from the cart.
         If an exception of type :class:`CartItem.DoesNotExist` is raised, discard the order item.
+        The stock of the ordered product is deducted afterward, for all order items at once.
         """
         if cart_item.quantity == 0:
             raise CartItemModel.DoesNotExist("Cart Item is on the Wish List")
-        kwargs = {'product_code': cart_item.product_code}
-        kwargs.update(cart_item.extra)
-        cart_item.product.deduct_from_stock(cart_item.quantity, **kwargs)
         self.product = cart_item.product
         # for historical integrity, store the product's name and price at the moment of purchase
         self.product_name = cart_item.product.product_name
@@ -561,12 +849,68 @@ class BaseOrderItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         extra_rows = [(modifier, extra_row.data) for modifier, extra_row in cart_item.extra_rows.items()]
         self.extra.update(rows=extra_rows)
 
-    def save(self, *args, **kwargs):
+    def get_stock_deduction(self, cart_item):
         """
-        Before saving the OrderItem object to the database, round the amounts to the given decimal places
+        Return the tuple ``(product, quantity, kwargs)`` to be deducted from stock for the given cart
+        item. Override this method, in case the deduction depends on further fields of the cart item.
+        """
+        kwargs = {'product_code': cart_item.product_code}
+        kwargs.update(cart_item.extra)
+        return cart_item.product, cart_item.quantity, kwargs
+
+    def round_amounts(self):
+        """
+        Round the amounts to the given decimal places.
         """
         self._unit_price = BaseOrder.round_amount(self._unit_price)
         self._line_total = BaseOrder.round_amount(self._line_total)
-        super().save(*args, **kwargs)
+
+    def save(self, *args, **kwargs):
+        """
+        Before saving the OrderItem object to the database, round the amounts to the given decimal places
+        """
+        self.round_amounts()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # ordered quantities may have changed or items may have been canceled
+            self.update_order_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.update_order_totals()
+        return result
+
+    def update_order_totals(self):
+        """
+        Recompute the unfulfilled quantity stored on the order this item belongs to.
+        """
+        OrderModel.objects.filter(pk=self.order_id).update_delivery_totals()
 
 OrderItemModel = deferred.MaterializedModel(BaseOrderItem)
+
+
+def update_order_totals(sender, instance, origin=None, **kwargs):
+    """
+    Recompute the totals stored on the order of an ordered item, delivery item or payment, which
+    has been deleted by a cascade or by deleting a queryset, rather than by its own ``delete()``
+    method. Since this receiver is invoked inside the transaction deleting the object, the totals
+    are updated atomically.
+    """
+    if origin is instance:
+        return
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if issubclass(origin_model, BaseOrder):
+        # the order is deleted itself
+        return
+    instance.update_order_totals()
+
+
+post_delete.connect(update_order_totals, sender=OrderPayment)
+
+
+@receiver(class_prepared)
+def connect_order_item_signals(sender, **kwargs):
+    # connect to the materialized ordered item model only, so that other models keep fast deletes
+    if issubclass(sender, BaseOrderItem) and not sender._meta.abstract:
+        post_delete.connect(update_order_totals, sender=sender)
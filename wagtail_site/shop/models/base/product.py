@@ -5,9 +5,7 @@ from django.apps import apps
 from django.conf import settings
 from django.core import checks
 from django.core.cache import cache
-from django.db import models
-from django.db.models.aggregates import Sum
-from django.db.models.functions import Coalesce
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
@@ -52,8 +50,9 @@ class Availability:
         tzinfo = timezone.get_current_timezone()
         self.earliest = kwargs.get('earliest', timezone.datetime.min.replace(tzinfo=tzinfo))
         self.latest = kwargs.get('latest', timezone.datetime.max.replace(tzinfo=tzinfo))
-        quantity = kwargs.get('quantity', app_settings.MAX_PURCHASE_QUANTITY)
-        self.quantity = min(quantity, app_settings.MAX_PURCHASE_QUANTITY)
+        max_purchase_quantity = app_settings.MAX_PURCHASE_QUANTITY
+        quantity = kwargs.get('quantity', max_purchase_quantity)
+        self.quantity = min(quantity, max_purchase_quantity)
         self.sell_short = bool(kwargs.get('sell_short', False))
         self.limited_offer = bool(kwargs.get('limited_offer', False))
         self.inventory = bool(kwargs.get('inventory', None))
@@ -80,11 +79,47 @@ class AvailableProductMixin:
         """
         return Availability(quantity=self.quantity)
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        return {product.pk: Availability(quantity=product.quantity) for product in products}
+
     def deduct_from_stock(self, quantity, **kwargs):
-        if quantity > self.quantity:
-            raise ProductNotAvailable(self)
-        self.quantity -= quantity
-        self.save(update_fields=['quantity'])
+        """
+        Deduct the requested quantity using a conditional update, which fails rather than
+        overselling, if a concurrent checkout reduced the stock in the meantime.
+        """
+        self.bulk_deduct_from_stock([(self, quantity, kwargs)])
+
+    @classmethod
+    def bulk_deduct_from_stock(cls, deductions):
+        """
+        Deduct the quantities of many products in one ``UPDATE`` statement, setting
+        ``quantity = quantity - n`` only on rows where ``quantity >= n``, so that concurrent
+        checkouts never oversell a product without locking its row. If a product is out of stock,
+        the deduction is rolled back and the stock is read again, to report that product.
+        """
+        quantities = {}
+        for product, quantity, kwargs in deductions:
+            quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+        quantity_field = cls._meta.get_field('quantity')
+        manager = quantity_field.model._base_manager
+        deducted = models.Case(*[models.When(pk=pk, then=models.Value(quantity))
+                                 for pk, quantity in quantities.items()], output_field=quantity_field)
+        queryset = manager.filter(pk__in=quantities.keys(), quantity__gte=deducted)
+        with transaction.atomic():
+            updated = queryset.update(quantity=models.F('quantity') - deducted)
+            if updated < len(quantities):
+                # never keep a partial deduction
+                transaction.set_rollback(True)
+        if updated < len(quantities):
+            in_stock = dict(manager.filter(pk__in=quantities.keys()).values_list('pk', 'quantity'))
+            for product, quantity, kwargs in deductions:
+                if in_stock.get(product.pk, 0) < quantities[product.pk]:
+                    raise ProductNotAvailable(product)
+            # the stock has been replenished in the meantime
+            raise ProductNotAvailable(deductions[0][0])
+        for product, quantity, kwargs in deductions:
+            product.quantity -= quantity
 
     def managed_availability(self):
         return True
@@ -121,14 +156,30 @@ class BaseReserveProductMixin:
         is adjusted accordingly. Therefore, make sure to invalidate carts, which were not
         converted into an order after a determined period of time. Otherwise, the quantity
         returned by this function might be considerably lower, than what it could be.
+
+        The quantity held in carts is read from the product's reservation counter, rather than
+        being summed up over all cart items.
         """
-        from wagtail_site.shop.models.base.cart import CartItemModel
+        from wagtail_site.shop.models.base.cart import ProductReservationModel
 
         availability = super().get_availability(request, **kwargs)
-        cart_items = CartItemModel.objects.filter(product=self).values('quantity')
-        availability.quantity -= cart_items.aggregate(sum=Coalesce(Sum('quantity'), 0))['sum']
+        availability.quantity -= ProductReservationModel.objects.get_reserved_quantities([self.pk])[self.pk]
         return availability
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Same as `get_availability`, but for many products at once, reading all their reservation
+        counters in one query.
+        """
+        from wagtail_site.shop.models.base.cart import ProductReservationModel
+
+        availabilities = super().get_availabilities(products, request)
+        reserved = ProductReservationModel.objects.get_reserved_quantities(list(availabilities.keys()))
+        for pk, quantity in reserved.items():
+            availabilities[pk].quantity -= quantity
+        return availabilities
+
 
 class ReserveProductMixin(BaseReserveProductMixin, AvailableProductMixin):
     """
@@ -165,6 +216,81 @@ class BaseProductManager(PolymorphicManager):
         queryset = self.get_queryset().filter(active=True)
         return queryset
 
+    def annotate_prices(self, queryset, request):
+        """
+        Annotate each product in the given queryset with its price as ``annotated_price``, so that
+        prices for a whole page of products are computed by the database in one pass. Querysets
+        of product models not offering a ``get_price_expression()`` are returned unaltered.
+        """
+        expression = self.model.get_price_expression(request)
+        if expression is None:
+            return queryset
+        return queryset.annotate(annotated_price=expression)
+
+    def get_availabilities(self, products, request, fallback=True, **kwargs):
+        """
+        Return a dictionary mapping the primary key of each given product onto its availability.
+        Products are grouped by their polymorphic model, whose ``get_availabilities()`` computes
+        the availability of all products of that group at once.
+
+        :param fallback: If ``True``, products whose model does not compute availabilities in
+            bulk, are checked one by one through ``product.get_availability(request, **kwargs)``.
+            Otherwise they are missing in the returned dictionary.
+        """
+        products_by_model = {}
+        for product in products:
+            products_by_model.setdefault(product.__class__, []).append(product)
+        availabilities = {}
+        for product_model, model_products in products_by_model.items():
+            availabilities.update(product_model.get_availabilities(model_products, request))
+            if fallback:
+                for product in model_products:
+                    if product.pk not in availabilities:
+                        availabilities[product.pk] = product.get_availability(request, **kwargs)
+        return availabilities
+
+    def deduct_from_stock(self, deductions):
+        """
+        Deduct the stock of many products at once. Products are grouped by their polymorphic
+        model, whose ``bulk_deduct_from_stock()`` handles all deductions of that group.
+        This shall be called inside a transaction, so that all deductions are rolled back, if
+        one of the products is not available anymore.
+
+        :param deductions: A list of tuples ``(product, quantity, kwargs)``.
+        """
+        deductions_by_model = {}
+        for deduction in deductions:
+            deductions_by_model.setdefault(deduction[0].__class__, []).append(deduction)
+        for product_model, model_deductions in deductions_by_model.items():
+            product_model.bulk_deduct_from_stock(model_deductions)
+
+    def get_prices(self, products, request, include_tax=False):
+        """
+        Return a dictionary mapping the primary key of each given product onto its price.
+
+        If ``products`` is an unevaluated queryset, prices are read as ``values_list`` columns
+        without instantiating any product. Otherwise the ``annotated_price`` added by method
+        ``annotate_prices()`` is used, falling back onto ``product.get_price(request)``.
+
+        :param include_tax: If ``True``, net prices are converted into gross prices using
+            ``SHOP_VALUE_ADDED_TAX``.
+        """
+        expression = self.model.get_price_expression(request)
+        if isinstance(products, models.QuerySet) and products._result_cache is None and expression is not None:
+            prices = dict(products.values_list('pk', expression))
+        else:
+            prices = {}
+            for product in products:
+                try:
+                    prices[product.pk] = product.annotated_price
+                except AttributeError:
+                    prices[product.pk] = product.get_price(request)
+        if include_tax:
+            tax_factor = 1 + app_settings.VALUE_ADDED_TAX / 100
+            for pk, price in prices.items():
+                prices[pk] = price * tax_factor
+        return prices
+
 
 class PolymorphicProductMetaclass(deferred.PolymorphicForeignKeyBuilder):
 
@@ -215,6 +341,9 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
         help_text=_("Is this product publicly visible."),
     )
 
+    # relations accessed by `get_availability()`, prefetched for all items when loading a cart
+    availability_lookups = ()
+
     class Meta:
         abstract = True
         verbose_name = _("Product")
@@ -252,6 +381,16 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
         msg = "Method get_price() must be implemented by subclass: `{}`"
         raise NotImplementedError(msg.format(self.__class__.__name__))
 
+    @classmethod
+    def get_price_expression(cls, request):
+        """
+        Optional hook for returning a query expression, which computes the price of this product
+        model inside the database. It is used by ``ProductModel.objects.get_prices()`` to price
+        many products at once. Return ``None``, if the price can only be computed through method
+        ``get_price(request)``.
+        """
+        return None
+
     def get_product_variant(self, **kwargs):
         """
         Hook for returning the variant of a product using parameters passed in by **kwargs.
@@ -284,6 +423,20 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
         """
         return Availability()
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Hook for checking the availability of many products of this model at once, for instance
+        using grouped queries. Products with variations, whose availability depends on the extra
+        arguments passed to ``get_availability()``, shall not implement this hook.
+
+        :param products: A list of products of this model.
+
+        :return: A dictionary mapping the primary keys of those products, whose availability could
+            be determined, onto objects of type :class:`shop.models.product.Availability`.
+        """
+        return {}
+
     def managed_availability(self):
         """
         :return True: If this product has its quantity managed by some inventory functionality.
@@ -321,6 +474,19 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
             variations.
         """
 
+    @classmethod
+    def bulk_deduct_from_stock(cls, deductions):
+        """
+        Hook to deduct the stock of many products of this model at once, for instance using a
+        single conditional update. By default, ``deduct_from_stock()`` is called for each product.
+
+        :param deductions: A list of tuples ``(product, quantity, kwargs)``.
+
+        :raises ProductNotAvailable: If one of the products can not be deducted from stock.
+        """
+        for product, quantity, kwargs in deductions:
+            product.deduct_from_stock(quantity, **kwargs)
+
     def get_weight(self):
         """
         Optional hook to return the product's gross weight in kg. This information is required to
@@ -1,7 +1,16 @@
 from django.db.models import PositiveIntegerField
+from django.utils.translation import gettext_lazy as _
+
 from wagtail_site.shop.models.base import cart
 
 
 class CartItem(cart.BaseCartItem):
     """Default materialized model for CartItem"""
     quantity = PositiveIntegerField()
+
+
+class ProductReservation(cart.BaseProductReservation):
+    """Default materialized model for ProductReservation"""
+    class Meta:
+        verbose_name = _("Product reservation")
+        verbose_name_plural = _("Product reservations")
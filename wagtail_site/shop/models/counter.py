@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class NumberCounter(models.Model):
+    """
+    Holds the last number handed out for a series of numbers, for instance of orders or
+    customers. Used by :class:`shop.numbering.CounterNumberAllocator`.
+    """
+    series = models.CharField(
+        _("Series"),
+        max_length=50,
+        primary_key=True,
+    )
+
+    value = models.PositiveBigIntegerField(
+        _("Last number"),
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = _("Number counter")
+        verbose_name_plural = _("Number counters")
+
+    def __str__(self):
+        return "{}: {}".format(self.series, self.value)
@@ -32,11 +32,15 @@ class Customer(BaseCustomer):
 
     def get_or_assign_number(self):
         if self.number is None:
-            aggr = Customer.objects.filter(number__isnull=False).aggregate(models.Max('number'))
-            self.number = (aggr['number__max'] or 0) + 1
+            self.number = app_settings.NUMBER_ALLOCATOR.allocate('customer', self.get_last_number)
             self.save()
         return self.get_number()
 
+    @classmethod
+    def get_last_number(cls):
+        aggr = cls.objects.filter(number__isnull=False).aggregate(models.Max('number'))
+        return aggr['number__max'] or 0
+
     def as_text(self):
         template_names = [
             '{}/customer.txt'.format(app_settings.APP_LABEL),
@@ -1,8 +1,14 @@
+from collections import namedtuple
+from time import monotonic
+
 from django.conf import settings
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from post_office.models import EmailTemplate
+from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.models.base.fields import ChoiceEnum, ChoiceEnumField
 from wagtail.documents import get_document_model
 
@@ -57,13 +63,15 @@ class Notification(models.Model):
     def __str__(self):
         return self.name
 
-    def get_recipient(self, order):
+    def get_recipient(self, order, recipient_email=None):
         """
         Returns the email address of the vendor .
+
+        :param recipient_email: The email address of ``self.recipient``, if already known.
         """
 
         if self.notify is Notify.RECIPIENT:
-            return self.recipient.email
+            return recipient_email or self.recipient.email
         if self.notify is Notify.CUSTOMER:
             return order.customer.email
         if self.notify is Notify.VENDOR:
@@ -87,3 +95,51 @@ class NotificationAttachment(models.Model):
 
     class Meta:
         app_label = 'shop'
+
+
+NotificationRoute = namedtuple('NotificationRoute', ['notification', 'recipient_email', 'templates', 'attachments'])
+
+# The routing table of all notifications, keyed by their transition target
+_notification_routes = {'table': None, 'expires': 0}
+
+
+def build_notification_routes():
+    """
+    Load all notifications together with their recipients, email templates and attachments and
+    return them as a dictionary mapping each transition target onto a list of routes.
+    """
+    notifications = Notification.objects.select_related('recipient', 'mail_template').prefetch_related(
+        'mail_template__translated_templates', 'attachments__attachment')
+    table = {}
+    for notification in notifications:
+        templates = {template.language: template for template in notification.mail_template.translated_templates.all()}
+        templates[None] = notification.mail_template
+        attachments = [notiatt.attachment for notiatt in notification.attachments.all() if notiatt.attachment]
+        recipient_email = notification.recipient.email if notification.recipient else None
+        route = NotificationRoute(notification, recipient_email, templates, attachments)
+        table.setdefault(notification.transition_target, []).append(route)
+    return table
+
+
+def get_notification_routes(transition_target):
+    """
+    Return the list of notification routes for the given transition target. The routing table
+    is built once and kept, for at most ``SHOP_SETTINGS_CACHE_TIMEOUT`` seconds, throughout the
+    process. Changing a notification, its attachments or an email template invalidates it.
+    """
+    now = monotonic()
+    table = _notification_routes['table']
+    if table is None or _notification_routes['expires'] < now:
+        table = build_notification_routes()
+        _notification_routes.update(table=table, expires=now + app_settings.SETTINGS_CACHE_TIMEOUT)
+    return table.get(transition_target, [])
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+@receiver(post_save, sender=NotificationAttachment)
+@receiver(post_delete, sender=NotificationAttachment)
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def reset_notification_routes(**kwargs):
+    _notification_routes['table'] = None
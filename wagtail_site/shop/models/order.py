@@ -5,6 +5,7 @@ from urllib.parse import urljoin
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
+from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.models.base import order
 
 
@@ -46,20 +47,29 @@ class Order(order.BaseOrder):
     def get_or_assign_number(self):
         """
         Set a unique number to identify this Order object. The first 4 digits represent the
-        current year. The last five digits represent a zero-padded incremental counter.
+        current year. The last five digits represent a zero-padded incremental counter, handed out
+        by the configured number allocator.
         """
         if self.number is None:
-            epoch = timezone.now()
-            epoch = epoch.replace(epoch.year, 1, 1, 0, 0, 0, 0)
-            aggr = Order.objects.filter(number__isnull=False, created_at__gt=epoch).aggregate(models.Max('number'))
-            try:
-                epoc_number = int(str(aggr['number__max'])[4:]) + 1
-                self.number = int('{0}{1:05d}'.format(epoch.year, epoc_number))
-            except (KeyError, ValueError):
-                # the first order this year
-                self.number = int('{0}00001'.format(epoch.year))
+            year = timezone.now().year
+            series = 'order-{}'.format(year)
+            epoch_number = app_settings.NUMBER_ALLOCATOR.allocate(series, lambda: self.get_last_epoch_number(year))
+            self.number = int('{0}{1:05d}'.format(year, epoch_number))
         return self.get_number()
 
+    @classmethod
+    def get_last_epoch_number(cls, year):
+        """
+        Return the incremental counter of the last order number assigned in the given year.
+        """
+        epoch = timezone.now().replace(year, 1, 1, 0, 0, 0, 0)
+        aggr = cls.objects.filter(number__isnull=False, created_at__gt=epoch).aggregate(models.Max('number'))
+        try:
+            return int(str(aggr['number__max'])[4:])
+        except ValueError:
+            # the first order this year
+            return 0
+
     def get_number(self):
         number = str(self.number)
         return '{}-{}'.format(number[:4], number[4:])
@@ -10,6 +10,20 @@ from wagtail_site.shop.models.product import Product
 from wagtail_site.shop.models.category import ProductCategory
 
 
+def add_offers(products, request):
+    """
+    Price and check the whole page of products at once, rather than product by product, setting
+    ``listing_price`` and ``availability`` on each product rendered by the listing.
+    """
+    products = list(products)
+    prices = Product.objects.get_prices(products, request)
+    availabilities = Product.objects.get_availabilities(products, request)
+    for product in products:
+        product.listing_price = prices[product.pk]
+        product.availability = availabilities[product.pk]
+    return products
+
+
 class AbstractCategoryPage(PaginatedListPageMixin, AbstractWebPage):
     """Wagtail page for product categories"""
 
@@ -42,6 +56,11 @@ class AbstractCategoryPage(PaginatedListPageMixin, AbstractWebPage):
         product = get_object_or_404(Product, slug=slug)
         return self.render(request, context_overrides={"product": product, 'title': 'Product details' }, template='shop/product-detail.html')
 
+    def get_listing_context(self, request, *args, **kwargs):
+        context = super().get_listing_context(request, *args, **kwargs)
+        context['object_list'] = context[self.context_object_name] = add_offers(context['object_list'], request)
+        return context
+
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
         context['category'] = self.category
@@ -88,6 +107,11 @@ class AbstractShopPage(PaginatedListPageMixin, AbstractWebPage):
             template='shop/product-detail.html'
         )
 
+    def get_listing_context(self, request, *args, **kwargs):
+        context = super().get_listing_context(request, *args, **kwargs)
+        context['object_list'] = context[self.context_object_name] = add_offers(context['object_list'], request)
+        return context
+
     def get_context(self, request, *args, **kwargs):
         context = super().get_context(request, *args, **kwargs)
         context['categories'] = ProductCategory.objects.all()
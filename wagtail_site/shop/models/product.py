@@ -27,6 +27,10 @@ class CommodityMixin(AvailableProductMixin):
     def get_price(self, request):
         return self.unit_price
 
+    @classmethod
+    def get_price_expression(cls, request):
+        return models.F('unit_price')
+
 
 class ProductQuerySet(PolymorphicQuerySet):
     pass
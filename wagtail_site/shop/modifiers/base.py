@@ -10,7 +10,9 @@ class BaseCartModifier:
     The methods defined here are called in the following sequence:
     1. `pre_process_cart`: Totals are not computed, the cart is "rough": only relations and
     quantities are available
-    1a. `pre_process_cart_item`: Line totals are not computed, the cart and its items are "rough":
+    1a. `prepare_cart_items`: Called once with all cart items about to be processed, allowing to
+    collect data for all of them at once.
+    1b. `pre_process_cart_item`: Line totals are not computed, the cart and its items are "rough":
     only relations and quantities are available
     2. `process_cart_item`: Called for each cart_item in the cart. The modifier may change the
     amount in `cart_item.line_total`.
@@ -26,7 +28,13 @@ class BaseCartModifier:
     Each method accepts the HTTP ``request`` object. It shall be used to let implementations
     determine their prices, availability, taxes, discounts, etc. according to the identified
     customer, the originating country, and other request information.
+
+    A modifier whose methods `pre_process_cart_item` and `process_cart_item` only depend on the
+    given cart item, may set ``incremental = True``. If all modifiers do so, the cart reprocesses
+    only those items which changed since its last update, reusing the line totals of all others.
     """
+    incremental = False
+
     def __init__(self):
         assert hasattr(self, 'identifier'), "Each Cart modifier class requires a unique identifier"
 
@@ -37,6 +45,14 @@ class BaseCartModifier:
         """
         return watch_items
 
+    def get_prefetch_lookups(self, request):
+        """
+        Return the lookups, relative to the cart item, of all relations this modifier accesses on
+        each cart item, for instance ``['product']``. When loading the cart, they are combined into
+        one prefetch plan, so that these relations are fetched for all items at once.
+        """
+        return []
+
     # these methods are only used for the cart items
 
     def arrange_cart_items(self, cart_items, request):
@@ -59,6 +75,19 @@ class BaseCartModifier:
         :param raise_exception: If ``True``, raise an exception if cart can not be fulfilled.
         """
 
+    def prepare_cart_items(self, cart, items, request):
+        """
+        This method will be called once, before `pre_process_cart_item` is called for each of
+        the given items. It may be used to collect data required by all these items at once,
+        for instance using a single query, rather than item by item.
+
+        :param cart: The cart object.
+
+        :param items: The list of cart items about to be processed.
+
+        :param request: The request object.
+        """
+
     def pre_process_cart_item(self, cart, item, request, raise_exception=False):
         """
         This method will be called for each item before the Cart starts being processed.
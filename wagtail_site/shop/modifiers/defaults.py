@@ -2,6 +2,7 @@ from decimal import Decimal
 from django.utils.translation import gettext_lazy as _
 from wagtail_site.shop import messages
 from wagtail_site.shop.exceptions import ProductNotAvailable
+from wagtail_site.shop.models.base.product import ProductModel
 from wagtail_site.shop.money import AbstractMoney, Money
 from wagtail_site.shop.modifiers.base import BaseCartModifier
 
@@ -14,14 +15,32 @@ class DefaultCartModifier(BaseCartModifier):
     entry in `SHOP_CART_MODIFIERS`.
     """
     identifier = 'default'
+    incremental = True
+
+    def get_prefetch_lookups(self, request):
+        lookups = ['product']
+        lookups.extend('product__' + lookup for lookup in ProductModel.availability_lookups)
+        return lookups
+
+    def prepare_cart_items(self, cart, items, request):
+        """
+        Check the availability of all products in the cart at once.
+        """
+        availabilities = ProductModel.objects.get_availabilities(
+            [item.product for item in items], request, fallback=False)
+        for item in items:
+            item.availability = availabilities.get(item.product_id)
+        return super().prepare_cart_items(cart, items, request)
 
     def pre_process_cart_item(self, cart, cart_item, request, raise_exception=False):
         """
         Limit the ordered quantity in the cart to the availability in the inventory.
         """
-        kwargs = {'product_code': cart_item.product_code}
-        kwargs.update(cart_item.extra)
-        availability = cart_item.product.get_availability(request, **kwargs)
+        availability = getattr(cart_item, 'availability', None)
+        if availability is None:
+            kwargs = {'product_code': cart_item.product_code}
+            kwargs.update(cart_item.extra)
+            availability = cart_item.product.get_availability(request, **kwargs)
         if cart_item.quantity > availability.quantity:
             if raise_exception:
                 raise ProductNotAvailable(cart_item.product)
@@ -57,6 +76,9 @@ class WeightedCartModifier(BaseCartModifier):
     identifier = 'weights'
     initial_weight = Decimal(0.01)  # in kg
 
+    def get_prefetch_lookups(self, request):
+        return ['product']
+
     def pre_process_cart(self, cart, request, raise_exception=False):
         cart.weight = self.initial_weight
         return super().pre_process_cart(cart, request, raise_exception)
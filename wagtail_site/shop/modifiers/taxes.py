@@ -13,6 +13,7 @@ class CartIncludeTaxModifier(BaseCartModifier):
     the shipping costs. Otherwise shipping cost are considered tax free.
     """
     identifier = 'taxes'
+    incremental = True
     taxes = app_settings.VALUE_ADDED_TAX / 100
 
     def add_extra_cart_row(self, cart, request):
@@ -34,6 +35,7 @@ class CartExcludedTaxModifier(BaseCartModifier):
     and that the tax is calculated per cart but not added to the cart.
     """
     identifier = 'taxes'
+    incremental = True
     taxes = 1 - 1 / (1 + app_settings.VALUE_ADDED_TAX / 100)
 
     def add_extra_cart_row(self, cart, request):
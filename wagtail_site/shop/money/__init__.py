@@ -1,4 +1,4 @@
-from wagtail_site.shop.money.money_maker import MoneyMaker, AbstractMoney
+from wagtail_site.shop.money.money_maker import MoneyMaker, AbstractMoney, format_many
 
 # The default Money type for this shop
 Money = MoneyMaker()
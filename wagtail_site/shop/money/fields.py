@@ -108,7 +108,11 @@ class MoneyField(models.DecimalField):
     def get_db_prep_save(self, value, connection):
         if isinstance(value, Decimal) and value.is_nan():
             return None
-        return super().get_db_prep_save(value, connection)
+        value = super().get_db_prep_save(value, connection)
+        if isinstance(value, AbstractMoney):
+            # database adapters do not accept subclasses of Decimal
+            return Decimal(value)
+        return value
 
     def get_prep_lookup(self, lookup_type, value):
         if isinstance(value, AbstractMoney):
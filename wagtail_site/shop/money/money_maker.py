@@ -1,5 +1,9 @@
 from decimal import Decimal, InvalidOperation
+from threading import Lock
+
 from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
 from django.utils.formats import get_format
 from django.utils.translation import get_language
 
@@ -7,6 +11,9 @@ from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.money.iso4217 import CURRENCIES
 
 
+_ZERO = Decimal()
+
+
 class AbstractMoney(Decimal):
     MONEY_FORMAT = app_settings.MONEY_FORMAT
 
@@ -43,55 +50,23 @@ class AbstractMoney(Decimal):
         return _make_money, (self._currency_code, Decimal.__str__(self))
 
     def __format__(self, specifier, context=None, _localeconv=None):
-        vals = self._get_format_values()
-        if self.is_nan():
-            amount = '–'  # mdash
-        elif specifier in ('', 'f',):
-            amount = Decimal.quantize(self, self._cents).__format__(specifier)
-        else:
-            amount = Decimal.__format__(self, specifier)
-
-        if settings.USE_L10N:
-            lang, use_l10n = get_language(), True
-        else:
-            lang, use_l10n = None, False
-
-        # handle grouping
-        use_grouping = settings.USE_L10N and settings.USE_THOUSAND_SEPARATOR
-        decimal_sep = get_format('DECIMAL_SEPARATOR', lang, use_l10n=use_l10n)
-        grouping = get_format('NUMBER_GROUPING', lang, use_l10n=use_l10n)
-        thousand_sep = get_format('THOUSAND_SEPARATOR', lang, use_l10n=use_l10n)
-
-        # minus sign for negative amounts
-        if amount[0] == '-':
-            vals.update(minus='-')
-            amount = amount[1:]
-
-        # decimal part
-        if '.' in amount:
-            int_part, dec_part = amount.split('.')
-        else:
-            int_part, dec_part = amount, ''
-        if dec_part:
-            dec_part = decimal_sep + dec_part
-
-        # grouping
-        if use_grouping and grouping > 0:
-            int_part_gd = ''
-            for cnt, digit in enumerate(int_part[::-1]):
-                if cnt and not cnt % grouping:
-                    int_part_gd += thousand_sep[::-1]
-                int_part_gd += digit
-            int_part = int_part_gd[::-1]
+        return self.get_formatter().format(self._format_amount(specifier))
 
-        # recombine parts
-        vals.update(amount=int_part + dec_part)
-        return self.MONEY_FORMAT.format(**vals)
+    def _format_amount(self, specifier):
+        """
+        Return the unlocalized amount as string, ready to be passed to a `MoneyFormatter`.
+        """
+        if self.is_nan():
+            return '–'  # mdash
+        if specifier in ('', 'f',):
+            return Decimal.quantize(self, self._cents).__format__(specifier)
+        return Decimal.__format__(self, specifier)
 
     def __add__(self, other, context=None):
         other = self._assert_addable(other)
-        amount = Decimal.__add__(self, other) if not self.is_nan() else other
-        return self.__class__(amount)
+        if self.is_nan():
+            return Decimal.__new__(self.__class__, other)
+        return Decimal.__new__(self.__class__, Decimal.__add__(self, other))
 
     def __radd__(self, other, context=None):
         return self.__add__(other, context)
@@ -99,22 +74,23 @@ class AbstractMoney(Decimal):
     def __sub__(self, other, context=None):
         other = self._assert_addable(other)
         # self - other is computed as self + other.copy_negate()
-        amount = Decimal.__add__(self, other.copy_negate())
-        return self.__class__(amount)
+        return Decimal.__new__(self.__class__, Decimal.__add__(self, other.copy_negate()))
 
     def __rsub__(self, other, context=None):
         raise ValueError("Can not substract money from something else.")
 
     def __neg__(self, context=None):
-        amount = Decimal.__neg__(self)
-        return self.__class__(amount)
+        return Decimal.__new__(self.__class__, Decimal.__neg__(self))
 
     def __mul__(self, other, context=None):
         if other is None:
             return self.__class__('NaN')
         other = self._assert_multipliable(other)
         amount = Decimal.__mul__(self, other)
-        return self.__class__(amount)
+        if amount is NotImplemented:
+            # let the constructor raise its ValueError, as it did for unsupported operands
+            return self.__class__(amount)
+        return Decimal.__new__(self.__class__, amount)
 
     def __rmul__(self, other, context=None):
         return self.__mul__(other, context)
@@ -155,26 +131,26 @@ class AbstractMoney(Decimal):
     def __lt__(self, other, context=None):
         other = self._assert_addable(other)
         if self.is_nan():
-            return Decimal().__lt__(other)
-        return Decimal.__lt__(self.as_decimal(), other.as_decimal())
+            return _ZERO.__lt__(other)
+        return Decimal.__lt__(Decimal.quantize(self, self._cents), other.as_decimal())
 
     def __le__(self, other, context=None):
         other = self._assert_addable(other)
         if self.is_nan():
-            return Decimal().__le__(other)
-        return Decimal.__le__(self.as_decimal(), other.as_decimal())
+            return _ZERO.__le__(other)
+        return Decimal.__le__(Decimal.quantize(self, self._cents), other.as_decimal())
 
     def __gt__(self, other, context=None):
         other = self._assert_addable(other)
         if self.is_nan():
-            return Decimal().__gt__(other)
-        return Decimal.__gt__(self.as_decimal(), other.as_decimal())
+            return _ZERO.__gt__(other)
+        return Decimal.__gt__(Decimal.quantize(self, self._cents), other.as_decimal())
 
     def __ge__(self, other, context=None):
         other = self._assert_addable(other)
         if self.is_nan():
-            return Decimal().__ge__(other)
-        return Decimal.__ge__(self.as_decimal(), other.as_decimal())
+            return _ZERO.__ge__(other)
+        return Decimal.__ge__(Decimal.quantize(self, self._cents), other.as_decimal())
 
     def __deepcopy__(self, memo):
         return self.__class__(self._cents)
@@ -182,6 +158,13 @@ class AbstractMoney(Decimal):
     def __bool__(self):
         return Decimal.__bool__(self) and not self.is_nan()
 
+    @classmethod
+    def get_formatter(cls):
+        """
+        Return the formatter to render this Money type in the current language.
+        """
+        return get_money_formatter(cls._currency_code, cls.MONEY_FORMAT)
+
     @classmethod
     def currency(cls):
         """
@@ -213,9 +196,14 @@ class AbstractMoney(Decimal):
         return 10**CURRENCIES[cls._currency_code][1]
 
     def _assert_addable(self, other):
+        if other.__class__ is self.__class__:
+            # fast path for the most common case, adding amounts of the same Money type
+            if Decimal.__bool__(other) and not other.is_nan():
+                return other
+            return self._zero
         if not other:
             # so that we can add/substract zero or None to any currency
-            return self.__class__('0')
+            return self._zero
         if self._currency_code != getattr(other, '_currency_code', None):
             raise ValueError("Can not add/substract money in different currencies.")
         return other
@@ -235,16 +223,129 @@ class AbstractMoney(Decimal):
         return other
 
 
+class MoneyFormatter:
+    """
+    Renders amounts of one currency in one language, using a ``MONEY_FORMAT`` such as
+    ``'{minus}{symbol} {amount}'``. The localized separators and the digit grouping are looked
+    up once, when the formatter is built, rather than on each rendered amount.
+    """
+    def __init__(self, currency_code, money_format, lang):
+        currency = CURRENCIES[currency_code]
+        self.money_format = money_format
+        self.format_values = {
+            'code': currency_code,
+            'symbol': currency[2],
+            'currency': str(currency[3]),
+        }
+        if not settings.USE_L10N:
+            lang, use_l10n = None, False
+        else:
+            use_l10n = True
+        self.decimal_sep = get_format('DECIMAL_SEPARATOR', lang, use_l10n=use_l10n)
+        self.thousand_sep = get_format('THOUSAND_SEPARATOR', lang, use_l10n=use_l10n)
+        grouping = get_format('NUMBER_GROUPING', lang, use_l10n=use_l10n)
+        use_grouping = settings.USE_L10N and settings.USE_THOUSAND_SEPARATOR
+        self.grouping = grouping if use_grouping and grouping > 0 else 0
+
+    def format(self, amount):
+        """
+        Render an amount, as returned by `AbstractMoney._format_amount`, into its localized form.
+        """
+        # minus sign for negative amounts
+        if amount[0] == '-':
+            minus, amount = '-', amount[1:]
+        else:
+            minus = ''
+
+        # decimal part
+        int_part, _, dec_part = amount.partition('.')
+        if dec_part:
+            dec_part = self.decimal_sep + dec_part
+
+        # grouping
+        grouping = self.grouping
+        if grouping and len(int_part) > grouping:
+            head = len(int_part) % grouping or grouping
+            groups = [int_part[:head]]
+            groups.extend(int_part[pos:pos + grouping] for pos in range(head, len(int_part), grouping))
+            int_part = self.thousand_sep.join(groups)
+
+        # recombine parts
+        return self.money_format.format(minus=minus, amount=int_part + dec_part, **self.format_values)
+
+
+# Cache of compiled formatters, keyed by language, currency code and money format
+_money_formatters = {}
+
+
+def get_money_formatter(currency_code, money_format=app_settings.MONEY_FORMAT):
+    """
+    Return the `MoneyFormatter` for the given currency in the currently active language.
+    """
+    lang = get_language()
+    key = (lang, currency_code, money_format)
+    try:
+        return _money_formatters[key]
+    except KeyError:
+        formatter = _money_formatters[key] = MoneyFormatter(currency_code, money_format, lang)
+        return formatter
+
+
+def format_many(amounts, specifier=''):
+    """
+    Render many Money amounts at once, as required by price-heavy listings. The formatter
+    is looked up only once per Money type, rather than for each amount.
+    """
+    formatters = {}
+    result = []
+    for amount in amounts:
+        try:
+            formatter = formatters[amount.__class__]
+        except KeyError:
+            formatter = formatters[amount.__class__] = amount.get_formatter()
+        result.append(formatter.format(amount._format_amount(specifier)))
+    return result
+
+
+@receiver(setting_changed)
+def reset_money_formatters(**kwargs):
+    _money_formatters.clear()
+
+
+# Process wide registry of the Money types built by MoneyMaker, keyed by their currency code
+_money_classes = {}
+_money_classes_lock = Lock()
+
+
 class MoneyMaker(type):
     """
     Factory for building Decimal types, which keep track of the used currency. This is to avoid
     unintentional price allocations, when combined with decimals or when working in different
     currencies.
 
+    Each Money type is built only once per currency and then reused, so that ``isinstance`` checks
+    and comparisons of ``type(amount)`` work across the whole process.
+
     No automatic conversion of currencies has been implemented. This could however be achieved
     quite easily in a separate shop plugin.
     """
     def __new__(cls, currency_code=None):
+        if currency_code is None:
+            currency_code = app_settings.DEFAULT_CURRENCY
+        else:
+            currency_code = currency_code.upper()
+        try:
+            return _money_classes[currency_code]
+        except KeyError:
+            pass
+        with _money_classes_lock:
+            # another thread may have built this type while we were waiting for the lock
+            if currency_code not in _money_classes:
+                _money_classes[currency_code] = cls._build_money_class(currency_code)
+        return _money_classes[currency_code]
+
+    @staticmethod
+    def _build_money_class(currency_code):
         def new_money(cls, value='NaN', context=None):
             """
             Build a class named MoneyIn<currency_code> inheriting from Decimal.
@@ -259,10 +360,6 @@ class MoneyMaker(type):
                 raise ValueError(err)
             return self
 
-        if currency_code is None:
-            currency_code = app_settings.DEFAULT_CURRENCY
-        else:
-            currency_code = currency_code.upper()
         if currency_code not in CURRENCIES:
             raise TypeError("'{}' is an unknown currency code. Please check shop/money/iso4217.py".format(currency_code))
         name = str('MoneyIn' + currency_code)
@@ -275,11 +372,14 @@ class MoneyMaker(type):
         attrs = {'_currency_code': currency_code, '_currency': CURRENCIES[currency_code],
                  '_cents': cents, '__new__': new_money}
         new_class = type(name, bases, attrs)
+        # the neutral element used when adding/substracting zero, None or NaN
+        new_class._zero = Decimal.__new__(new_class, '0')
         return new_class
 
 
 def _make_money(currency_code, value):
     """
-    Function which curries currency and value
+    Function which curries currency and value.
+    Unpickled amounts are built from the same registered Money type as all other amounts.
     """
     return MoneyMaker(currency_code)(value)
@@ -0,0 +1,121 @@
+"""
+Allocators handing out sequential numbers, for instance to identify orders and customers.
+
+An allocator hands out increasing numbers for a named series, such as ``order-2025``. When a
+series is used the first time, it continues from the number returned by the ``initial`` callable,
+which typically computes the highest number already assigned. Use the setting
+``SHOP_NUMBER_ALLOCATOR`` to configure the allocator in use.
+"""
+import re
+from threading import Lock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, models, transaction
+
+
+class BaseNumberAllocator:
+    """
+    Base class for all number allocators.
+    """
+    def allocate(self, series, initial=None):
+        """
+        Return the next number of the given series.
+
+        :param series: The name of the series, for instance ``order-2025``.
+
+        :param initial: Optional callable returning the last number assigned before this series
+            has been managed by the allocator. Called only once, when the series is created.
+        """
+        raise NotImplementedError("{} must implement method `allocate()`.".format(self.__class__.__name__))
+
+
+class CounterNumberAllocator(BaseNumberAllocator):
+    """
+    Keeps the last number of each series in a row of table :class:`shop.models.NumberCounter`.
+    Increasing the counter locks that row until the surrounding transaction is committed, hence
+    concurrent checkouts are serialized, but numbers are gap-free.
+    """
+    def reserve(self, series, count, initial=None):
+        """
+        Increase the counter of the given series by ``count`` and return its new value.
+        """
+        from wagtail_site.shop.models.counter import NumberCounter
+
+        counter = NumberCounter.objects.filter(series=series)
+        with transaction.atomic():
+            if not counter.update(value=models.F('value') + count):
+                try:
+                    with transaction.atomic():
+                        start = initial() if initial else 0
+                        NumberCounter.objects.create(series=series, value=start + count)
+                        return start + count
+                except IntegrityError:
+                    # another transaction created this series in the meantime
+                    counter.update(value=models.F('value') + count)
+            return counter.values_list('value', flat=True).get()
+
+    def allocate(self, series, initial=None):
+        return self.reserve(series, 1, initial)
+
+
+class BlockNumberAllocator(CounterNumberAllocator):
+    """
+    Reserves blocks of numbers in the counter table and hands them out from memory, so that the
+    counter's row is locked only once per block rather than on each checkout. Numbers are unique,
+    but not gap-free, and since each worker process owns its own block, they are not assigned in
+    chronological order.
+
+    A block is reserved inside the caller's transaction and kept for further allocations only
+    after that transaction has been committed. Otherwise a rollback would reset the counter while
+    this process still hands out numbers of the reverted block.
+    """
+    block_size = 20
+
+    def __init__(self, block_size=None):
+        if block_size is not None:
+            self.block_size = block_size
+        self._blocks = {}
+        self._lock = Lock()
+
+    def allocate(self, series, initial=None):
+        with self._lock:
+            number, last = self._blocks.get(series, (1, 0))
+            if number <= last:
+                self._blocks[series] = (number + 1, last)
+                return number
+        last = self.reserve(series, self.block_size, initial)
+        number = last - self.block_size + 1
+        transaction.on_commit(lambda: self._keep_block(series, number + 1, last))
+        return number
+
+    def _keep_block(self, series, number, last):
+        with self._lock:
+            current, current_last = self._blocks.get(series, (1, 0))
+            if current > current_last:
+                self._blocks[series] = (number, last)
+
+
+class SequenceNumberAllocator(BaseNumberAllocator):
+    """
+    Uses a database sequence for each series, which hands out numbers without locking any rows.
+    Numbers consumed by transactions which are rolled back are lost. Requires PostgreSQL.
+    """
+    def __init__(self):
+        if connection.vendor != 'postgresql':
+            raise ImproperlyConfigured("SequenceNumberAllocator requires a PostgreSQL database.")
+        self._sequences = set()
+
+    def get_sequence_name(self, series):
+        return 'shop_number_{}'.format(re.sub(r'\W', '_', series.lower()))
+
+    def allocate(self, series, initial=None):
+        sequence_name = self.get_sequence_name(series)
+        with connection.cursor() as cursor:
+            if sequence_name not in self._sequences:
+                cursor.execute("SELECT 1 FROM pg_class WHERE relkind = 'S' AND relname = %s", [sequence_name])
+                if cursor.fetchone() is None:
+                    start = (initial() if initial else 0) + 1
+                    cursor.execute('CREATE SEQUENCE IF NOT EXISTS "{}" START WITH {:d}'.format(sequence_name, start))
+                self._sequences.add(sequence_name)
+            cursor.execute("SELECT nextval(%s)", [sequence_name])
+            return cursor.fetchone()[0]
@@ -0,0 +1,95 @@
+import csv
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+
+from wagtail_site.shop.models.base.order import OrderModel, OrderItemModel
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# pairs of exported column and lookup on the order item
+ORDER_LINE_COLUMNS = [
+    ('order', 'order_id'),
+    ('created_at', 'order__created_at'),
+    ('status', 'order__status'),
+    ('currency', 'order__currency'),
+    ('customer', 'order__customer_id'),
+    ('product_code', 'product_code'),
+    ('product_name', 'product_name'),
+    ('quantity', 'quantity'),
+    ('unit_price', '_unit_price'),
+    ('line_total', '_line_total'),
+]
+
+
+class Echo:
+    """
+    File-like object, which returns the written value instead of buffering it.
+    """
+    def write(self, value):
+        return value
+
+
+def get_order_line_columns():
+    """
+    Return the columns to export, including the order number, if the order model has such a field.
+    """
+    columns = list(ORDER_LINE_COLUMNS)
+    try:
+        OrderModel._meta.get_field('number')
+    except FieldDoesNotExist:
+        pass
+    else:
+        columns.insert(1, ('number', 'order__number'))
+    return columns
+
+
+def get_order_lines(*, orders=None, start=None, end=None, status=None, columns=None, chunk_size=2000):
+    """
+    Iterate over the lines of all orders matching the given filters as tuples of plain values.
+    Rows are fetched in chunks through a server-side cursor, where the database supports it,
+    so that memory usage does not grow with the number of exported lines.
+
+    :param orders: Optional queryset of orders to restrict the export to.
+
+    :param start: Only export orders created at or after this point in time.
+
+    :param end: Only export orders created before this point in time.
+
+    :param status: Optional list of order states to export.
+    """
+    if columns is None:
+        columns = get_order_line_columns()
+    queryset = OrderItemModel.objects.all()
+    if orders is not None:
+        queryset = queryset.filter(order__in=orders.values('pk'))
+    if start:
+        queryset = queryset.filter(order__created_at__gte=start)
+    if end:
+        queryset = queryset.filter(order__created_at__lt=end)
+    if status:
+        queryset = queryset.filter(order__status__in=status)
+    queryset = queryset.order_by('order_id', 'pk').values_list(*[lookup for _, lookup in columns])
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def export_order_lines(*, format='csv', **filters):
+    """
+    Iterate over the order lines matching the given filters, rendered line by line as CSV or as
+    JSON Lines. Intended to be written to a file or passed to a ``StreamingHttpResponse``.
+    """
+    columns = get_order_line_columns()
+    header = [column for column, _ in columns]
+    rows = get_order_lines(columns=columns, **filters)
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    elif format == 'jsonl':
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), default=encoder.default) + '\n'
+    else:
+        raise ValueError("Unknown export format '{}', use one of: {}".format(format, ', '.join(EXPORT_FORMATS)))
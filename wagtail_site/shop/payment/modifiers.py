@@ -79,6 +79,7 @@ class PayInAdvanceModifier(PaymentModifier):
     to enable the customer to pay the products on delivery.
     """
     payment_provider = ForwardFundPayment()
+    incremental = True
 
     def get_choice(self):
         return (self.payment_provider.namespace, _("Pay in advance"))
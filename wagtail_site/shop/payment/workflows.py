@@ -38,8 +38,7 @@ class ManualPaymentWorkflowMixin:
         """
 
     def payment_deposited(self):
-        if hasattr(self, 'amount_paid'):
-            del self.amount_paid
+        self.refresh_payment_totals()
         return self.amount_paid > 0
 
     @transition(field='status', source=['awaiting_payment'],
@@ -84,7 +84,7 @@ class ProductDocument:
     see https://elasticsearch-dsl.readthedocs.io/en/latest/api.html#elasticsearch_dsl.Index.analyzer
     """
     def __new__(cls, language=None, settings=None, language_analizers=None):
-        index_name_parts = [app_settings.SHOP_APP_LABEL]
+        index_name_parts = [app_settings.APP_LABEL]
         if language_analizers:
             copy = language_analizers.copy()
             body_analyzers.update(copy) #overrides default language settings
@@ -1,5 +1,6 @@
 from django.core import exceptions
 from django.core.cache import cache
+from django.db.models import Manager
 from django.template import TemplateDoesNotExist
 from django.template.loader import select_template
 from django.utils.html import strip_spaces_between_tags
@@ -7,11 +8,11 @@ from django.utils.safestring import mark_safe, SafeText
 from django.utils.translation import get_language_from_request
 from rest_framework import serializers
 
-from shop.conf import app_settings
-from shop.models.customer import CustomerModel
-from shop.models.product import ProductModel
-from shop.models.order import OrderItemModel
-from shop.rest.money import MoneyField
+from wagtail_site.shop.conf import app_settings
+from wagtail_site.shop.models.base.customer import CustomerModel
+from wagtail_site.shop.models.base.product import ProductModel
+from wagtail_site.shop.models.base.order import OrderItemModel
+from wagtail_site.shop.rest.money import MoneyField
 
 
 class BaseCustomerSerializer(serializers.ModelSerializer):
@@ -30,6 +31,17 @@ class AvailabilitySerializer(serializers.Serializer):
     limited_offer = serializers.BooleanField()
 
 
+class ProductListSerializer(serializers.ListSerializer):
+    """
+    Prices all products of a list in one pass, before serializing them one by one.
+    """
+    def to_representation(self, data):
+        if 'prices' not in self.context:
+            products = data.all() if isinstance(data, Manager) else data
+            self.context['prices'] = ProductModel.objects.get_prices(products, self.context['request'])
+        return super().to_representation(data)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """
     Common serializer for our product model.
@@ -42,13 +54,17 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductModel
         fields = '__all__'
+        list_serializer_class = ProductListSerializer
 
     def __init__(self, *args, **kwargs):
         kwargs.setdefault('label', 'catalog')
         super().__init__(*args, **kwargs)
 
     def get_price(self, product):
-        price = product.get_price(self.context['request'])
+        try:
+            price = self.context['prices'][product.pk]
+        except KeyError:
+            price = product.get_price(self.context['request'])
         return '{:f}'.format(price)
 
     def render_html(self, product, postfix):
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from shop.conf import app_settings
+from wagtail_site.shop.conf import app_settings
 from wagtail_site.shop.models.base.cart import CartModel, CartItemModel
 from wagtail_site.shop.rest.money import MoneyField
 from wagtail_site.shop.models.base.fields import ChoiceEnum
@@ -47,7 +47,8 @@ class BaseItemSerializer(serializers.ModelSerializer):
         return cart_item
 
     def to_representation(self, cart_item):
-        cart_item.update(self.context['request'])
+        # cart items are serialized right after being loaded or saved, hence need not be refreshed
+        cart_item.update(self.context['request'], refresh=False)
         representation = super().to_representation(cart_item)
         return representation
 
@@ -124,6 +125,7 @@ class CartSerializer(BaseCartSerializer):
     def represent_items(self, cart):
         if self.with_items == CartItems.unsorted:
             items = CartItemModel.objects.filter(cart=cart, quantity__gt=0).order_by('-updated_at')
+            items = items.prefetch_related(*CartItemModel.objects.get_prefetch_plan(self.context['request']))
         else:
             items = CartItemModel.objects.filter_cart_items(cart, self.context['request'])
         serializer = CartItemSerializer(items, context=self.context, label=self.label, many=True)
@@ -143,6 +145,7 @@ class WatchSerializer(BaseCartSerializer):
     def represent_items(self, cart):
         if self.with_items == CartItems.unsorted:
             items = CartItemModel.objects.filter(cart=cart, quantity=0).order_by('-updated_at')
+            items = items.prefetch_related(*CartItemModel.objects.get_prefetch_plan(self.context['request']))
         else:
             items = CartItemModel.objects.filter_watch_items(cart, self.context['request'])
         serializer = WatchItemSerializer(items, context=self.context, label=self.label, many=True)
@@ -7,7 +7,7 @@ from shop.conf import app_settings
 class SerializeFormAsTextField(serializers.SerializerMethodField):
     def __init__(self, form_class_name, **kwargs):
         try:
-            self.form_class = import_string(app_settings.SHOP_CASCADE_FORMS[form_class_name])
+            self.form_class = import_string(app_settings.CASCADE_FORMS[form_class_name])
         except ImportError:
             msg = "Can not import Form class. Please check your settings directive SHOP_CASCADE_FORMS['{}']."
             raise ImproperlyConfigured(msg.format(form_class_name))
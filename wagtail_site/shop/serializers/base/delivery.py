@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from shop.conf import app_settings
-from shop.models.delivery import DeliveryModel, DeliveryItemModel
-from shop.modifiers.pool import cart_modifiers_pool
+from wagtail_site.shop.conf import app_settings
+from wagtail_site.shop.models.base.delivery import DeliveryModel, DeliveryItemModel
+from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
 
 
 class DeliveryItemSerializer(serializers.ModelSerializer):
@@ -1,10 +1,12 @@
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.translation import get_language
 from rest_framework import serializers
-from shop.conf import app_settings
-from shop.models.cart import CartModel
-from shop.models.order import OrderModel
-from shop.modifiers.pool import cart_modifiers_pool
-from shop.rest.money import MoneyField
+from wagtail_site.shop.conf import app_settings
+from wagtail_site.shop.models.base.cart import CartModel
+from wagtail_site.shop.models.base.order import OrderModel
+from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
+from wagtail_site.shop.rest.money import MoneyField
 
 
 class OrderListSerializer(serializers.ModelSerializer):
@@ -70,9 +72,36 @@ class OrderDetailSerializer(OrderListSerializer):
 
     class Meta:
         model = OrderModel
-        exclude = ['id', 'customer', 'stored_request', '_subtotal', '_total']
+        exclude = ['id', 'customer', 'stored_request', '_subtotal', '_total', '_amount_paid', 'unfulfilled_quantity']
         read_only_fields = ['shipping_address_text', 'billing_address_text']  # TODO: not part of OrderBase
 
+    def get_cache_key(self, order):
+        """
+        Return the key to cache the representation of the given order, or ``None`` if it shall not
+        be cached. Orders still being populated are not cached. The key contains a version derived
+        from the order's modification date, status and stored aggregates, so that each transition,
+        payment or delivery renders a new representation.
+        """
+        if order.pk is None or order.status in ['new', 'created']:
+            return None
+        version = '{}.{}.{}.{}'.format(order.updated_at.timestamp(), order.status, order.amount_paid,
+                                       getattr(order, 'unfulfilled_quantity', ''))
+        return 'order_representation:{}:{}:{}:{}'.format(
+            order.pk, version, self.context.get('render_label', ''), get_language())
+
+    def to_representation(self, order):
+        """
+        Render the order, reusing a cached representation, unless it changed since.
+        """
+        cache_key = self.get_cache_key(order)
+        if cache_key is None:
+            return super().to_representation(order)
+        data = cache.get(cache_key)
+        if data is None:
+            data = super().to_representation(order)
+            cache.set(cache_key, data, app_settings.CACHE_DURATIONS['order_representation'])
+        return data
+
     def get_partially_paid(self, order):
         return order.amount_paid > 0
 
@@ -1,8 +1,8 @@
 from rest_framework import serializers
 from rest_framework.fields import empty
-from shop.models.cart import CartModel
-from shop.rest.money import MoneyField
-from shop.serializers.bases import AvailabilitySerializer
+from wagtail_site.shop.models.base.cart import CartModel
+from wagtail_site.shop.rest.money import MoneyField
+from wagtail_site.shop.serializers.base.bases import AvailabilitySerializer
 
 
 class AddToCartSerializer(serializers.Serializer):
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from shop.serializers.bases import BaseCustomerSerializer
+from wagtail_site.shop.serializers.base.bases import BaseCustomerSerializer
 
 
 class CustomerSerializer(BaseCustomerSerializer):
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from shop.conf import app_settings
-from shop.serializers.bases import BaseOrderItemSerializer
+from wagtail_site.shop.conf import app_settings
+from wagtail_site.shop.serializers.base.bases import BaseOrderItemSerializer
 
 
 class OrderItemSerializer(BaseOrderItemSerializer):
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from shop.models.product import ProductModel
+from wagtail_site.shop.models.base.product import ProductModel
 
 
 class ProductSelectSerializer(serializers.ModelSerializer):
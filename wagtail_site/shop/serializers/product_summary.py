@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from shop.serializers.bases import ProductSerializer
+from wagtail_site.shop.serializers.base.bases import ProductSerializer
 
 
 class ProductSummarySerializer(ProductSerializer):
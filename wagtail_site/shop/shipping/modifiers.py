@@ -73,6 +73,7 @@ class SelfCollectionModifier(ShippingModifier):
     to enable the customer to pick up the products in the shop.
     """
     identifier = 'self-collection'
+    incremental = True
 
     def get_choice(self):
         return (self.identifier, _("Self-collection"))
@@ -1,9 +1,11 @@
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django_fsm import transition
 from wagtail_site.shop.models.base.delivery import DeliveryModel, DeliveryItemModel
+from wagtail_site.shop.models.base.order import OrderItemModel, OrderModel
+from wagtail_site.shop.modifiers.pool import cart_modifiers_pool
 
 
 class SimpleShippingWorkflowMixin:
@@ -40,17 +42,17 @@ class SimpleShippingWorkflowMixin:
         return False
 
     @transition(field='status', source='payment_confirmed', target='pick_goods',
-                custom=dict(admin=True, button_name=_("Pick the goods")))
+                custom=dict(admin=True, bulk=True, button_name=_("Pick the goods")))
     def pick_goods(self, by=None):
         """Change status to 'pick_goods'."""
 
     @transition(field='status', source='pick_goods', target='pack_goods',
-                custom=dict(admin=True, button_name=_("Pack the goods")))
+                custom=dict(admin=True, bulk=True, button_name=_("Pack the goods")))
     def pack_goods(self, by=None):
         """Change status to 'pack_goods'."""
 
     @transition(field='status', source='pack_goods', target='ship_goods',
-                custom=dict(admin=True, button_name=_("Prepare for shipping")))
+                custom=dict(admin=True, bulk=True, button_name=_("Prepare for shipping")))
     def ship_goods(self, by=None):
         """
         Ship the goods. This method implicitly invokes
@@ -58,7 +60,7 @@ class SimpleShippingWorkflowMixin:
         """
 
     @transition(field='status', source='ship_goods', target='ready_for_delivery',
-                custom=dict(auto=True))
+                custom=dict(auto=True, bulk=True))
     def prepare_for_delivery(self, by=None):
         """
         Put the parcel into the outgoing delivery.
@@ -87,27 +89,111 @@ class CommissionGoodsWorkflowMixin(SimpleShippingWorkflowMixin):
         return True
 
     @transition(field='status', source='ship_goods', target='ready_for_delivery',
-                custom=dict(auto=True))
+                custom=dict(auto=True, bulk=True))
     def prepare_for_delivery(self, by=None):
         """Put the parcel into the outgoing delivery."""
 
+    @classmethod
+    def post_bulk_transition(cls, target, orders, by=None):
+        super().post_bulk_transition(target, orders, by=by)
+        if target == 'pack_goods':
+            # the orders are locked by the bulk transition
+            cls.create_deliveries(orders, lock=False)
+        elif target == 'ready_for_delivery':
+            cls.ship_deliveries(orders)
+
+    @classmethod
+    def get_deliverable_items(cls, orders):
+        """
+        :returns: A queryset with the ordered items of the given orders, which shall be packed
+            into their delivery, each annotated with its ``deliver_quantity``.
+        """
+        return OrderItemModel.objects.filter(order__in=orders).annotate(deliver_quantity=models.F('quantity'))
+
+    @classmethod
+    def create_deliveries(cls, orders, lock=True):
+        """
+        Update or create a Delivery object for each of the given orders containing their
+        deliverable items, using a constant number of queries.
+        """
+        items = cls.get_deliverable_items(orders)
+        cls.add_delivery_items(orders, [(item, item.deliver_quantity) for item in items], lock=lock)
+
+    @classmethod
+    def add_delivery_items(cls, orders, items, lock=True):
+        """
+        Add the given ordered items to the open Delivery object of their order, which is created if
+        missing, using a constant number of queries regardless of the number of orders and items.
+        The orders are locked until the surrounding transaction ends, so that concurrent calls
+        neither open two deliveries of the same order nor assign the same part number twice.
+
+        :param orders: The orders the items belong to.
+
+        :param items: A list of pairs, each containing an ordered item and the quantity to deliver.
+
+        :param lock: Set to ``False`` if the caller already holds the locks of those orders.
+        """
+        orders = {order.pk: order for order in orders}
+        items = [(item, quantity) for item, quantity in items if quantity > 0]
+        order_ids = {item.order_id for item, _ in items}
+        if not order_ids:
+            return
+
+        with transaction.atomic():
+            if lock:
+                # lock the orders before looking up their open deliveries
+                locked = OrderModel.objects.select_for_update().filter(pk__in=order_ids).order_by('pk')
+                list(locked.values_list('pk', flat=True))
+            deliveries = {}
+            open_deliveries = DeliveryModel.objects.filter(
+                order__in=order_ids,
+                shipping_id__isnull=True,
+                shipped_at__isnull=True,
+            )
+            for delivery in open_deliveries:
+                deliveries.setdefault((delivery.order_id, delivery.shipping_method), delivery)
+            fulfilled_at = timezone.now()
+            created = []
+            for order_id in order_ids:
+                key = (order_id, orders[order_id].extra.get('shipping_modifier'))
+                if key not in deliveries:
+                    deliveries[key] = DeliveryModel(order=orders[order_id], shipping_method=key[1],
+                                                    fulfilled_at=fulfilled_at)
+                    created.append(deliveries[key])
+            DeliveryModel.assign_part_numbers(created, lock=False)
+            DeliveryModel.objects.bulk_create(created)
+            if any(delivery.pk is None for delivery in created):
+                # the database backend does not return primary keys from bulk inserts
+                for delivery in DeliveryModel.objects.filter(order__in=order_ids, fulfilled_at=fulfilled_at):
+                    deliveries[delivery.order_id, delivery.shipping_method] = delivery
+
+            DeliveryItemModel.objects.bulk_create([
+                DeliveryItemModel(
+                    delivery=deliveries[item.order_id, orders[item.order_id].extra.get('shipping_modifier')],
+                    item=item,
+                    quantity=quantity,
+                ) for item, quantity in items
+            ])
+            OrderModel.objects.filter(pk__in=order_ids).update_delivery_totals()
+
+    @classmethod
+    def ship_deliveries(cls, orders):
+        """
+        Ship the open deliveries of the given orders through their shipping modifier, as done by
+        ``Delivery.clean()`` when shipping the goods of a single order.
+        """
+        deliveries = list(DeliveryModel.objects.filter(order__in=orders, shipped_at__isnull=True))
+        for delivery in deliveries:
+            shipping_modifier = cart_modifiers_pool.get_active_shipping_modifier(delivery.shipping_method)
+            shipping_modifier.ship_the_goods(delivery)
+        DeliveryModel.objects.bulk_update(deliveries, ['shipping_id', 'shipped_at'])
+
     def update_or_create_delivery(self, orderitem_data):
         """
         Update or create a Delivery object for all items of this Order object.
         """
-        delivery, _ = DeliveryModel.objects.get_or_create(
-            order=self,
-            shipping_id__isnull=True,
-            shipped_at__isnull=True,
-            shipping_method=self.extra.get('shipping_modifier'),
-            defaults={'fulfilled_at': timezone.now()}
-        )
-        for item in self.items.all():
-            DeliveryItemModel.objects.create(
-                delivery=delivery,
-                item=item,
-                quantity=item.quantity,
-            )
+        self.add_delivery_items([self], [(item, item.quantity) for item in self.items.all()])
+        self.refresh_delivery_totals()
 
 
 class PartialDeliveryWorkflowMixin(CommissionGoodsWorkflowMixin):
@@ -131,38 +217,54 @@ class PartialDeliveryWorkflowMixin(CommissionGoodsWorkflowMixin):
     def allow_partial_delivery(self):
         return True
 
-    @cached_property
+    @property
     def unfulfilled_items(self):
-        unfulfilled_items = 0
-        for order_item in self.items.all():
-            if not order_item.canceled:
-                aggr = order_item.deliver_item.aggregate(delivered=Sum('quantity'))
-                unfulfilled_items += order_item.quantity - (aggr['delivered'] or 0)
-        return unfulfilled_items
+        """
+        The ordered quantity not delivered yet, either annotated by ``with_delivery_totals()`` or
+        kept in the order's stored column.
+        """
+        return getattr(self, 'annotated_unfulfilled_quantity', self.unfulfilled_quantity)
+
+    @classmethod
+    def annotate_for_transitions(cls, queryset):
+        queryset = super().annotate_for_transitions(queryset).with_delivery_totals()
+        open_deliveries = DeliveryModel.objects.filter(order=models.OuterRef('pk'), shipped_at__isnull=True)
+        return queryset.annotate(annotated_ready_for_shipping=models.Exists(open_deliveries))
+
+    @classmethod
+    def get_deliverable_items(cls, orders):
+        items = OrderItemModel.objects.filter(order__in=orders)
+        if any(field.name == 'canceled' for field in OrderItemModel._meta.get_fields()):
+            items = items.filter(canceled=False)
+        delivered = Coalesce(models.Sum('deliver_item__quantity'), 0)
+        return items.annotate(deliver_quantity=models.F('quantity') - delivered)
 
     def ready_for_picking(self):
         return self.is_fully_paid() and self.unfulfilled_items > 0
 
     def ready_for_shipping(self):
-        return self.delivery_set.filter(shipped_at__isnull=True).exists()
+        try:
+            return self.annotated_ready_for_shipping
+        except AttributeError:
+            return self.delivery_set.filter(shipped_at__isnull=True).exists()
 
     @transition(field='status', source='*', target='pick_goods', conditions=[ready_for_picking],
-                custom=dict(admin=True, button_name=_("Pick the goods")))
+                custom=dict(admin=True, bulk=True, button_name=_("Pick the goods")))
     def pick_goods(self, by=None):
         """Change status to 'pick_goods'."""
 
     @transition(field='status', source=['pick_goods'], target='pack_goods',
-                custom=dict(admin=True, button_name=_("Pack the goods")))
+                custom=dict(admin=True, bulk=True, button_name=_("Pack the goods")))
     def pack_goods(self, by=None):
         """Prepare shipping object and change status to 'pack_goods'."""
 
     @transition(field='status', source='*', target='ship_goods', conditions=[ready_for_shipping],
-                custom=dict(admin=True, button_name=_("Ship the goods")))
+                custom=dict(admin=True, bulk=True, button_name=_("Ship the goods")))
     def ship_goods(self, by=None):
         """Ship the goods."""
 
     @transition(field='status', source='ship_goods', target='ready_for_delivery',
-                custom=dict(auto=True))
+                custom=dict(auto=True, bulk=True))
     def prepare_for_delivery(self, by=None):
         """Put the parcel into the outgoing delivery."""
 
@@ -170,22 +272,9 @@ class PartialDeliveryWorkflowMixin(CommissionGoodsWorkflowMixin):
         """
         Update or create a Delivery object and associate with selected ordered items.
         """
-        delivery, _ = DeliveryModel.objects.get_or_create(
-            order=self,
-            shipping_id__isnull=True,
-            shipped_at__isnull=True,
-            shipping_method=self.extra.get('shipping_modifier'),
-            defaults={'fulfilled_at': timezone.now()}
-        )
-
         # create a DeliveryItem object for each ordered item to be shipped with this delivery
-        for data in orderitem_data:
-            if data['deliver_quantity'] > 0 and not data['canceled']:
-                DeliveryItemModel.objects.create(
-                    delivery=delivery,
-                    item=data['id'],
-                    quantity=data['deliver_quantity'],
-                )
-        if not delivery.items.exists():
-            # since no OrderItem was added to this delivery, discard it
-            delivery.delete()
+        self.add_delivery_items([self], [
+            (data['id'], data['deliver_quantity']) for data in orderitem_data
+            if data['deliver_quantity'] > 0 and not data['canceled']
+        ])
+        self.refresh_delivery_totals()
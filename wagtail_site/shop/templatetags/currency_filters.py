@@ -1,13 +1,37 @@
 from decimal import Decimal as D
 from decimal import InvalidOperation
 
-from babel.numbers import format_currency
+from babel import Locale
 from django import template
 from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
 from django.utils.translation import get_language, to_locale
 
 register = template.Library()
 
+# Cache of Babel's locale and currency pattern, keyed by language and currency
+_currency_formats = {}
+
+
+def get_currency_format(currency):
+    """
+    Return the Babel locale and its standard currency pattern for the active language.
+    """
+    language = get_language() or settings.LANGUAGE_CODE
+    key = (language, currency)
+    try:
+        return _currency_formats[key]
+    except KeyError:
+        locale = Locale.parse(to_locale(language))
+        currency_format = _currency_formats[key] = (locale, locale.currency_formats['standard'])
+        return currency_format
+
+
+@receiver(setting_changed)
+def reset_currency_formats(**kwargs):
+    _currency_formats.clear()
+
 
 @register.filter(name='currency')
 def currency(value, currency=None):
@@ -16,17 +40,12 @@ def currency(value, currency=None):
     """
     from wagtail_site.shop.conf import app_settings
     if currency is None:
-        currency = app_settings.SHOP_DEFAULT_CURRENCY
+        currency = app_settings.DEFAULT_CURRENCY
 
     try:
         value = D(value)
     except (TypeError, InvalidOperation):
         return ""
-    # Using Babel's currency formatting
-
-    kwargs = {
-        'currency': currency,
-        'locale': to_locale(get_language() or settings.LANGUAGE_CODE)
-    }
-
-    return format_currency(value, **kwargs)
+    # Using Babel's currency formatting, as `babel.numbers.format_currency` would do
+    locale, pattern = get_currency_format(currency)
+    return pattern.apply(value, locale, currency=currency)
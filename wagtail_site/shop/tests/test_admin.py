@@ -0,0 +1,118 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.test import RequestFactory, TestCase, override_settings
+
+from wagtail_site.shop.admin.defaults.order import OrderAdmin
+from wagtail_site.shop.models import Customer, Order, OrderItem
+from wagtail_site.shop.shipping.workflows import PartialDeliveryWorkflowMixin
+
+# the admin templates are provided by the project
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': [('django.template.loaders.locmem.Loader', {'shop/admin/order-extra.html': ''})],
+    },
+}]
+
+
+@override_settings(TEMPLATES=TEMPLATES)
+class OrderAdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='admin', email='admin@example.com',
+                                                   is_staff=True, is_superuser=True)
+        cls.customer = Customer.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.admin = OrderAdmin(Order, AdminSite())
+
+    def get_request(self, data=None):
+        request = RequestFactory().post('/', data or {})
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        return request
+
+    def get_messages(self, request):
+        return [str(message) for message in request._messages]
+
+    def create_order(self, quantities, total=Decimal(0)):
+        order = Order.objects.create(customer=self.customer, currency='EUR', _subtotal=total, _total=total,
+                                     status='payment_confirmed', stored_request={},
+                                     extra={'shipping_modifier': 'self-collection'})
+        for number, quantity in enumerate(quantities):
+            OrderItem.objects.create(order=order, product_name="Mug", product_code='MUG-{}'.format(number),
+                                     _unit_price=Decimal(0), _line_total=Decimal(0), quantity=quantity, extra={})
+        # reload the quantities updated by adding the items
+        return Order.objects.get(pk=order.pk)
+
+
+class OrderAdminTest(OrderAdminTestCase):
+    def test_export_actions(self):
+        order = self.create_order([1, 2])
+        request = self.get_request()
+        actions = self.admin.get_actions(request)
+        self.assertIn('export_as_csv', actions)
+        self.assertIn('export_as_jsonl', actions)
+
+        func = actions['export_as_csv'][0]
+        response = func(self.admin, request, Order.objects.filter(pk=order.pk))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('MUG-1', lines[2])
+
+    def test_get_requested_transition(self):
+        request = self.get_request({'_fsmtransition-status-ship_goods': "Ship the goods"})
+        self.assertEqual(self.admin._get_requested_transition(request), ('status', 'ship_goods'))
+        self.assertIsNone(self.admin._get_requested_transition(self.get_request({'_save': "Save"})))
+
+    def test_no_transitions_without_order(self):
+        self.assertEqual(self.admin._fsm_get_transitions(None, self.get_request()), {'status': []})
+
+
+@skipUnless(issubclass(Order, PartialDeliveryWorkflowMixin),
+            "requires the PartialDeliveryWorkflowMixin in settings.SHOP_ORDER_WORKFLOWS")
+class BulkTransitionAdminTest(OrderAdminTestCase):
+    def get_transition_names(self, order):
+        transitions = self.admin._fsm_get_transitions(order, self.get_request())
+        return sorted(transition.name for transition in transitions['status'])
+
+    def test_transitions_of_current_state(self):
+        order = self.create_order([1])
+        self.assertEqual(self.get_transition_names(order), ['pick_goods'])
+        order.pick_goods()
+        self.assertEqual(self.get_transition_names(order), ['pack_goods', 'pick_goods'])
+
+    def test_save_applies_requested_transition(self):
+        order = self.create_order([1])
+        self.admin.save_model(self.get_request({'_fsmtransition-status-pick_goods': ""}), order, None, True)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pick_goods')
+
+        request = self.get_request({'_fsmtransition-status-ship_goods': ""})
+        self.admin.save_model(request, order, None, True)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pick_goods')
+        self.assertEqual(self.get_messages(request), ["The transition 'ship_goods' is not allowed."])
+
+    def test_bulk_transition_actions(self):
+        orders = [self.create_order([1]), self.create_order([2])]
+        unpaid = self.create_order([1], total=Decimal('10.00'))
+        request = self.get_request()
+        actions = self.admin.get_actions(request)
+        self.assertEqual(sorted(name for name in actions if name.startswith('transition_')),
+                         ['transition_pack_goods', 'transition_pick_goods', 'transition_ship_goods'])
+
+        func, name, description = actions['transition_pick_goods']
+        self.assertEqual(description, "Pick the goods")
+        func(self.admin, request, Order.objects.filter(pk__in=[order.pk for order in orders + [unpaid]]))
+        statuses = Order.objects.filter(pk__in=[order.pk for order in orders]).values_list('status', flat=True)
+        self.assertEqual(list(statuses), ['pick_goods', 'pick_goods'])
+        self.assertEqual(Order.objects.get(pk=unpaid.pk).status, 'payment_confirmed')
+        self.assertEqual(self.get_messages(request), [
+            "2 orders changed to 'Picking goods'.",
+            "1 orders were skipped, since their state does not allow this transition.",
+        ])
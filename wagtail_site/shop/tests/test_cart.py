@@ -0,0 +1,89 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from wagtail.models import Locale
+
+from wagtail_site.shop.models import Cart, CartItem, Customer, Product
+from wagtail_site.shop.models.base import inventory
+from wagtail_site.shop.models.product import ProductInventory
+
+
+def inventory_managed_products():
+    """
+    The default product keeps its stock in a field, let it check the availability from its
+    inventories instead.
+    """
+    mixin = inventory.AvailableProductMixin
+    return mock.patch.multiple(
+        Product,
+        availability_lookups=mixin.availability_lookups,
+        get_availability=mixin.get_availability,
+        get_availabilities=classmethod(mixin.get_availabilities.__func__),
+        _get_prefetched_availability=mixin._get_prefetched_availability,
+        create=True,
+    )
+
+
+class CartLoadingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.locale, _ = Locale.objects.get_or_create(language_code='en')
+
+    def create_cart(self, size):
+        username = 'buyer-{}'.format(size)
+        user = get_user_model().objects.create(username=username, email=username + '@example.com')
+        cart = Cart.objects.create(customer=Customer.objects.create(user=user))
+        now = timezone.now()
+        for number in range(size):
+            product = Product.objects.create(
+                name="Mug {}".format(number), caption="Mug", code='MUG-{}-{}'.format(size, number),
+                unit_price=Decimal('9.90'), quantity=10, locale=self.locale)
+            ProductInventory.objects.create(product=product, quantity=10,
+                                            earliest=now - datetime.timedelta(days=1),
+                                            latest=now + datetime.timedelta(days=365))
+            CartItem.objects.create(cart=cart, product=product, product_code=product.code, quantity=2)
+        return cart
+
+    def get_request(self, cart):
+        request = RequestFactory().get('/')
+        request.customer = cart.customer
+        request.user = cart.customer.user
+        return request
+
+    def count_update_queries(self, size):
+        cart = Cart.objects.get(pk=self.create_cart(size).pk)
+        request = self.get_request(cart)
+        with CaptureQueriesContext(connection) as context:
+            cart.update(request)
+        self.assertEqual(len(cart._cached_cart_items), size)
+        self.assertEqual(cart.subtotal.as_decimal(), Decimal('19.80') * size)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        self.assertEqual(self.count_update_queries(1), self.count_update_queries(5))
+
+    def test_query_count_does_not_depend_on_cart_size_with_inventories(self):
+        with inventory_managed_products():
+            self.assertEqual(self.count_update_queries(1), self.count_update_queries(5))
+
+    def test_checks_availability_from_prefetched_inventories(self):
+        cart = self.create_cart(3)
+        with inventory_managed_products():
+            request = self.get_request(cart)
+            items = list(CartItem.objects.filter_cart_items(cart, request))
+            products = [item.product for item in items]
+            with self.assertNumQueries(0):
+                prefetched = [product.get_availability(request) for product in products]
+                bulk = Product.get_availabilities(products, request)
+            # the same as checking the inventories in the database
+            expected = Product.get_availabilities(list(Product.objects.filter(pk__in=bulk)), request)
+        for product, availability in zip(products, prefetched):
+            for availabilities in [bulk, expected]:
+                self.assertEqual(vars(availabilities[product.pk]), vars(availability))
+            self.assertEqual(availability.quantity, 10)
@@ -0,0 +1,95 @@
+import random
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from wagtail_site.shop.money.money_maker import MoneyMaker
+
+EUR = MoneyMaker('EUR')
+JPY = MoneyMaker('JPY')
+
+
+def as_number(amount):
+    """
+    The Decimal, which an amount stands for as operand, where NaN and any zero count as `Decimal('0')`.
+    """
+    return Decimal(amount) if amount else Decimal()
+
+
+class MoneyArithmeticTest(SimpleTestCase):
+    """
+    Compare the arithmetic of Money types with the plain Decimal semantics on random operands.
+    """
+    def setUp(self):
+        self.random = random.Random(4217)
+
+    def get_amounts(self, count=200):
+        amounts = [EUR('NaN'), EUR(0), EUR('-0.00')]
+        for _ in range(count):
+            cents = self.random.randint(-10 ** 8, 10 ** 8)
+            amounts.append(EUR(Decimal(cents).scaleb(-self.random.choice([0, 2, 3]))))
+        return amounts
+
+    def get_pairs(self, count=500):
+        amounts = self.get_amounts()
+        return [(self.random.choice(amounts), self.random.choice(amounts)) for _ in range(count)]
+
+    def assertSameAmount(self, amount, expected):
+        self.assertIs(type(amount), EUR)
+        self.assertEqual(Decimal(amount), expected)
+        self.assertEqual(str(Decimal(amount).as_tuple()), str(expected.as_tuple()))
+
+    def test_add_and_subtract(self):
+        for a, b in self.get_pairs():
+            with self.subTest(a=a, b=b):
+                expected = as_number(b) if a.is_nan() else Decimal(a) + as_number(b)
+                self.assertSameAmount(a + b, expected)
+                if not a.is_nan():
+                    self.assertSameAmount(a - b, Decimal(a) - as_number(b))
+
+    def test_add_zero_and_none(self):
+        amount = EUR('1.50')
+        for other in [0, None, Decimal(0)]:
+            with self.subTest(other=other):
+                self.assertSameAmount(amount + other, Decimal('1.50'))
+                self.assertSameAmount(other + amount, Decimal('1.50'))
+                self.assertSameAmount(amount - other, Decimal('1.50'))
+
+    def test_negate_and_multiply(self):
+        for amount in self.get_amounts():
+            factor = self.random.choice([0, 1, 3, Decimal('0.19'), Decimal('-2.5')])
+            with self.subTest(amount=amount, factor=factor):
+                if amount.is_nan():
+                    self.assertTrue((-amount).is_nan())
+                    self.assertTrue((amount * factor).is_nan())
+                else:
+                    self.assertSameAmount(-amount, -Decimal(amount))
+                    self.assertSameAmount(amount * factor, Decimal(amount) * factor)
+                    self.assertSameAmount(factor * amount, Decimal(amount) * factor)
+        self.assertTrue((EUR('1.00') * None).is_nan())
+
+    def test_comparisons(self):
+        for a, b in self.get_pairs():
+            with self.subTest(a=a, b=b):
+                left = as_number(a).quantize(Decimal('.01'))
+                right = as_number(b).quantize(Decimal('.01'))
+                self.assertEqual(a == b, left == right)
+                self.assertEqual(a < b, left < right)
+                self.assertEqual(a <= b, left <= right)
+                self.assertEqual(a > b, left > right)
+                self.assertEqual(a >= b, left >= right)
+
+    def test_sum(self):
+        amounts = self.get_amounts(1000)
+        self.assertSameAmount(sum(amounts), sum(as_number(amount) for amount in amounts))
+        self.assertSameAmount(sum(amounts, EUR()), sum(as_number(amount) for amount in amounts))
+
+    def test_currency_mismatch(self):
+        with self.assertRaises(ValueError):
+            EUR('1.00') + JPY('1')
+        with self.assertRaises(ValueError):
+            EUR('1.00') < JPY('1')
+        with self.assertRaises(ValueError):
+            EUR('1.00') * EUR('2.00')
+        with self.assertRaises(ValueError):
+            EUR('1.00') * 'abc'
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.test import TestCase
+
+from wagtail_site.shop.numbering import BlockNumberAllocator, CounterNumberAllocator
+
+
+class CounterNumberAllocatorTest(TestCase):
+    def test_continues_from_initial_number(self):
+        allocator = CounterNumberAllocator()
+        self.assertEqual(allocator.allocate('order-2026', initial=lambda: 41), 42)
+        self.assertEqual(allocator.allocate('order-2026', initial=lambda: 41), 43)
+
+
+class BlockNumberAllocatorTest(TestCase):
+    def test_hands_out_numbers_of_committed_block(self):
+        allocator = BlockNumberAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(allocator.allocate('order-2026'), 1)
+        self.assertEqual([allocator.allocate('order-2026') for _ in range(5)], [2, 3, 4, 5, 6])
+
+    def test_discards_block_of_rolled_back_transaction(self):
+        allocator = BlockNumberAllocator(block_size=5)
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(allocator.allocate('order-2026'), 1)
+                raise RuntimeError
+        # the counter has been reset, hence the numbers of that block must not be reused
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(allocator.allocate('order-2026'), 1)
+        self.assertEqual(allocator.allocate('order-2026'), 2)
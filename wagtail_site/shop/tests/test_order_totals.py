@@ -0,0 +1,71 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from wagtail_site.shop.models import Customer, Order, OrderItem
+from wagtail_site.shop.models.base import delivery
+from wagtail_site.shop.models.base.order import OrderPayment
+from wagtail_site.shop.shipping.workflows import CommissionGoodsWorkflowMixin
+
+
+class OrderTotalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create(username='buyer', email='buyer@example.com')
+        cls.customer = Customer.objects.create(user=user)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.customer, currency='EUR', _subtotal=Decimal('30.00'),
+                                          _total=Decimal('30.00'), stored_request={},
+                                          extra={'shipping_modifier': 'self-collection'})
+        self.items = [
+            OrderItem.objects.create(order=self.order, product_name="Mug", product_code='MUG-{}'.format(number),
+                                     _unit_price=Decimal(0), _line_total=Decimal(0), quantity=quantity, extra={})
+            for number, quantity in enumerate([1, 2, 3])
+        ]
+
+    def get_order(self):
+        return Order.objects.get(pk=self.order.pk)
+
+    def add_payment(self, amount):
+        return OrderPayment.objects.create(order=self.order, amount=Decimal(amount), transaction_id='T',
+                                           payment_method='prepayment')
+
+    def test_deleting_items_updates_unfulfilled_quantity(self):
+        self.assertEqual(self.get_order().unfulfilled_quantity, 6)
+        self.items[2].delete()
+        self.assertEqual(self.get_order().unfulfilled_quantity, 3)
+        OrderItem.objects.filter(pk=self.items[1].pk).delete()
+        self.assertEqual(self.get_order().unfulfilled_quantity, 1)
+
+    def test_deleting_payments_updates_amount_paid(self):
+        payment = self.add_payment('10.00')
+        self.add_payment('15.00')
+        self.assertEqual(self.get_order()._amount_paid, Decimal('25.00'))
+        payment.delete()
+        self.assertEqual(self.get_order()._amount_paid, Decimal('15.00'))
+        OrderPayment.objects.filter(order=self.order).delete()
+        self.assertEqual(self.get_order()._amount_paid, Decimal(0))
+
+    def test_deleting_order_skips_its_totals(self):
+        self.add_payment('10.00')
+        # deleting the order cascades to its items and payments, without updating the order
+        with CaptureQueriesContext(connection) as context:
+            self.order.delete()
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in context.captured_queries))
+        self.assertFalse(Order.objects.filter(pk=self.order.pk).exists())
+
+    @skipUnless(issubclass(Order, CommissionGoodsWorkflowMixin),
+                "requires a delivery workflow in settings.SHOP_ORDER_WORKFLOWS")
+    def test_deleting_deliveries_updates_unfulfilled_quantity(self):
+        Order.add_delivery_items([self.order], [(item, item.quantity) for item in self.items])
+        self.assertEqual(self.get_order().unfulfilled_quantity, 0)
+        # the delivery items are deleted by a cascade
+        self.items[0].delete()
+        self.assertEqual(self.get_order().unfulfilled_quantity, 0)
+        delivery.DeliveryModel.objects.filter(order=self.order).delete()
+        self.assertEqual(self.get_order().unfulfilled_quantity, 5)
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from wagtail.models import Locale
+
+from wagtail_site.shop.models import Cart, CartItem, Customer, Product, ProductReservation
+
+
+class ProductReservationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        locale, _ = Locale.objects.get_or_create(language_code='en')
+        user = get_user_model().objects.create(username='customer')
+        cls.cart = Cart.objects.create(customer=Customer.objects.create(user=user), extra={})
+        cls.product = Product.objects.create(name="Mug", caption="Mug", code='MUG', unit_price=Decimal('9.90'),
+                                             quantity=10, locale=locale)
+
+    def get_reserved_quantity(self):
+        return ProductReservation.objects.get_reserved_quantities([self.product.pk])[self.product.pk]
+
+    def test_saving_cart_items_updates_counter(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, extra={})
+        self.assertEqual(self.get_reserved_quantity(), 2)
+        item.quantity = 5
+        item.save()
+        self.assertEqual(self.get_reserved_quantity(), 5)
+        item = CartItem.objects.get(pk=item.pk)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self.get_reserved_quantity(), 3)
+
+    def test_deleting_cart_items_releases_quantity(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=4, extra={})
+        CartItem.objects.get(cart=self.cart).delete()
+        self.assertEqual(self.get_reserved_quantity(), 0)
+
+    def test_unknown_products_are_not_reserved(self):
+        self.assertEqual(ProductReservation.objects.get_reserved_quantities([0]), {0: 0})
+
+    def test_reconcile_fixes_drifted_counters(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, extra={})
+        CartItem.objects.filter(cart=self.cart).update(quantity=7)
+        self.assertEqual(ProductReservation.objects.reconcile(), 1)
+        self.assertEqual(self.get_reserved_quantity(), 7)
+        self.assertEqual(ProductReservation.objects.reconcile(), 0)
+
+    def test_reconcile_creates_missing_counters(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2, extra={})
+        ProductReservation.objects.all().delete()
+        self.assertEqual(ProductReservation.objects.reconcile(), 1)
+        self.assertEqual(self.get_reserved_quantity(), 2)
@@ -0,0 +1,140 @@
+import datetime
+import threading
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from wagtail.models import Locale
+
+from wagtail_site.shop.exceptions import ProductNotAvailable
+from wagtail_site.shop.models import Product
+from wagtail_site.shop.models.base import inventory
+from wagtail_site.shop.models.product import ProductInventory
+
+
+def deduct_from_inventories(deductions):
+    # the default product keeps its stock in a field, deduct from its inventories instead
+    inventory.AvailableProductMixin.bulk_deduct_from_stock.__func__(Product, deductions)
+
+
+def create_inventory(product, quantity, days):
+    now = timezone.now()
+    return ProductInventory.objects.create(product=product, quantity=quantity,
+                                           earliest=now - datetime.timedelta(days=days),
+                                           latest=now + datetime.timedelta(days=365))
+
+
+class BulkDeductFromStockTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        locale, _ = Locale.objects.get_or_create(language_code='en')
+        cls.mug = Product.objects.create(name="Mug", caption="Mug", code='MUG', unit_price=Decimal('9.90'),
+                                         quantity=10, locale=locale)
+        cls.cup = Product.objects.create(name="Cup", caption="Cup", code='CUP', unit_price=Decimal('4.50'),
+                                         quantity=1, locale=locale)
+
+    def get_stock(self):
+        return dict(Product.objects.values_list('code', 'quantity'))
+
+    def test_deducts_all_products_at_once(self):
+        mug, cup = Product.objects.get(code='MUG'), Product.objects.get(code='CUP')
+        Product.objects.deduct_from_stock([(mug, 3, {}), (cup, 1, {}), (mug, 2, {})])
+        self.assertEqual(self.get_stock(), {'MUG': 5, 'CUP': 0})
+        self.assertEqual((mug.quantity, cup.quantity), (5, 0))
+
+    def test_reports_product_out_of_stock(self):
+        mug, cup = Product.objects.get(code='MUG'), Product.objects.get(code='CUP')
+        with self.assertRaises(ProductNotAvailable) as context:
+            Product.objects.deduct_from_stock([(mug, 3, {}), (cup, 2, {})])
+        self.assertEqual(context.exception.product, cup)
+        self.assertEqual(self.get_stock(), {'MUG': 10, 'CUP': 1})
+
+    def test_does_not_lock_products(self):
+        mug = Product.objects.get(code='MUG')
+        with CaptureQueriesContext(connection) as context:
+            mug.deduct_from_stock(3)
+        self.assertFalse(any('FOR UPDATE' in query['sql'] for query in context.captured_queries))
+        self.assertEqual(self.get_stock()['MUG'], 7)
+
+    def test_reports_stock_changed_by_concurrent_checkout(self):
+        mug = Product.objects.get(code='MUG')
+        Product.objects.filter(code='MUG').update(quantity=2)
+        with self.assertRaises(ProductNotAvailable) as context:
+            mug.deduct_from_stock(3)
+        self.assertEqual(context.exception.product, mug)
+        self.assertEqual(self.get_stock()['MUG'], 2)
+
+
+class BulkDeductFromInventoriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        locale, _ = Locale.objects.get_or_create(language_code='en')
+        cls.mug = Product.objects.create(name="Mug", caption="Mug", code='MUG', unit_price=Decimal('9.90'),
+                                         quantity=0, locale=locale)
+        cls.cup = Product.objects.create(name="Cup", caption="Cup", code='CUP', unit_price=Decimal('4.50'),
+                                         quantity=0, locale=locale)
+        cls.older_mugs = create_inventory(cls.mug, 2, days=10)
+        cls.newer_mugs = create_inventory(cls.mug, 5, days=1)
+        cls.cups = create_inventory(cls.cup, 1, days=1)
+
+    def get_stock(self):
+        return dict(ProductInventory.objects.values_list('pk', 'quantity'))
+
+    def test_deducts_earliest_inventories_first(self):
+        # reading the inventories and updating them inside a savepoint
+        with self.assertNumQueries(4):
+            deduct_from_inventories([(self.mug, 1, {}), (self.cup, 1, {}), (self.mug, 2, {})])
+        self.assertEqual(self.get_stock(), {self.older_mugs.pk: 0, self.newer_mugs.pk: 4, self.cups.pk: 0})
+
+    def test_reports_product_out_of_stock(self):
+        with self.assertRaises(ProductNotAvailable) as context:
+            deduct_from_inventories([(self.mug, 3, {}), (self.cup, 2, {})])
+        self.assertEqual(context.exception.product, self.cup)
+        self.assertEqual(self.get_stock(), {self.older_mugs.pk: 2, self.newer_mugs.pk: 5, self.cups.pk: 1})
+
+
+@skipUnless(connection.vendor == 'postgresql', "requires concurrent transactions of PostgreSQL")
+class ConcurrentDeductionTest(TransactionTestCase):
+    available_apps = ['wagtail_site.shop']
+
+    def setUp(self):
+        locale, _ = Locale.objects.get_or_create(language_code='en')
+        self.mug = Product.objects.create(name="Mug", caption="Mug", code='MUG', unit_price=Decimal('9.90'),
+                                          quantity=10, locale=locale)
+
+    def run_checkouts(self, deduct, count):
+        """
+        Deduct 3 mugs in each of ``count`` concurrent transactions, returning the number of those
+        which failed, because the mugs were sold out.
+        """
+        barrier, failures = threading.Barrier(count), []
+
+        def checkout():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    deduct([(Product.objects.get(pk=self.mug.pk), 3, {})])
+            except ProductNotAvailable:
+                failures.append(True)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(failures)
+
+    def test_never_oversells_stock(self):
+        self.assertEqual(self.run_checkouts(Product.objects.deduct_from_stock, 5), 2)
+        self.assertEqual(Product.objects.get(pk=self.mug.pk).quantity, 1)
+
+    def test_never_oversells_inventories(self):
+        create_inventory(self.mug, 4, days=10)
+        create_inventory(self.mug, 6, days=1)
+        self.assertEqual(self.run_checkouts(deduct_from_inventories, 5), 2)
+        self.assertEqual(sorted(ProductInventory.objects.values_list('quantity', flat=True)), [0, 1])
@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+
+from wagtail_site.shop.transition import ThreadNotificationWorker
+
+
+class RecordingWorker(ThreadNotificationWorker):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send(self, order_pk, status):
+        if order_pk is None:
+            raise ValueError("Unknown order")
+        self.sent.append((order_pk, status))
+
+
+class ThreadNotificationWorkerTest(SimpleTestCase):
+    def test_drain_sends_queued_notifications(self):
+        worker = RecordingWorker()
+        for item in [(1, 'payment_confirmed'), (None, 'payment_confirmed'), (2, 'ready_for_delivery')]:
+            worker._queue.put(item)
+        with self.assertLogs('shop.notifications', 'ERROR'):
+            worker.drain()
+        self.assertEqual(worker.sent, [(1, 'payment_confirmed'), (2, 'ready_for_delivery')])
+        self.assertTrue(worker._queue.empty())
@@ -0,0 +1,84 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from django_fsm import ANY_OTHER_STATE, ANY_STATE
+
+from wagtail_site.shop.models import Order
+from wagtail_site.shop.shipping.workflows import PartialDeliveryWorkflowMixin
+
+
+def walk_transitions(state):
+    """
+    The names of all transitions leaving the given state, as found by walking all transitions of the model.
+    """
+    return sorted(
+        transition.name for transition in Order.status.field.get_all_transitions(Order)
+        if transition.source in (state, ANY_STATE)
+        or transition.source == ANY_OTHER_STATE and transition.target != state
+    )
+
+
+def get_names(transitions):
+    return sorted(transition.name for transition in transitions)
+
+
+class TransitionGraphTest(SimpleTestCase):
+    graph = Order.get_transition_graph()
+
+    def test_graph_is_built_once(self):
+        self.assertIs(Order.get_transition_graph(), self.graph)
+        self.assertEqual(Order.get_all_transitions(), self.graph.transitions)
+
+    def test_transitions_of_each_state(self):
+        for state in set(self.graph.targets).union(['new', 'created', 'unknown']):
+            with self.subTest(state=state):
+                self.assertEqual(get_names(self.graph.get_transitions(state)), walk_transitions(state))
+
+    def test_admin_transitions_of_each_state(self):
+        for state in set(self.graph.targets).union(['new', 'created']):
+            with self.subTest(state=state):
+                admin_transitions = self.graph.get_admin_transitions(state)
+                self.assertTrue(all(t.custom.get('admin') for t in admin_transitions))
+                expected = [t for t in self.graph.get_transitions(state) if t.custom.get('admin')]
+                self.assertEqual(get_names(admin_transitions), get_names(expected))
+
+    def test_filter_choices(self):
+        states = [state for state, _ in self.graph.filter_choices]
+        self.assertNotIn('new', states)
+        self.assertNotIn('created', states)
+        self.assertIn(('payment_confirmed', Order.get_transition_name('payment_confirmed')),
+                      self.graph.filter_choices)
+
+    def test_available_transitions_check_conditions(self):
+        paid = Order(status='created', currency='EUR', _total=Decimal(0), _amount_paid=Decimal(0))
+        unpaid = Order(status='created', currency='EUR', _total=Decimal(10), _amount_paid=Decimal(0))
+        for order in [paid, unpaid]:
+            # as annotated by workflows with deliveries, since unsaved orders have none
+            order.annotated_ready_for_shipping = False
+        self.assertIn('acknowledge_payment', get_names(paid.get_available_transitions()))
+        self.assertNotIn('acknowledge_payment', get_names(unpaid.get_available_transitions()))
+
+
+@skipUnless(issubclass(Order, PartialDeliveryWorkflowMixin),
+            "requires the PartialDeliveryWorkflowMixin in settings.SHOP_ORDER_WORKFLOWS")
+class PartialDeliveryTransitionGraphTest(SimpleTestCase):
+    graph = Order.get_transition_graph()
+
+    def get_transition(self, source, name):
+        return next(t for t in self.graph.get_transitions(source) if t.name == name)
+
+    def test_admin_transitions(self):
+        self.assertEqual(get_names(self.graph.get_admin_transitions('payment_confirmed')),
+                         ['pick_goods', 'ship_goods'])
+        self.assertEqual(get_names(self.graph.get_admin_transitions('pick_goods')),
+                         ['pack_goods', 'pick_goods', 'ship_goods'])
+        self.assertEqual(self.graph.get_auto_transition('ship_goods').__name__, 'prepare_for_delivery')
+
+    def test_bulk_target_follows_auto_transitions(self):
+        order = Order(status='pack_goods')
+        self.assertEqual(self.graph.get_bulk_target(order, self.get_transition('pick_goods', 'pack_goods')),
+                         'pack_goods')
+        # shipping the goods triggers the automatic transition into `ready_for_delivery`
+        self.assertEqual(self.graph.get_bulk_target(order, self.get_transition('pack_goods', 'ship_goods')),
+                         'ready_for_delivery')
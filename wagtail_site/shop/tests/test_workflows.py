@@ -0,0 +1,86 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from wagtail_site.shop.models import Customer, Order, OrderItem
+from wagtail_site.shop.models.base import delivery
+from wagtail_site.shop.shipping.workflows import PartialDeliveryWorkflowMixin
+
+
+@skipUnless(issubclass(Order, PartialDeliveryWorkflowMixin),
+            "requires the PartialDeliveryWorkflowMixin in settings.SHOP_ORDER_WORKFLOWS")
+class PartialDeliveryBulkTransitionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create(username='buyer', email='buyer@example.com')
+        cls.customer = Customer.objects.create(user=user)
+
+    def create_order(self, quantities, total=Decimal(0)):
+        order = Order.objects.create(customer=self.customer, currency='EUR', _subtotal=total, _total=total,
+                                     status='payment_confirmed', stored_request={},
+                                     extra={'shipping_modifier': 'self-collection'})
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_name="Mug", product_code='MUG-{}'.format(number),
+                      _unit_price=Decimal(0), _line_total=Decimal(0), quantity=quantity, extra={})
+            for number, quantity in enumerate(quantities)
+        ])
+        Order.objects.filter(pk=order.pk).update_delivery_totals()
+        return order
+
+    def bulk_transition(self, name, orders):
+        return Order.objects.filter(pk__in=[order.pk for order in orders]).bulk_transition(name)
+
+    def get_statuses(self, orders):
+        return [Order.objects.get(pk=order.pk).status for order in orders]
+
+    def test_pick_pack_and_ship(self):
+        orders = [self.create_order([1, 2]), self.create_order([3])]
+        unpaid = self.create_order([1], total=Decimal('10.00'))
+        pks = [order.pk for order in orders]
+
+        self.assertEqual(self.bulk_transition('pick_goods', orders + [unpaid]), {'pick_goods': pks})
+        self.assertEqual(self.get_statuses(orders + [unpaid]), ['pick_goods', 'pick_goods', 'payment_confirmed'])
+
+        self.assertEqual(self.bulk_transition('pack_goods', orders), {'pack_goods': pks})
+        deliveries = delivery.DeliveryModel.objects.filter(order__in=orders)
+        self.assertEqual(sorted(deliveries.values_list('order', 'part_number', 'shipping_method')),
+                         [(pk, 1, 'self-collection') for pk in pks])
+        delivered = delivery.DeliveryItemModel.objects.filter(delivery__in=deliveries)
+        self.assertEqual(sorted(delivered.values_list('item__quantity', 'quantity')), [(1, 1), (2, 2), (3, 3)])
+        self.assertEqual(list(Order.objects.filter(pk__in=pks).values_list('unfulfilled_quantity', flat=True)),
+                         [0, 0])
+
+        # shipping the goods triggers the automatic transition into `ready_for_delivery`
+        self.assertEqual(self.bulk_transition('ship_goods', orders), {'ready_for_delivery': pks})
+        self.assertEqual(self.get_statuses(orders), ['ready_for_delivery', 'ready_for_delivery'])
+        self.assertFalse(deliveries.filter(shipped_at__isnull=True).exists())
+
+    def test_query_count_does_not_depend_on_order_size(self):
+        counts = []
+        for quantities in [[1], [1] * 500]:
+            order = self.create_order(quantities)
+            with CaptureQueriesContext(connection) as context:
+                Order.create_deliveries([order])
+            # apart from the batches the database backend splits the inserted delivery items into
+            table = delivery.DeliveryItemModel._meta.db_table
+            counts.append(len([query for query in context.captured_queries
+                               if not query['sql'].startswith('INSERT INTO "{}"'.format(table))]))
+            delivered = delivery.DeliveryItemModel.objects.filter(delivery__order=order)
+            self.assertEqual(delivered.count(), len(quantities))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_packing_locks_orders_once(self):
+        orders = [self.create_order([1, 2]), self.create_order([3])]
+        self.bulk_transition('pick_goods', orders)
+        with CaptureQueriesContext(connection) as context:
+            self.bulk_transition('pack_goods', orders)
+        locks = [query for query in context.captured_queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locks), 1 if connection.features.has_select_for_update else 0)
+
+    def test_rejects_transitions_not_applicable_in_bulk(self):
+        with self.assertRaises(ValueError):
+            Order.objects.all().bulk_transition('no_such_transition')
@@ -1,17 +1,23 @@
+import atexit
+import logging
+import queue
+from threading import Lock, Thread
 from urllib.parse import urlparse
 
 from django.contrib.auth.models import AnonymousUser
-from django.db import models
+from django.db import close_old_connections, models, transaction
 from django.http.request import HttpRequest
+from django.utils import translation
 from post_office import mail
-from post_office.models import EmailTemplate
 from wagtail_site.shop.conf import app_settings
-from wagtail_site.shop.models.base.order import BaseOrder
-from wagtail_site.shop.models.notification import Notification
-from wagtail_site.shop.serializers.delivery import DeliverySerializer
-from wagtail_site.shop.serializers.order import OrderDetailSerializer
+from wagtail_site.shop.models.base.order import BaseOrder, OrderModel
+from wagtail_site.shop.models.notification import get_notification_routes
+from wagtail_site.shop.serializers.base.delivery import DeliverySerializer
+from wagtail_site.shop.serializers.base.order import OrderDetailSerializer
 from wagtail_site.shop.signals import email_queued
 
+logger = logging.getLogger('shop.notifications')
+
 
 class EmulateHttpRequest(HttpRequest):
     """
@@ -41,41 +47,127 @@ def transition_change_notification(order):
     """
     This function shall be called, after an Order object performed a transition change.
 
+    The notifications are handed over to the configured notification worker, once the current
+    transaction has been committed, so that the caller does not wait for them to be rendered.
     """
     if not isinstance(order, BaseOrder):
         raise TypeError("Object order must inherit from class BaseOrder")
+    order_pk, status = order.pk, order.status
+    transaction.on_commit(lambda: app_settings.NOTIFICATION_WORKER.enqueue(order_pk, status))
+
+
+def bulk_transition_notification(order_pks, status):
+    """
+    This function shall be called, after many Order objects have been moved into the same state
+    by ``OrderQuerySet.bulk_transition()``.
+    """
+    def enqueue():
+        worker = app_settings.NOTIFICATION_WORKER
+        for order_pk in order_pks:
+            worker.enqueue(order_pk, status)
+
+    order_pks = list(order_pks)
+    transaction.on_commit(enqueue)
+
+
+def send_transition_notifications(order, status):
+    """
+    Send all notifications configured for the given transition target of an order. The customer,
+    the order and its latest delivery are serialized only once and shared by all recipients.
+    Attachments are passed to the Post-Office as file references. The order is serialized in the
+    language the customer used when submitting it.
+    """
+    context = render_context = None
     emails_in_queue = False
-    for notification in Notification.objects.filter(transition_target=order.status):
-        recipient = notification.get_recipient(order)
+    for route in get_notification_routes(status):
+        recipient = route.notification.get_recipient(order, route.recipient_email)
         if recipient is None:
             continue
 
-        # emulate a request object which behaves similar to that one, when the customer submitted its order
-        emulated_request = EmulateHttpRequest(order.customer, order.stored_request)
-        customer_serializer = app_settings.CUSTOMER_SERIALIZER(order.customer)
-        render_context = {'request': emulated_request, 'render_label': 'email'}
-        order_serializer = OrderDetailSerializer(order, context=render_context)
-        language = order.stored_request.get('language')
-        context = {
-            'customer': customer_serializer.data,
-            'order': order_serializer.data,
-            'ABSOLUTE_BASE_URI': emulated_request.build_absolute_uri().rstrip('/'),
-            'render_language': language,
-        }
-        try:
-            latest_delivery = order.delivery_set.latest()
-            context['latest_delivery'] = DeliverySerializer(latest_delivery, context=render_context).data
-        except (AttributeError, models.ObjectDoesNotExist):
-            pass
-        try:
-            template = notification.mail_template.translated_templates.get(language=language)
-        except EmailTemplate.DoesNotExist:
-            template = notification.mail_template
+        if context is None:
+            render_language = order.stored_request.get('language')
+            with translation.override(render_language):
+                # emulate a request object which behaves similar to that one, when the customer submitted its order
+                emulated_request = EmulateHttpRequest(order.customer, order.stored_request)
+                customer_serializer = app_settings.CUSTOMER_SERIALIZER(order.customer)
+                render_context = {'request': emulated_request, 'render_label': 'email'}
+                order_serializer = OrderDetailSerializer(order, context=render_context)
+                context = {
+                    'customer': customer_serializer.data,
+                    'order': order_serializer.data,
+                    'ABSOLUTE_BASE_URI': emulated_request.build_absolute_uri().rstrip('/'),
+                    'render_language': render_language,
+                }
+                try:
+                    latest_delivery = order.delivery_set.latest()
+                    context['latest_delivery'] = DeliverySerializer(latest_delivery, context=render_context).data
+                except (AttributeError, models.ObjectDoesNotExist):
+                    pass
+        template = route.templates.get(context['render_language'], route.templates[None])
         attachments = {}
-        for notiatt in notification.attachments.all():
-            attachments[notiatt.attachment.original_filename] = notiatt.attachment.file.file
+        for attachment in route.attachments:
+            try:
+                attachments[attachment.original_filename] = attachment.file.path
+            except NotImplementedError:
+                # storage without local filesystem, let the Post-Office read the file
+                attachments[attachment.original_filename] = attachment.file
         mail.send(recipient, template=template, context=context,
                   attachments=attachments, render_on_delivery=True)
         emails_in_queue = True
     if emails_in_queue:
         email_queued()
+
+
+class SynchronousNotificationWorker:
+    """
+    Sends the notifications immediately, in the process committing the transition.
+    """
+    def enqueue(self, order_pk, status):
+        self.send(order_pk, status)
+
+    def send(self, order_pk, status):
+        send_transition_notifications(OrderModel.objects.get(pk=order_pk), status)
+
+
+class ThreadNotificationWorker(SynchronousNotificationWorker):
+    """
+    Sends the notifications from a background thread of the current process. Notifications still
+    queued, when the process terminates gracefully, are sent before exiting.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = Lock()
+        # send the pending notifications on graceful shutdown
+        atexit.register(self.drain)
+
+    def enqueue(self, order_pk, status):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name='shop-notifications', daemon=True)
+                self._thread.start()
+        self._queue.put((order_pk, status))
+
+    def _run(self):
+        while True:
+            self._process(*self._queue.get())
+
+    def _process(self, order_pk, status):
+        try:
+            self.send(order_pk, status)
+        except Exception:
+            logger.exception("Failed to send notifications for order %s", order_pk)
+        finally:
+            close_old_connections()
+            self._queue.task_done()
+
+    def drain(self):
+        """
+        Send all queued notifications from the calling thread.
+        """
+        while True:
+            try:
+                order_pk, status = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._process(order_pk, status)